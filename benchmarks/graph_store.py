@@ -0,0 +1,193 @@
+"""Compares BF_GRAPH's stores, ObservedMemory and ObservedArrayStore, on
+synthetic BIBFRAME data under CPython.
+
+Memory is measured with tracemalloc and excludes the term objects, which
+both stores share with the data they were loaded from. It is reported for
+the bare store and for the store with the listeners state.py attaches to
+BF_GRAPH: GraphStatistics, ChangeTracker, UpdateJournal and the graph
+worker's pending delta, before and after it is sent to the worker.
+
+The worker's mirror (graph_worker.py) is an ObservedArrayStore in the
+worker's own heap, built from N-Triples terms, so it is measured with
+its terms included.
+
+    python benchmarks/graph_store.py --triples 200000
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import rdflib
+
+from rdflib.util import from_n3
+
+from change_tracker import ChangeTracker
+from graph_stats import GraphStatistics
+from graph_store import ObservedArrayStore, ObservedMemory
+from query_results import n3_term
+from update_journal import JournalEntry, UpdateJournal
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+
+STORES = {"memory": ObservedMemory, "array": ObservedArrayStore}
+
+
+def bibframe_triples(count: int, seed: int = 1) -> list:
+    """Ten triples per Instance: its Work, a Title blank node, literals
+    and shared subject and language IRIs"""
+    rng = random.Random(seed)
+    triples = []
+    for i in range(count // 10):
+        instance = rdflib.URIRef(f"https://bcld.info/instances/{i:08x}")
+        work = rdflib.URIRef(f"https://bcld.info/works/{i:08x}")
+        title = rdflib.BNode()
+        triples += [
+            (instance, rdflib.RDF.type, BF.Instance),
+            (instance, BF.title, title),
+            (title, rdflib.RDF.type, BF.Title),
+            (title, BF.mainTitle, rdflib.Literal(f"Title number {i}", lang="en")),
+            (instance, BF.instanceOf, work),
+            (work, rdflib.RDF.type, BF.Work),
+            (instance, BF.extent, rdflib.Literal(rng.randint(1, 900))),
+            (work, BF.subject, rdflib.URIRef(f"http://id.loc.gov/authorities/subjects/sh{rng.randint(1, 5000)}")),
+            (instance, BF.date, rdflib.Literal(f"2020-01-0{rng.randint(1, 9)}", datatype=rdflib.XSD.date)),
+            (work, BF.language, rdflib.URIRef("http://id.loc.gov/vocabulary/languages/eng")),
+        ]
+    return triples
+
+
+def _traced_bytes() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _load(store_class, triples: list, listeners: bool) -> tuple:
+    graph = rdflib.Graph(store=store_class())
+    pending = None
+    if listeners:
+        change_tracker = ChangeTracker(graph)
+        # Stands in for GraphWorker, whose pending delta is a JournalEntry
+        pending = JournalEntry("graph-worker")
+        graph.store.listeners += [GraphStatistics(), change_tracker, UpdateJournal(graph), pending]
+        with change_tracker.loading():
+            graph.addN((*triple, graph) for triple in triples)
+    else:
+        graph.addN((*triple, graph) for triple in triples)
+    if hasattr(graph.store, "compact"):
+        graph.store.compact()
+    return graph, pending
+
+
+def memory(store_class, triples: list) -> dict:
+    sizes = {}
+    gc.collect()
+    tracemalloc.start()
+    graph, _ = _load(store_class, triples, listeners=False)
+    sizes["store"] = _traced_bytes()
+    tracemalloc.stop()
+    del graph
+
+    gc.collect()
+    tracemalloc.start()
+    graph, pending = _load(store_class, triples, listeners=True)
+    sizes["with listeners, delta pending"] = _traced_bytes()
+    # What GraphWorker.sync releases once the delta reaches the worker
+    pending.added.clear()
+    sizes["with listeners, delta sent"] = _traced_bytes()
+    tracemalloc.stop()
+    return {name: size / len(triples) for name, size in sizes.items()}
+
+
+def mirror_memory(triples: list, chunk_size: int = 50_000) -> float:
+    """Bytes per triple of the worker's mirror, loaded the way
+    graph_worker.apply_delta loads a delta"""
+    rows = [[n3_term(term) for term in triple] for triple in triples]
+    gc.collect()
+    tracemalloc.start()
+    mirror = rdflib.Graph(store=ObservedArrayStore())
+    for start in range(0, len(rows), chunk_size):
+        terms = {}
+
+        def term(value: str):
+            if value not in terms:
+                terms[value] = from_n3(value)
+            return terms[value]
+
+        mirror.addN((*(term(value) for value in row), mirror) for row in rows[start:start + chunk_size])
+    mirror.store.compact()
+    del terms
+    size = _traced_bytes()
+    tracemalloc.stop()
+    return size / len(triples)
+
+
+def timings(store_class, triples: list, lookups: int = 2000) -> dict:
+    rng = random.Random(2)
+    graph = rdflib.Graph(store=store_class())
+    start = time.perf_counter()
+    graph.addN((*triple, graph) for triple in triples)
+    load = time.perf_counter() - start
+    subjects = [triples[rng.randrange(len(triples))][0] for _ in range(lookups)]
+    titles = [triples[rng.randrange(len(triples) // 10) * 10 + 1][2] for _ in range(lookups)]
+
+    start = time.perf_counter()
+    for subject in subjects:
+        list(graph.triples((subject, None, None)))
+    subject_lookup = (time.perf_counter() - start) / lookups
+
+    start = time.perf_counter()
+    for title in titles:
+        list(graph.triples((None, BF.title, title)))
+    object_lookup = (time.perf_counter() - start) / lookups
+
+    start = time.perf_counter()
+    list(graph.triples((None, rdflib.RDF.type, BF.Work)))
+    type_scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    list(graph.query(
+        "SELECT ?s ?t WHERE { ?s a bf:Instance ; bf:title/bf:mainTitle ?t }", initNs={"bf": BF}
+    ))
+    join = time.perf_counter() - start
+    return {
+        "load (s)": load,
+        "(s ? ?) lookup (us)": subject_lookup * 1e6,
+        "(? p o) lookup (us)": object_lookup * 1e6,
+        "(? rdf:type bf:Work) (ms)": type_scan * 1e3,
+        "SPARQL 2-hop join (s)": join,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--triples", type=int, default=200_000)
+    parser.add_argument("--stores", nargs="+", choices=list(STORES), default=list(STORES))
+    parser.add_argument("--skip-timings", action="store_true")
+    args = parser.parse_args()
+
+    triples = bibframe_triples(args.triples)
+    results = {}
+    for name in args.stores:
+        results[name] = {
+            f"bytes per triple, {key}": value
+            for key, value in memory(STORES[name], triples).items()
+        }
+        if not args.skip_timings:
+            results[name].update(timings(STORES[name], triples))
+
+    print(f"{len(triples):,} triples")
+    print(f"{'':48}" + "".join(f"{name:>12}" for name in args.stores))
+    for row in results[args.stores[0]]:
+        print(f"{row:48}" + "".join(f"{results[name][row]:>12.1f}" for name in args.stores))
+    print(f"{'bytes per triple, worker mirror with its terms':48}{mirror_memory(triples):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Compares the ways JSON-LD resources have been loaded into BF_GRAPH,
+on synthetic BIBFRAME Instance resources under CPython.
+
+    turtle round trip   each resource parsed into a scratch graph,
+                        serialized to Turtle and parsed again into
+                        BF_GRAPH, as load_rdf did before parse_jsonld
+    direct              parse_jsonld into BF_GRAPH's store in one pass,
+                        the @context processed once by a ContextRegistry
+    direct, skolemized  the same with blank nodes replaced by skolem IRIs
+
+Peak memory is measured with tracemalloc and includes the loaded graph.
+
+    python benchmarks/jsonld_ingest.py --resources 300
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import rdflib
+
+from graph_store import ObservedArrayStore
+from jsonld_contexts import ContextRegistry, parse_jsonld
+
+BF = "http://id.loc.gov/ontologies/bibframe/"
+
+CONTEXT = {
+    "bf": BF,
+    "bflc": "http://id.loc.gov/ontologies/bflc/",
+    "rdf": str(rdflib.RDF),
+    "rdfs": str(rdflib.RDFS),
+    "xsd": str(rdflib.XSD),
+}
+
+
+def bibframe_resource(i: int) -> str:
+    """An Instance with its title, identifiers, provision activity and
+    notes as blank nodes, about 46 triples"""
+    uri = f"https://bcld.info/instances/{i:08x}"
+    graph = [
+        {
+            "@id": uri,
+            "@type": "bf:Instance",
+            "bf:instanceOf": {"@id": f"https://bcld.info/works/{i:08x}"},
+            "bf:title": {"@id": "_:title"},
+            "bf:identifiedBy": [{"@id": f"_:id{n}"} for n in range(4)],
+            "bf:provisionActivity": {"@id": "_:publication"},
+            "bf:note": [{"@id": f"_:note{n}"} for n in range(4)],
+            "bf:extent": {"@id": "_:extent"},
+            "bf:dimensions": "24 cm",
+            "bf:issuance": {"@id": "http://id.loc.gov/vocabulary/issuance/mono"},
+            "bf:carrier": {"@id": "http://id.loc.gov/vocabulary/carriers/nc"},
+        },
+        {
+            "@id": "_:title",
+            "@type": "bf:Title",
+            "bf:mainTitle": f"Title number {i}",
+            "bf:subtitle": "a synthetic resource",
+        },
+        {
+            "@id": "_:publication",
+            "@type": "bf:Publication",
+            "bf:date": {"@value": "2020", "@type": "xsd:gYear"},
+            "bf:place": {"@id": "http://id.loc.gov/vocabulary/countries/nyu"},
+            "bflc:simplePlace": "New York",
+            "bflc:simpleAgent": "Publisher",
+        },
+        {"@id": "_:extent", "@type": "bf:Extent", "rdfs:label": f"{i % 900 + 1} pages"},
+    ]
+    for n in range(4):
+        graph.append({
+            "@id": f"_:id{n}",
+            "@type": "bf:Isbn" if n % 2 else "bf:Local",
+            "rdf:value": f"{i:08d}{n}",
+            "bf:qualifier": "paperback",
+        })
+        graph.append({
+            "@id": f"_:note{n}",
+            "@type": "bf:Note",
+            "rdfs:label": f"Note {n} of resource {i}",
+        })
+    return json.dumps({"@context": CONTEXT, "@graph": graph})
+
+
+def _turtle_round_trip(graph: rdflib.Graph, url: str, raw_rdf: str):
+    resource_graph = rdflib.Graph()
+    resource_graph.parse(data=raw_rdf, format="json-ld")
+    graph.parse(data=resource_graph.serialize(format="turtle"), format="turtle")
+
+
+def _direct(contexts: ContextRegistry, skolemize: bool):
+    def ingest(graph: rdflib.Graph, url: str, raw_rdf: str):
+        parse_jsonld(raw_rdf, graph, contexts, f"{url}#" if skolemize else None)
+    return ingest
+
+
+def run(ingest, resources: list) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    graph = rdflib.Graph(store=ObservedArrayStore())
+    start = time.perf_counter()
+    for url, raw_rdf in resources:
+        ingest(graph, url, raw_rdf)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "ms per resource": elapsed * 1000 / len(resources),
+        "peak MB": peak / 1_000_000,
+        "triples": len(graph),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resources", type=int, default=300)
+    args = parser.parse_args()
+
+    resources = [
+        (f"https://bcld.info/instances/{i:08x}", bibframe_resource(i)) for i in range(args.resources)
+    ]
+    paths = {
+        "turtle round trip": _turtle_round_trip,
+        "direct": _direct(ContextRegistry(), skolemize=False),
+        "direct, skolemized": _direct(ContextRegistry(), skolemize=True),
+    }
+    print(f"{len(resources):,} resources")
+    print(f"{'':24}{'ms/resource':>14}{'peak MB':>10}{'triples':>10}")
+    for name, ingest in paths.items():
+        result = run(ingest, resources)
+        print(f"{name:24}{result['ms per resource']:>14.1f}{result['peak MB']:>10.1f}{result['triples']:>10,}")
+
+
+if __name__ == "__main__":
+    main()
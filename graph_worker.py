@@ -0,0 +1,114 @@
+import json
+
+from urllib.parse import urljoin
+
+import rdflib
+
+from pyscript import window
+from rdflib.util import from_n3
+
+from graph_store import ObservedArrayStore
+from lazy_packages import FEATURE_PACKAGES
+from query_cache import QueryCache
+from query_results import QueryResults
+from shacl_validator import IncrementalValidator
+
+# Mirror of BF_GRAPH on the main thread, kept current by apply_delta. A
+# full second copy of the graph, loads and updates still run on the main
+# thread (see worker_client.GraphWorker)
+BF_GRAPH = rdflib.Graph(store=ObservedArrayStore())
+
+QUERY_CACHE = QueryCache()
+
+SHACL_VALIDATOR = IncrementalValidator("./shacl/all.ttl")
+BF_GRAPH.store.listeners.append(SHACL_VALIDATOR)
+
+_installed = set()
+
+
+class Cancelled(Exception):
+    pass
+
+
+def _progress(message: str):
+    # window is the main thread's, so this is also where cancellation is seen
+    window.document.getElementById("graph-worker-progress").innerText = message
+    if window.graphWorkerCancel:
+        raise Cancelled(message)
+
+
+def apply_delta(delta: str) -> int:
+    """Applies a {"added": [...], "removed": [...]} batch of triples, each
+    a list of N-Triples terms, and returns the size of the graph"""
+    global BF_GRAPH
+
+    delta = json.loads(delta)
+    terms = {}
+
+    def term(value: str):
+        if value not in terms:
+            terms[value] = from_n3(value)
+        return terms[value]
+
+    for row in delta["removed"]:
+        BF_GRAPH.remove(tuple(term(value) for value in row))
+    BF_GRAPH.addN((*(term(value) for value in row), BF_GRAPH) for row in delta["added"])
+    return len(BF_GRAPH)
+
+
+def select(sparql: str, namespaces: str) -> str:
+    global BF_GRAPH
+
+    def progress(count: int):
+        _progress(f"Running query {count:,} rows")
+
+    try:
+        results = QUERY_CACHE.query(
+            BF_GRAPH, sparql, json.loads(namespaces), progress=progress
+        )
+        if not isinstance(results, QueryResults):
+            results = QueryResults(results, progress=progress)
+    except Cancelled:
+        return json.dumps({"cancelled": True})
+    return json.dumps(results.to_columns())
+
+
+async def _ensure_shacl():
+    if "shacl" in _installed:
+        return
+    import micropip
+
+    page = str(window.location.href)
+    for package in FEATURE_PACKAGES["shacl"]:
+        # Relative wheel paths are resolved against the page, not the worker
+        await micropip.install(urljoin(page, package))
+    _installed.add("shacl")
+
+
+async def validate() -> str:
+    global BF_GRAPH
+
+    _progress("Loading SHACL packages")
+    await _ensure_shacl()
+
+    def progress(done: int, total: int):
+        _progress(f"Validating shape {done + 1:,} of {total:,}")
+
+    try:
+        conforms, results_graph, delta_graph, revalidated = SHACL_VALIDATOR.validate(
+            BF_GRAPH, progress=progress
+        )
+    except Cancelled:
+        return json.dumps({"cancelled": True})
+    if revalidated is not None:
+        # Only return the results for the re-validated focus nodes
+        results_graph = delta_graph
+    return json.dumps({
+        "conforms": conforms,
+        "report": results_graph.serialize(format="turtle"),
+        "revalidated": revalidated,
+        "triples": len(BF_GRAPH),
+    })
+
+
+__export__ = ["apply_delta", "select", "validate"]
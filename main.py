@@ -8,6 +8,10 @@ import tomllib
 from pyodide.ffi import create_proxy
 from pyodide.http import pyfetch
 
+from lazy_packages import import_startup_packages, startup_report, timed
+
+import_startup_packages()
+
 import helpers
 
 import rdflib
@@ -17,12 +21,47 @@ FILE = pathlib.Path(".")
 
 SINOPIA = rdflib.Namespace("http://sinopia.io/vocabulary/")
 
-from bluecore_api import bluecore_login, save_bluecore, search_bluecore, set_environment
-from sinopia_api import show_groups
-from load_rdf import bibframe_sparql as bf_sparql_widget, build_graph, download_graph, load_cbd_file, load_uri
-from marc import bf2marc, marc2bf
-from query_rdf import download_query_results, run_query, run_summary_query
-from validation import validate
+with timed("bluecore_api"):
+    from bluecore_api import (
+        bluecore_login,
+        load_all_search_results,
+        save_bluecore,
+        search_bluecore,
+        search_results_page,
+        set_environment,
+    )
+with timed("sinopia_api"):
+    from sinopia_api import harvest_sinopia_group, show_groups
+with timed("load_rdf"):
+    from load_rdf import (
+        bibframe_sparql as bf_sparql_widget,
+        build_graph,
+        download_graph,
+        load_cbd_file,
+        load_cbd_zip_file,
+        load_session_file,
+        load_uri,
+        restore_session,
+        save_session,
+    )
+with timed("marc"):
+    from marc import bf2marc, marc2bf
+with timed("query_rdf"):
+    from query_rdf import (
+        cancel_graph_worker,
+        discard_update,
+        download_query_profiles,
+        download_query_results,
+        keep_update,
+        query_results_page,
+        redo_update,
+        run_query,
+        run_summary_query,
+        toggle_profiling,
+        undo_update,
+    )
+with timed("validation"):
+    from validation import validate
 
 bf_sparql_widget("bf-sparql-query")
 
@@ -40,3 +79,8 @@ helpers.set_versions(version)
 
 splash_modal_close_btn = js.document.getElementById("splashModalCloseBtn")
 splash_modal_close_btn.click()
+
+startup = startup_report()
+js.console.log(f"Startup timings {startup}")
+startup_time = js.document.getElementById("startup-time")
+startup_time.innerHTML = f"{startup['time_to_interactive']:.1f}s"
@@ -0,0 +1,49 @@
+import json
+
+import rdflib
+
+from jsonld_contexts import ContextRegistry, parse_jsonld
+from query_results import n3_term
+
+# Remote contexts sent by the main thread, which fetches them through
+# its resource cache
+JSONLD_CONTEXTS = ContextRegistry()
+
+
+def _missing_contexts(raw_rdf) -> list:
+    context_data = raw_rdf.get("@context") if isinstance(raw_rdf, dict) else None
+    if not isinstance(context_data, list):
+        context_data = [context_data]
+    return [
+        source for source in context_data
+        if isinstance(source, str) and source not in JSONLD_CONTEXTS.documents
+    ]
+
+
+def register_contexts(documents: str):
+    """Adds the {url: context} documents retrieved by the main thread"""
+    for url, context_data in json.loads(documents).items():
+        JSONLD_CONTEXTS.register(url, context_data)
+
+
+def parse_entry(name: str, rdf_type: str, text: str, skolemize: bool, resolved: bool) -> str:
+    """Parses one document into its own graph. Returns its triples as
+    N-Triples terms, the parser's error, or the remote JSON-LD contexts
+    to send with register_contexts before parsing again with resolved"""
+    graph = rdflib.Graph()
+    try:
+        if rdf_type == "json-ld":
+            raw_rdf = json.loads(text)
+            missing = _missing_contexts(raw_rdf)
+            if len(missing) > 0 and not resolved:
+                return json.dumps({"contexts": missing})
+            skolem_base = f"{name.strip()}#" if skolemize else None
+            parse_jsonld(raw_rdf, graph, JSONLD_CONTEXTS, skolem_base)
+        else:
+            graph.parse(data=text, format=rdf_type)
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+    return json.dumps({"triples": [[n3_term(term) for term in triple] for triple in graph]})
+
+
+__export__ = ["parse_entry", "register_contexts"]
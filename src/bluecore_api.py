@@ -1,12 +1,32 @@
+import asyncio
+import gzip
+import html
 import json
+import re
+
 import rdflib
 
 from datetime import datetime, timedelta, UTC
 from urllib.parse import urlencode
 
 from js import alert, console, document, File, FormData, sessionStorage
-from pyodide.http import AbortError, pyfetch
-from state import BLUECORE_ENV, BF_GRAPH
+from pyodide.ffi import to_js
+from change_tracker import is_anonymous
+from http_client import RequestError
+from load_rdf import ingest_jsonld, summarize_graph
+from state import (
+    BLUECORE_ENV,
+    CHANGE_TRACKER,
+    HTTP_CLIENT,
+    JSONLD_CONTEXTS,
+    MAX_CONCURRENT_FETCHES,
+    RESOURCE_CACHE,
+    SAVE_BATCH_BYTES,
+    SAVE_GZIP,
+    SEARCH_PAGE_SIZE,
+    SEARCH_RESULTS,
+    BF_GRAPH,
+)
 
 BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
 
@@ -16,31 +36,52 @@ def _expires_at(seconds: int) -> str:
     return expires.isoformat()
 
 
-def _add_search_item(item: dict, context: dict):
+def _local_name(term: str) -> str:
+    return re.split(r"[:/#]", term)[-1]
+
+
+def _values(value) -> list:
+    if not isinstance(value, list):
+        value = [value]
+    return [item.get("@value") if isinstance(item, dict) else item for item in value]
+
+
+def _main_titles(node) -> list:
+    """Finds the mainTitle of every bf:Title in a JSON-LD payload without
+    parsing it into a graph"""
+    titles = []
+    if isinstance(node, list):
+        for child in node:
+            titles.extend(_main_titles(child))
+    elif isinstance(node, dict):
+        types = node.get("@type", node.get("type", []))
+        is_title = "Title" in [_local_name(type_) for type_ in _values(types) if isinstance(type_, str)]
+        for key, value in node.items():
+            if key == "@context":
+                continue
+            if is_title and _local_name(key) == "mainTitle":
+                titles.extend(title for title in _values(value) if title is not None)
+            else:
+                titles.extend(_main_titles(value))
+    return titles
+
+
+def _add_search_item(item: dict, context: str):
     alert = document.createElement("div")
     for class_ in ["alert", "alert-info", "alert-dismissible", "fade", "show"]:
         alert.classList.add(class_)
     uri = item.get('uri')
     data = item.get('data')
     data["@context"] = context
-    graph = rdflib.Graph()
-    graph.parse(data=data, format='json-ld')
-    title_query = graph.query("""
-    SELECT ?mainTitle
-    WHERE {
-        ?title a bf:Title .
-        ?title bf:mainTitle ?mainTitle . 
-    }   
-    """,
-    initNs={"bf": BF})
-    main_titles = [main_title[0] for main_title in title_query]
+    # Parsed into BF_GRAPH only when the resource is loaded
+    SEARCH_RESULTS[uri] = data
+    main_titles = [html.escape(str(main_title)) for main_title in _main_titles(data)]
     alert.innerHTML = f"""<strong class="text-primary">Blue Core Resource</strong>
     <small>{item.get('type').title()}</small>
     <h3>{'\n'.join(main_titles)}</h3>
     <p>
       <a href="{uri}">{uri}</a>
     </p>
-    <textarea class="d-none" id="{uri}-rdf">{graph.serialize(format='json-ld')}</textarea>
     <button type="button" class="btn btn-success"
             data-uri="{item.get('uri')}" py-click="load_uri">Load</button>
     <button type="button" class="btn-close" data-bs-dismiss="alert" aria-label="Close"></button>
@@ -59,7 +100,7 @@ async def _get_keycloak_token():
     form_bytes = bytes(f"client_id=bluecore_api&username={keycloak_username}&password={keycloak_password}&grant_type=password",
                        encoding='utf-8')
     try:
-        token_request = await pyfetch(
+        token_request = await HTTP_CLIENT.request(
             f"{BLUECORE_ENV}/keycloak/realms/bluecore/protocol/openid-connect/token",
             method = "POST",
             headers={
@@ -74,7 +115,7 @@ async def _get_keycloak_token():
         else:
             error_text = await token_request.text()
             alert(f"Error retrieving token {error_text}")
-    except AbortError as e:
+    except RequestError as e:
         alert(f"Error! {e}")
         return
     
@@ -93,42 +134,202 @@ async def bluecore_login(event):
     close_btn.click()
 
 
+def _resource_batches(graph: rdflib.Graph, resources: list, max_bytes: int = SAVE_BATCH_BYTES):
+    """Groups the resources' JSON-LD descriptions into batches of roughly
+    max_bytes, a single resource larger than max_bytes gets its own batch"""
+    batch, batch_resources, batch_size = [], [], 0
+    for resource in resources:
+        nodes = json.loads(graph.cbd(resource).serialize(format="json-ld"))
+        size = len(json.dumps(nodes))
+        if len(batch) > 0 and batch_size + size > max_bytes:
+            yield batch_resources, batch
+            batch, batch_resources, batch_size = [], [], 0
+        batch.extend(nodes)
+        batch_resources.append(resource)
+        batch_size += size
+    if len(batch) > 0:
+        yield batch_resources, batch
+
+
+def _upload_file(batch: list, compress: bool = SAVE_GZIP):
+    payload = json.dumps(batch)
+    if compress:
+        return File.new([to_js(gzip.compress(payload.encode("utf-8")))],
+                        "upload.jsonld.gz",
+                        { "type": "application/gzip"})
+    return File.new([payload],
+                    "upload",
+                    { "type": "text/plain"})
+
+
 async def save_bluecore(event):
     global BLUECORE_ENV
     global BF_GRAPH
 
+    # currentTarget is already null once an async handler runs, the click
+    # may land on the icon inside the button
+    save_button = event.target.closest("[data-save-mode]")
+    save_mode = save_button.getAttribute("data-save-mode") if save_button is not None else "all"
     if BLUECORE_ENV is None:
         alert(f"Cannot save!\nBluecore Environment not set")
         return
-    if len(BF_GRAPH) < 0:
+    if len(BF_GRAPH) < 1:
         alert(f"Cannot save empty graph")
         return
-    access_token = sessionStorage.getItem("keycloak_access_token")
-    form_data = FormData.new()
-    
-    bf_upload_file = File.new([BF_GRAPH.serialize(format='json-ld')],
-                              "upload",
-                              { "type": "text/plain"})
-    form_data.append('file', bf_upload_file)
+    if save_mode == "changes":
+        changes = CHANGE_TRACKER.changes()
+        resources = changes["added"] + changes["modified"]
+    else:
+        changes = {"deleted": []}
+        resources = sorted(
+            subject for subject in set(BF_GRAPH.subjects()) if not is_anonymous(subject)
+        )
+    if len(resources) < 1 and len(changes["deleted"]) < 1:
+        alert(f"No changed resources to save")
+        return
     bench_heading = document.getElementById("bench-heading")
     bench_bc_result = document.getElementById("search-results")
     bench_bc_result.innerHTML = ""
-    batch_result = await pyfetch(
-        f"{BLUECORE_ENV}/api/batches/upload/",
-        method="POST",
-        headers={
-            "Authorization": f"Bearer {access_token}"
-        },
-        body=form_data
-    )
-    if batch_result.ok:
-        bench_heading.innerHTML = "Saving Graph to Blue Core API"
-        batch_message = await batch_result.json()
-        workflow_uri = f"{BLUECORE_ENV}/workflows/dags/resource_loader/runs/{batch_message.get('workflow_id')}"
-        bench_bc_result.innerHTML = f"""Workflow at <a href="{workflow_uri}" target="_blank">{workflow_uri}</a>"""
-    else:
+    bench_heading.innerHTML = f"Saving {len(resources):,} resources to Blue Core API"
+    workflows = document.createElement("ul")
+    bench_bc_result.append(workflows)
+    saved = 0
+    for batch_resources, batch in _resource_batches(BF_GRAPH, resources):
+        form_data = FormData.new()
+        form_data.append('file', _upload_file(batch))
+        workflow_item = document.createElement("li")
+        try:
+            batch_result = await HTTP_CLIENT.request(
+                f"{BLUECORE_ENV}/api/batches/upload/",
+                method="POST",
+                body=form_data,
+                auth=True,
+            )
+        except RequestError as e:
+            workflow_item.innerHTML = f"""<span class="text-danger">ERROR!!</span> {len(batch_resources):,} resources: {html.escape(str(e))}"""
+            workflows.append(workflow_item)
+            continue
+        if batch_result.ok:
+            batch_message = await batch_result.json()
+            workflow_uri = html.escape(f"{BLUECORE_ENV}/workflows/dags/resource_loader/runs/{batch_message.get('workflow_id')}")
+            workflow_item.innerHTML = f"""{len(batch_resources):,} resources, workflow at <a href="{workflow_uri}" target="_blank">{workflow_uri}</a>"""
+            CHANGE_TRACKER.mark_saved(batch_resources)
+            saved += len(batch_resources)
+        else:
+            error_text = await batch_result.text()
+            workflow_item.innerHTML = f"""<span class="text-danger">ERROR!!</span> {len(batch_resources):,} resources: {html.escape(error_text)}"""
+        workflows.append(workflow_item)
+        bench_heading.innerHTML = f"Saved {saved:,} of {len(resources):,} resources to Blue Core API"
+    if len(changes["deleted"]) > 0:
+        deleted = document.createElement("div")
+        deleted.innerHTML = "<strong>Deleted resources, not removed from Blue Core:</strong><ul>" + "".join(
+            f"<li>{html.escape(resource)}</li>" for resource in changes["deleted"]
+        ) + "</ul>"
+        bench_bc_result.append(deleted)
+
+
+def _consume_exception(task: asyncio.Task):
+    # A dropped page is never awaited, retrieving its error avoids
+    # asyncio's "Task exception was never retrieved" warning
+    if not task.cancelled():
+        task.exception()
+
+
+class _SearchPages:
+    """Pages of a Blue Core search, fetched as background tasks so the
+    next page can be requested while the current one is shown. Only the
+    shown page and the prefetched next page are kept."""
+
+    def __init__(self, query: str, page_size: int = SEARCH_PAGE_SIZE):
+        self.query = query
+        self.page_size = page_size
+        self.total = 0
+        self.context = f"{BLUECORE_ENV}/api/context.jsonld"
+        self.pages = {}
+
+    async def _fetch(self, offset: int) -> dict:
+        search_url = f"{BLUECORE_ENV}/api/search/?" + urlencode(
+            { "q": self.query, "limit": self.page_size, "offset": offset }
+        )
+        search_result = await HTTP_CLIENT.request(search_url)
+        if not search_result.ok:
+            error_text = await search_result.text()
+            raise ValueError(f"{search_result.status} {error_text}")
+        search_result_json = await search_result.json()
+        self.total = int(search_result_json.get('total', 0))
+        return search_result_json
+
+    def page(self, offset: int) -> asyncio.Task:
+        task = self.pages.get(offset)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            # Failed pages are fetched again
+            task = self.pages[offset] = asyncio.ensure_future(self._fetch(offset))
+        return task
+
+    def fetch(self, offset: int):
+        """Awaitable page that is only kept if it already was"""
+        if offset in self.pages:
+            return self.page(offset)
+        return self._fetch(offset)
+
+    def prefetch(self, offset: int):
+        if 0 <= offset < self.total:
+            self.page(offset)
+
+    def retain(self, *offsets: int):
+        for offset in [offset for offset in self.pages if offset not in offsets]:
+            self.pages.pop(offset).add_done_callback(_consume_exception)
+
+    def close(self):
+        self.retain()
+
+    def offsets(self) -> list:
+        return list(range(0, self.total, self.page_size))
+
+
+SEARCH_PAGES = None
+
+
+def _search_pager(offset: int, count: int, total: int, page_size: int) -> str:
+    return f"""<div class="d-flex align-items-center m-1">
+  <button class="btn btn-sm btn-outline-secondary" py-click="search_results_page"
+          data-offset="{offset - page_size}" {'disabled' if offset < 1 else ''}>&laquo; Previous</button>
+  <span class="mx-2">Results {offset + 1 if count > 0 else 0:,}&ndash;{offset + count:,} of {total:,}</span>
+  <button class="btn btn-sm btn-outline-secondary" py-click="search_results_page"
+          data-offset="{offset + page_size}" {'disabled' if offset + count >= total else ''}>Next &raquo;</button>
+  <button class="btn btn-sm btn-success ms-2" py-click="load_all_search_results"
+          {'disabled' if total < 1 else ''}>Load all {total:,} into graph</button>
+</div>"""
+
+
+async def _render_search_page(offset: int):
+    bench_heading = document.getElementById("bench-heading")
+    bench_bc_results = document.getElementById("search-results")
+    try:
+        search_result_json = await SEARCH_PAGES.page(offset)
+    except Exception as e:
         bench_heading.innerHTML = """<span class="text-danger">ERROR!!</span>"""
-        bench_bc_result.innerHTML = await batch_result.text
+        bench_bc_results.innerHTML = html.escape(str(e))
+        return
+    # Fetch the following page while this one is being read
+    SEARCH_PAGES.retain(offset, offset + SEARCH_PAGES.page_size)
+    SEARCH_PAGES.prefetch(offset + SEARCH_PAGES.page_size)
+    total_results = SEARCH_PAGES.total
+    if total_results < 1:
+        bench_heading.innerHTML = """<h3>No results from Blue Core</h3>"""
+    else:
+        bench_heading.innerHTML = f"""<h3>{total_results:,} results from Blue Core</h3>"""
+    results = search_result_json.get("results", [])
+    bench_bc_results.innerHTML = ""
+    SEARCH_RESULTS.clear()
+    div_query = document.createElement("div")
+    div_query.innerHTML = f"""<strong>Query:</strong><p>{html.escape(SEARCH_PAGES.query)}</p>""" + _search_pager(
+        offset, len(results), total_results, SEARCH_PAGES.page_size
+    )
+    bench_bc_results.append(div_query)
+    for item in results:
+        alert = _add_search_item(item, SEARCH_PAGES.context)
+        bench_bc_results.append(alert)
 
 
 async def search_bluecore(event):
@@ -136,36 +337,76 @@ async def search_bluecore(event):
     Searches Blue Core using API
     """
     global BLUECORE_ENV
+    global SEARCH_PAGES
 
     query_elem = document.getElementById("ai-search-resources")
-    bench_heading = document.getElementById("bench-heading")
     search_results_tab = document.getElementById("search-results-tab")
     search_results_tab.classList.remove("d-none")
     bench_bc_results = document.getElementById("search-results")
     for class_ in ["active", "show"]:
         bench_bc_results.classList.add(class_)
     bench_bc_results.innerHTML = ""
-    search_url = f"{BLUECORE_ENV}/api/search/?" + urlencode({ "q": query_elem.value })
-    search_result = await pyfetch(search_url)
-    if search_result.ok:
-        search_result_json = await search_result.json()
-        total_results = int(search_result_json.get('total', 0))
-        if total_results < 1:
-            bench_heading.innerHTML = """<h3>No results from Blue Core</h3>"""
+    SEARCH_RESULTS.clear()
+    if SEARCH_PAGES is not None:
+        SEARCH_PAGES.close()
+    SEARCH_PAGES = _SearchPages(query_elem.value)
+    context_status, context_text = await RESOURCE_CACHE.fetch(SEARCH_PAGES.context)
+    await RESOURCE_CACHE.flush()
+    if context_status >= 400:
+        alert(f"Error retrieving {SEARCH_PAGES.context}\n{context_text}")
+        return
+    # Items refer to the context by URL, it is processed once on first load
+    JSONLD_CONTEXTS.register(SEARCH_PAGES.context, json.loads(context_text)["@context"])
+    await _render_search_page(0)
+
+
+async def search_results_page(event):
+    if SEARCH_PAGES is None:
+        return
+    offset = int(event.target.getAttribute("data-offset"))
+    await _render_search_page(max(offset, 0))
+
+
+async def load_all_search_results(event):
+    global BF_GRAPH
+
+    if SEARCH_PAGES is None:
+        return
+    bench_heading = document.getElementById("bench-heading")
+    loading_spinner = document.getElementById("graph-loading-status")
+    loading_spinner.classList.remove("d-none")
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+    offsets = SEARCH_PAGES.offsets()
+    loaded, failed = 0, 0
+
+    async def fetch_page(offset: int):
+        async with semaphore:
+            try:
+                return await SEARCH_PAGES.fetch(offset), None
+            except Exception as e:
+                return None, e
+
+    for page in asyncio.as_completed([fetch_page(offset) for offset in offsets]):
+        search_result_json, error = await page
+        if error is not None:
+            console.log(f"Search page failed {error}")
+            failed += SEARCH_PAGES.page_size
         else:
-            bench_heading.innerHTML = f"""<h3>{total_results:,} results from Blue Core</h3>"""
-
-        div_query = document.createElement("div")
-        div_query.innerHTML = f"""<strong>Query:</strong><p>{query_elem.value}</p>"""
-        bench_bc_results.append(div_query)
-        context_result = await pyfetch(f"{BLUECORE_ENV}/api/context.jsonld")
-        if context_result.ok:
-            context_payload = await context_result.json()
-            context = context_payload["@context"]
             for item in search_result_json.get("results", []):
-                alert = _add_search_item(item, context)
-                bench_bc_results.append(alert)
-        
+                data = item.get("data")
+                data["@context"] = SEARCH_PAGES.context
+                try:
+                    with CHANGE_TRACKER.loading():
+                        ingest_jsonld(item.get("uri"), data)
+                    loaded += 1
+                except Exception as e:
+                    console.log(f"Could not load {item.get('uri')} {e}")
+                    failed += 1
+        bench_heading.innerHTML = f"""Loading Search Results <span class="badge text-bg-success">{loaded:,} loaded</span>
+    <span class="badge text-bg-danger">{failed:,} failed</span>
+    <span class="badge text-bg-secondary">{SEARCH_PAGES.total:,} total</span>"""
+    loading_spinner.classList.add("d-none")
+    summarize_graph(BF_GRAPH)
 
 
 async def set_environment(this):
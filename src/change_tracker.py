@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from itertools import count
+
+import rdflib
+
+from rdflib.term import rdflib_skolem_genid
+
+
+def is_anonymous(node) -> bool:
+    return isinstance(node, rdflib.BNode) or (
+        isinstance(node, rdflib.URIRef) and rdflib_skolem_genid in node
+    )
+
+
+class ChangeTracker:
+    """Records the resources of an observed store that were added,
+    modified or deleted since they were loaded or last saved.
+
+    Changes to blank (or skolemized) nodes are attributed to the IRI
+    resources that reference them when the changes are collected.
+    """
+
+    def __init__(self, graph: rdflib.Graph):
+        self.graph = graph
+        self.baseline = set()
+        self.dirty = set()
+        self._loading = 0
+        # Changes whenever dirty does, never going back to an earlier value
+        # except through restore
+        self.generation = 0
+        self._generations = count(1)
+
+    @contextmanager
+    def loading(self):
+        """Triples added inside the block are treated as the saved state"""
+        self._loading += 1
+        try:
+            yield self
+        finally:
+            self._loading -= 1
+
+    def _touch(self, subject):
+        if self._loading > 0:
+            if not is_anonymous(subject):
+                self.baseline.add(subject)
+            return
+        self.dirty.add(subject)
+        self.generation = next(self._generations)
+
+    def triple_added(self, triple):
+        self._touch(triple[0])
+
+    def triple_removed(self, triple):
+        self._touch(triple[0])
+
+    def _roots(self, node) -> set:
+        if not is_anonymous(node):
+            return {node}
+        roots, seen, frontier = set(), {node}, [node]
+        while len(frontier) > 0:
+            current = frontier.pop()
+            for referrer in self.graph.subjects(None, current):
+                if not is_anonymous(referrer):
+                    roots.add(referrer)
+                elif referrer not in seen:
+                    seen.add(referrer)
+                    frontier.append(referrer)
+        return roots
+
+    def changes(self) -> dict:
+        """Returns the added, modified and deleted IRI resources"""
+        resources = set()
+        for node in self.dirty:
+            resources.update(self._roots(node))
+        changes = {"added": [], "modified": [], "deleted": []}
+        for resource in sorted(resources):
+            if (resource, None, None) in self.graph:
+                status = "modified" if resource in self.baseline else "added"
+            elif resource in self.baseline:
+                status = "deleted"
+            else:
+                continue
+            changes[status].append(resource)
+        return changes
+
+    def mark_saved(self, resources: list):
+        for resource in resources:
+            if (resource, None, None) in self.graph:
+                self.baseline.add(resource)
+            else:
+                self.baseline.discard(resource)
+        # Saved resources and the blank nodes they own are clean again
+        saved = set(resources)
+        self.dirty = {node for node in self.dirty if not self._roots(node) <= saved}
+        self.generation = next(self._generations)
+
+    def checkpoint(self) -> tuple:
+        """The dirty nodes and their generation, for restore"""
+        return self.generation, frozenset(self.dirty)
+
+    def restore(self, checkpoint: tuple):
+        """Returns to a checkpoint's dirty nodes, for when the graph is
+        back to its state at that checkpoint"""
+        self.generation, dirty = checkpoint
+        self.dirty = set(dirty)
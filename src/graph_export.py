@@ -0,0 +1,87 @@
+import re
+import zlib
+
+import rdflib
+
+from rdflib.plugins.serializers.nquads import _nq_row
+from rdflib.plugins.serializers.nt import _nt_row, _quoteLiteral
+
+
+# Conservative PN_LOCAL, anything else is written as a full IRI
+LOCAL_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_\-]*$")
+
+
+def join_chunks(parts, chunk_size: int):
+    """Joins strings into chunks of at least chunk_size characters"""
+    chunk, size = [], 0
+    for part in parts:
+        chunk.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if len(chunk) > 0:
+        yield "".join(chunk)
+
+
+def ntriples_chunks(graph: rdflib.Graph, chunk_size: int = 1_048_576):
+    return join_chunks((_nt_row(triple) for triple in graph), chunk_size)
+
+
+def nquads_chunks(graph: rdflib.Graph, chunk_size: int = 1_048_576):
+    if not isinstance(graph.identifier, rdflib.URIRef):
+        # An unnamed graph is the default graph, written as plain triples
+        return ntriples_chunks(graph, chunk_size)
+    return join_chunks((_nq_row(triple, graph.identifier) for triple in graph), chunk_size)
+
+
+class _TurtleTerms:
+    """Writes IRIs as prefixed names when their namespace, everything up
+    to the last / or #, is bound"""
+
+    def __init__(self, graph: rdflib.Graph):
+        self.prefixes = {str(namespace): prefix for prefix, namespace in graph.namespaces()}
+
+    def iri(self, iri) -> str:
+        split = max(iri.rfind("/"), iri.rfind("#")) + 1
+        prefix = self.prefixes.get(iri[:split])
+        if prefix is not None and LOCAL_NAME.match(iri[split:]):
+            return f"{prefix}:{iri[split:]}"
+        return iri.n3()
+
+    def term(self, term) -> str:
+        if isinstance(term, rdflib.Literal):
+            return _quoteLiteral(term)
+        if isinstance(term, rdflib.URIRef):
+            return self.iri(term)
+        return term.n3()
+
+
+def _turtle_parts(graph: rdflib.Graph):
+    terms = _TurtleTerms(graph)
+    for prefix, namespace in graph.namespaces():
+        yield f"@prefix {prefix}: <{namespace}> .\n"
+    yield "\n"
+    for subject in graph.subjects(unique=True):
+        statements = []
+        for predicate in sorted(set(graph.predicates(subject))):
+            verb = "a" if predicate == rdflib.RDF.type else terms.term(predicate)
+            objects = ",\n        ".join(terms.term(object_) for object_ in graph.objects(subject, predicate))
+            statements.append(f"{verb} {objects}")
+        yield f"{terms.term(subject)} " + " ;\n    ".join(statements) + " .\n\n"
+
+
+def turtle_chunks(graph: rdflib.Graph, chunk_size: int = 1_048_576):
+    """Turtle one subject at a time, blank nodes as labels rather than
+    nested, so nothing but the current subject is held in memory"""
+    return join_chunks(_turtle_parts(graph), chunk_size)
+
+
+def gzip_chunks(chunks, level: int = 6):
+    """Compresses text chunks into a single gzip stream"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if len(compressed) > 0:
+            yield compressed
+    yield compressor.flush()
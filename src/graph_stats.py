@@ -0,0 +1,65 @@
+from collections import Counter
+
+import rdflib
+
+
+class GraphStatistics:
+    """Subject, predicate, object and class cardinalities kept up to date
+    from an observed store's add/remove notifications."""
+
+    def __init__(self):
+        self.subjects = Counter()
+        self.predicates = Counter()
+        self.objects = Counter()
+        self.classes = Counter()
+
+    def _decrement(self, counter: Counter, term):
+        counter[term] -= 1
+        if counter[term] < 1:
+            del counter[term]
+
+    def triple_added(self, triple):
+        subject, predicate, object_ = triple
+        self.subjects[subject] += 1
+        self.predicates[predicate] += 1
+        self.objects[object_] += 1
+        if predicate == rdflib.RDF.type:
+            self.classes[object_] += 1
+
+    def triple_removed(self, triple):
+        subject, predicate, object_ = triple
+        self._decrement(self.subjects, subject)
+        self._decrement(self.predicates, predicate)
+        self._decrement(self.objects, object_)
+        if predicate == rdflib.RDF.type:
+            self._decrement(self.classes, object_)
+
+    def rebuild(self, graph: rdflib.Graph):
+        for counter in [self.subjects, self.predicates, self.objects, self.classes]:
+            counter.clear()
+        for triple in graph:
+            self.triple_added(triple)
+
+    def instance_count(self, class_: rdflib.URIRef) -> int:
+        return self.classes.get(class_, 0)
+
+    def class_histogram(self, limit: int | None = None) -> list:
+        return self.classes.most_common(limit)
+
+    def predicate_histogram(self, limit: int | None = None) -> list:
+        return self.predicates.most_common(limit)
+
+
+def graph_statistics(graph: rdflib.Graph) -> GraphStatistics:
+    """Returns the statistics tracker attached to the graph's store, attaching
+    (and populating) one if the store is observable and has none yet."""
+    listeners = getattr(graph.store, "listeners", None)
+    if listeners is not None:
+        for listener in listeners:
+            if isinstance(listener, GraphStatistics):
+                return listener
+    stats = GraphStatistics()
+    stats.rebuild(graph)
+    if listeners is not None:
+        listeners.append(stats)
+    return stats
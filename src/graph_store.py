@@ -0,0 +1,292 @@
+import heapq
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+import rdflib
+
+from rdflib.plugins.stores.memory import Memory
+from rdflib.store import Store
+
+
+class Observed:
+    """Mixin for rdflib stores that notifies listeners of the triples
+    actually added to or removed from the store.
+
+    Listeners implement ``triple_added(triple)`` and ``triple_removed(triple)``.
+    The ``version`` counter is bumped on every change so callers can cheaply
+    tell whether the graph has been modified.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.listeners = []
+        self.version = 0
+
+    def _exists(self, triple) -> bool:
+        for _ in self.triples(triple):
+            return True
+        return False
+
+    def add(self, triple, context, quoted=False):
+        is_new = not self._exists(triple)
+        super().add(triple, context, quoted=quoted)
+        if is_new:
+            self.version += 1
+            for listener in self.listeners:
+                listener.triple_added(triple)
+
+    def remove(self, triple_pattern, context=None):
+        matches = [triple for triple, _ in self.triples(triple_pattern, context=context)]
+        super().remove(triple_pattern, context=context)
+        removed = [triple for triple in matches if not self._exists(triple)]
+        if len(removed) > 0:
+            self.version += 1
+        for triple in removed:
+            for listener in self.listeners:
+                listener.triple_removed(triple)
+
+
+class ObservedMemory(Observed, Memory):
+    """rdflib Memory store with listeners and a version counter"""
+
+
+# Index name, the triple positions it is sorted by, and the patterns it
+# answers keyed by which of subject, predicate and object are bound
+ORDERS = {"spo": (0, 1, 2), "pos": (1, 2, 0), "osp": (2, 0, 1)}
+
+PATTERN_INDEX = {
+    (True, True, True): "spo",
+    (True, True, False): "spo",
+    (True, False, False): "spo",
+    (False, False, False): "spo",
+    (False, True, True): "pos",
+    (False, True, False): "pos",
+    (False, False, True): "osp",
+    (True, False, True): "osp",
+}
+
+
+class ArrayStore(Store):
+    """Compact, non context-aware rdflib store.
+
+    Terms are interned to integer ids and every triple is kept as three
+    ids in the SPO, POS and OSP indexes, each a set of three sorted
+    ``array("I")`` columns searched with bisect. Changes go to a small
+    delta (added triples and removed base triples) that is merged into
+    the arrays once it outgrows ``max(min_delta, len(self) * delta_ratio)``.
+
+    Interned terms are only released when the store is emptied.
+    """
+
+    context_aware = False
+    formula_aware = False
+    graph_aware = False
+    transaction_aware = False
+
+    def __init__(self, configuration=None, identifier=None, min_delta: int = 10_000, delta_ratio: float = 0.25):
+        super().__init__(configuration)
+        self.identifier = identifier
+        self.min_delta = min_delta
+        self.delta_ratio = delta_ratio
+        self._namespaces = {}
+        self._prefixes = {}
+        self._reset()
+
+    def _reset(self):
+        self.terms = []
+        self.ids = {}
+        self.indexes = {name: (array("I"), array("I"), array("I")) for name in ORDERS}
+        self.base_size = 0
+        self.added = set()
+        self.added_by = ({}, {}, {})
+        self.removed = set()
+        self.compactions = 0
+
+    def _intern(self, term) -> int:
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = self.ids[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def _range(self, name: str, prefix: tuple) -> tuple:
+        """Rows of an index whose leading columns equal prefix"""
+        columns = self.indexes[name]
+        lo, hi = 0, len(columns[0])
+        for column, value in zip(columns, prefix):
+            lo = bisect_left(column, value, lo, hi)
+            hi = bisect_right(column, value, lo, hi)
+        return lo, hi
+
+    def _in_base(self, ids: tuple) -> bool:
+        lo, hi = self._range("spo", ids)
+        return lo < hi
+
+    def has_triple(self, triple) -> bool:
+        ids = tuple(self.ids.get(term) for term in triple)
+        if None in ids:
+            return False
+        return ids in self.added or (ids not in self.removed and self._in_base(ids))
+
+    def _delta_matches(self, ids: tuple) -> list:
+        candidates = None
+        for position, term_id in enumerate(ids):
+            if term_id is None:
+                continue
+            found = self.added_by[position].get(term_id, ())
+            if candidates is None or len(found) < len(candidates):
+                candidates = found
+        if candidates is None:
+            candidates = self.added
+        return [
+            triple for triple in candidates
+            if all(term_id is None or term_id == value for term_id, value in zip(ids, triple))
+        ]
+
+    def _match_ids(self, pattern: tuple):
+        ids = []
+        for term in pattern:
+            if term is None:
+                ids.append(None)
+                continue
+            term_id = self.ids.get(term)
+            if term_id is None:
+                return
+            ids.append(term_id)
+        ids = tuple(ids)
+        name = PATTERN_INDEX[tuple(term_id is not None for term_id in ids)]
+        order = ORDERS[name]
+        prefix = []
+        for position in order:
+            if ids[position] is None:
+                break
+            prefix.append(ids[position])
+        # The matching rows and delta are copied, so adding to the store
+        # while iterating is harmless
+        columns, removed = self.indexes[name], self.removed
+        delta = self._delta_matches(ids)
+        lo, hi = self._range(name, tuple(prefix))
+        base = zip(*(columns[order.index(position)][lo:hi] for position in range(3)))
+        if len(removed) > 0:
+            base = (triple for triple in base if triple not in removed)
+        yield from base
+        yield from delta
+
+    def _contexts(self):
+        return (context for context in ())
+
+    def add(self, triple, context, quoted=False):
+        Store.add(self, triple, context, quoted)
+        ids = tuple(self._intern(term) for term in triple)
+        if ids in self.added:
+            return
+        if self._in_base(ids):
+            self.removed.discard(ids)
+            return
+        self.added.add(ids)
+        for position, term_id in enumerate(ids):
+            self.added_by[position].setdefault(term_id, set()).add(ids)
+        self._maybe_compact()
+
+    def _discard_added(self, ids: tuple):
+        self.added.discard(ids)
+        for position, term_id in enumerate(ids):
+            triples = self.added_by[position][term_id]
+            triples.discard(ids)
+            if len(triples) < 1:
+                del self.added_by[position][term_id]
+
+    def remove(self, triple_pattern, context=None):
+        Store.remove(self, triple_pattern, context=context)
+        if triple_pattern == (None, None, None):
+            self._reset()
+            return
+        for ids in list(self._match_ids(triple_pattern)):
+            if ids in self.added:
+                self._discard_added(ids)
+            else:
+                self.removed.add(ids)
+        self._maybe_compact()
+
+    def triples(self, triple_pattern, context=None):
+        terms = self.terms
+        for s, p, o in self._match_ids(triple_pattern):
+            yield (terms[s], terms[p], terms[o]), self._contexts()
+
+    def __len__(self, context=None) -> int:
+        return self.base_size - len(self.removed) + len(self.added)
+
+    def _maybe_compact(self):
+        if len(self.added) + len(self.removed) > max(self.min_delta, len(self) * self.delta_ratio):
+            self.compact()
+
+    def compact(self):
+        """Merges the delta into the sorted index arrays"""
+        indexes = {}
+        for name, order in ORDERS.items():
+            base = zip(*self.indexes[name])
+            if len(self.removed) > 0:
+                removed = {tuple(triple[position] for position in order) for triple in self.removed}
+                base = (row for row in base if row not in removed)
+            added = sorted(tuple(triple[position] for position in order) for triple in self.added)
+            columns = (array("I"), array("I"), array("I"))
+            for row in heapq.merge(base, added):
+                columns[0].append(row[0])
+                columns[1].append(row[1])
+                columns[2].append(row[2])
+            indexes[name] = columns
+        self.indexes = indexes
+        self.base_size = len(indexes["spo"][0])
+        self.added = set()
+        self.added_by = ({}, {}, {})
+        self.removed = set()
+        self.compactions += 1
+
+    def contexts(self, triple=None):
+        return self._contexts()
+
+    def bind(self, prefix: str, namespace, override: bool = True):
+        # Same rules as rdflib's Memory store
+        bound_namespace = self._namespaces.get(prefix)
+        bound_prefix = self._prefixes.get(namespace)
+        if bound_prefix is None:
+            bound_prefix = self._prefixes.get(bound_namespace)
+        if override:
+            if bound_prefix is not None:
+                del self._namespaces[bound_prefix]
+            if bound_namespace is not None:
+                del self._prefixes[bound_namespace]
+            self._prefixes[namespace] = prefix
+            self._namespaces[prefix] = namespace
+        else:
+            namespace = bound_namespace if bound_namespace is not None else namespace
+            prefix = bound_prefix if bound_prefix is not None else prefix
+            self._prefixes[namespace] = prefix
+            self._namespaces[prefix] = namespace
+
+    def namespace(self, prefix: str):
+        return self._namespaces.get(prefix)
+
+    def prefix(self, namespace):
+        return self._prefixes.get(namespace)
+
+    def namespaces(self):
+        yield from self._namespaces.items()
+
+    def stats(self) -> dict:
+        return {
+            "triples": len(self),
+            "terms": len(self.terms),
+            "delta": len(self.added) + len(self.removed),
+            "compactions": self.compactions,
+        }
+
+
+class ObservedArrayStore(Observed, ArrayStore):
+    """ArrayStore with listeners and a version counter"""
+
+    def _exists(self, triple) -> bool:
+        if None in triple:
+            return super()._exists(triple)
+        return self.has_triple(triple)
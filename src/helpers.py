@@ -1,7 +1,12 @@
+import asyncio
+import functools
+import time
+
 import markdown
 import rdflib
 
-from js import console, document
+from js import Blob, console, document
+from pyodide.ffi import to_js
     
 BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
 
@@ -29,4 +34,42 @@ async def py_repl(event):
 async def remove_errors(class_name="py-error"):
     py_errors = document.getElementsByClassName(class_name)
     for element in py_errors:
-        element.parentNode.removeChild(element)
\ No newline at end of file
+        element.parentNode.removeChild(element)
+
+
+def async_ttl_cache(seconds: float):
+    """Caches the results of an async function per arguments for seconds,
+    concurrent callers share the same in-flight call and failures are
+    not cached"""
+    def decorator(function):
+        entries = {}
+
+        @functools.wraps(function)
+        async def wrapper(*args):
+            entry = entries.get(args)
+            if entry is None or time.monotonic() - entry[0] > seconds:
+                entry = (time.monotonic(), asyncio.ensure_future(function(*args)))
+                entries[args] = entry
+            try:
+                return await asyncio.shield(entry[1])
+            except Exception:
+                if entries.get(args) is entry:
+                    del entries[args]
+                raise
+
+        return wrapper
+    return decorator
+
+
+async def chunked_blob(chunks, mime_type: str, label: str = "Exporting"):
+    """Builds a Blob a chunk (str or bytes) at a time, folding each into
+    the previous Blob so only the current chunk is held in Python"""
+    bench_heading = document.getElementById("bench-heading")
+    blob = Blob.new([], {"type": mime_type})
+    for chunk in chunks:
+        part = to_js(chunk) if isinstance(chunk, bytes) else chunk
+        blob = Blob.new([blob, part], {"type": mime_type})
+        bench_heading.innerHTML = f"<h2>{label} {blob.size:,} bytes</h2>"
+        # Let the browser repaint between chunks
+        await asyncio.sleep(0)
+    return blob
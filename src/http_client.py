@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+# Retried for idempotent methods, the request can safely be sent again
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Retried for POST and PATCH, statuses where the server did not process
+# the request, a 502 or timeout may come after it was accepted
+UNPROCESSED_STATUSES = {429, 503}
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class RequestError(Exception):
+    """Raised when a request fails without a response, after all retries"""
+
+    def __init__(self, url: str, reason: str):
+        super().__init__(f"{url}: {reason}")
+        self.url = url
+        self.reason = reason
+
+
+class Response:
+    """Response with its body already read, mirrors the parts of pyfetch's
+    FetchResponse used in the toolbox"""
+
+    def __init__(self, url: str, status: int, headers: dict, body: str):
+        self.url = url
+        self.status = status
+        self.ok = 200 <= status < 300
+        self.headers = headers
+        self.body = body
+
+    async def text(self) -> str:
+        return self.body
+
+    async def json(self):
+        return json.loads(self.body)
+
+
+def endpoint(url: str) -> str:
+    """Groups URLs by host and the first two path segments, identifiers
+    collapsed, so resources of the same kind share counters"""
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split("/") if len(segment) > 0]
+    segments = ["{id}" if any(char.isdigit() for char in segment) else segment for segment in segments[:2]]
+    return f"{parts.netloc}/{'/'.join(segments)}"
+
+
+class HTTPClient:
+    """Shared client for every request the toolbox makes, limits the
+    requests in flight to max_concurrent, retries 429 and 5xx responses
+    with exponential backoff, times out slow requests and keeps
+    per-endpoint counters. POST and PATCH requests are only retried when
+    the server answers 429 or 503.
+
+    The transport defaults to pyfetch and can be replaced by any async
+    callable with the same signature, access_token by any callable
+    returning the bearer token for auth requests.
+    """
+
+    def __init__(
+        self,
+        transport=None,
+        max_concurrent: int = 8,
+        retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 60.0,
+        access_token=None,
+    ):
+        self.transport = transport
+        self.access_token = access_token
+        self.max_concurrent = max_concurrent
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.endpoints = defaultdict(
+            lambda: {"requests": 0, "retries": 0, "errors": 0, "seconds": 0.0, "bytes": 0}
+        )
+
+    def _token(self) -> str | None:
+        if self.access_token is not None:
+            return self.access_token()
+        import js
+
+        return js.sessionStorage.getItem("keycloak_access_token")
+
+    async def _send(self, url: str, options: dict) -> Response:
+        if self.transport is None:
+            from pyodide.http import pyfetch
+
+            self.transport = pyfetch
+        response = await self.transport(url, **options)
+        body = await response.text()
+        headers = {key.lower(): value for key, value in dict(response.headers).items()}
+        return Response(url, response.status, headers, body)
+
+    def _delay(self, attempt: int, response: Response | None) -> float:
+        if response is not None and response.headers.get("retry-after", "").isdigit():
+            return float(response.headers["retry-after"])
+        return self.backoff * 2 ** attempt
+
+    async def request(
+        self,
+        url: str,
+        method: str = "GET",
+        headers: dict | None = None,
+        body=None,
+        auth: bool = False,
+    ) -> Response:
+        headers = dict(headers or {})
+        if auth:
+            access_token = self._token()
+            if access_token:
+                headers["Authorization"] = f"Bearer {access_token}"
+        options = {"method": method, "headers": headers}
+        if body is not None:
+            options["body"] = body
+        counters = self.endpoints[endpoint(url)]
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES
+        for attempt in range(self.retries + 1):
+            response, error = None, None
+            async with self.semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(self._send(url, options), self.timeout)
+                except asyncio.TimeoutError:
+                    error = f"timed out after {self.timeout}s"
+                except Exception as e:
+                    error = str(e)
+                counters["requests"] += 1
+                counters["seconds"] += time.perf_counter() - start
+            if response is not None:
+                counters["bytes"] += len(response.body)
+                if response.status not in retry_statuses:
+                    return response
+            elif not idempotent:
+                # The request may have reached the server before failing
+                break
+            if attempt == self.retries:
+                break
+            counters["retries"] += 1
+            await asyncio.sleep(self._delay(attempt, response))
+        counters["errors"] += 1
+        if response is not None:
+            return response
+        raise RequestError(url, error)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                **counters,
+                "mean_ms": round(counters["seconds"] * 1000 / max(counters["requests"], 1), 1),
+            }
+            for name, counters in self.endpoints.items()
+        }
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import time
+
+import rdflib
+
+from rdflib.plugins.parsers import jsonld
+from rdflib.plugins.shared.jsonld.context import Context
+
+
+class ContextRegistry:
+    """Processes each JSON-LD @context once per session and shares the
+    resulting term definitions across every parse that uses it.
+
+    Remote contexts are keyed by URL, inline contexts by a hash of their
+    content.
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.contexts = {}
+        # Keys of the processed contexts each remote context went into
+        self.dependents = {}
+        self.hits = 0
+        self.misses = 0
+        self.processing_time = 0.0
+
+    def _key(self, context_data) -> str:
+        if isinstance(context_data, str):
+            return context_data
+        serialized = json.dumps(context_data, sort_keys=True)
+        return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+    def _sources(self, context_data) -> list:
+        if not isinstance(context_data, list):
+            context_data = [context_data]
+        return [self.documents.get(source, source) if isinstance(source, str) else source
+                for source in context_data]
+
+    def register(self, url: str, context_data):
+        """Adds an already retrieved remote context, dropping any context
+        processed from an earlier document at the same URL"""
+        self.documents[url] = context_data
+        for key in self.dependents.pop(url, ()):
+            self.contexts.pop(key, None)
+
+    async def resolve(self, context_data, fetch):
+        """Retrieves any remote contexts not seen yet with fetch, an async
+        function returning the (status, text) for a URL"""
+        if not isinstance(context_data, list):
+            context_data = [context_data]
+        for source in context_data:
+            if isinstance(source, str) and source not in self.documents:
+                status, text = await fetch(source)
+                if status < 400:
+                    self.register(source, json.loads(text).get("@context", {}))
+
+    def get(self, context_data) -> Context:
+        key = self._key(context_data)
+        context = self.contexts.get(key)
+        if context is not None:
+            self.hits += 1
+            return context
+        self.misses += 1
+        start = time.perf_counter()
+        context = Context()
+        context.load(self._sources(context_data))
+        self.processing_time += time.perf_counter() - start
+        self.contexts[key] = context
+        sources = context_data if isinstance(context_data, list) else [context_data]
+        for source in sources:
+            if isinstance(source, str):
+                self.dependents.setdefault(source, set()).add(key)
+        return context
+
+    def stats(self) -> dict:
+        return {
+            "contexts": len(self.contexts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "processing_ms": round(self.processing_time * 1000, 2),
+        }
+
+
+class _ResourceSink(rdflib.Graph):
+    """Graph view over another graph's store that gives the blank nodes
+    of a single document fresh labels as triples are added, so documents
+    reusing labels like _:b0 don't share nodes."""
+
+    def __init__(self, graph: rdflib.Graph):
+        super().__init__(
+            store=graph.store,
+            identifier=graph.identifier,
+            namespace_manager=graph.namespace_manager,
+        )
+        self.bnodes = {}
+
+    def _term(self, term):
+        if isinstance(term, rdflib.BNode):
+            return self.bnodes.setdefault(term, rdflib.BNode())
+        return term
+
+    def add(self, triple):
+        subject, predicate, object_ = triple
+        return super().add((self._term(subject), predicate, self._term(object_)))
+
+
+class _SkolemizingSink(_ResourceSink):
+    """Replaces blank nodes with skolem IRIs scoped to the resource"""
+
+    def __init__(self, graph: rdflib.Graph, basepath: str):
+        super().__init__(graph)
+        self.basepath = basepath
+
+    def _term(self, term):
+        if isinstance(term, rdflib.BNode):
+            return term.skolemize(basepath=self.basepath)
+        return term
+
+
+def parse_jsonld(raw_rdf, graph: rdflib.Graph, contexts: ContextRegistry | None = None, skolem_base: str | None = None):
+    """Parses a JSON-LD document into graph in a single pass, with the
+    document's @context processed through contexts when given"""
+    if isinstance(raw_rdf, str):
+        raw_rdf = json.loads(raw_rdf)
+    if skolem_base is None:
+        sink = _ResourceSink(graph)
+    else:
+        sink = _SkolemizingSink(graph, skolem_base)
+    context = None
+    if contexts is not None and isinstance(raw_rdf, dict) and raw_rdf.get("@context"):
+        # Reuse the processed context instead of letting the parser load it again
+        context = contexts.get(raw_rdf["@context"])
+        raw_rdf = {key: value for key, value in raw_rdf.items() if key != "@context"}
+    jsonld.Parser().parse(raw_rdf, context or Context(), sink)
+    return graph
@@ -0,0 +1,115 @@
+import importlib
+import time
+
+from contextlib import contextmanager
+
+import js
+
+
+# Packages installed on first use of a feature instead of at startup
+FEATURE_PACKAGES = {
+    "marc": ["lxml", "./static/wheels/pymarc-5.3.1-py3-none-any.whl"],
+    "shacl": [
+        "./static/wheels/owlrl-7.1.4-py3-none-any.whl",
+        "./static/wheels/pyshacl-0.30.1-py3-none-any.whl",
+    ],
+}
+
+# Packages PyScript loads before main.py runs, the pyconfig.json
+# "packages", and the module imported to time each. Dependencies come
+# before the packages that import them.
+STARTUP_PACKAGES = {
+    "micropip": "micropip",
+    "markdown": "markdown",
+    "Jinja2": "jinja2",
+    "packaging": "packaging",
+    "pyparsing": "pyparsing",
+    "isodate": "isodate",
+    "rdflib": "rdflib",
+}
+
+STARTUP_TIMINGS = {}
+
+STARTUP_PACKAGE_IMPORTS = {}
+
+PACKAGE_TIMINGS = {}
+
+_installed = set()
+
+# Seconds from navigation start until this module, the first one main.py
+# imports, ran: the PyScript runtime plus loading the startup packages
+RUNTIME_READY = js.performance.now() / 1_000
+
+
+@contextmanager
+def timed(label: str, timings: dict = STARTUP_TIMINGS):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[label] = time.perf_counter() - start
+
+
+def import_startup_packages():
+    """Imports each startup package, timing its first import"""
+    for package, module in STARTUP_PACKAGES.items():
+        with timed(package, STARTUP_PACKAGE_IMPORTS):
+            importlib.import_module(module)
+
+
+def _package_downloads() -> dict:
+    # Resource Timing entries for the wheels PyScript fetched at startup
+    downloads = {}
+    for entry in js.performance.getEntriesByType("resource"):
+        file_name = entry.name.split("?")[0].rsplit("/", 1)[-1].lower()
+        if not file_name.endswith(".whl"):
+            continue
+        for package in STARTUP_PACKAGES:
+            if file_name.startswith(f"{package.lower()}-"):
+                downloads[package] = downloads.get(package, 0.0) + entry.duration / 1_000
+    return downloads
+
+
+def startup_packages() -> dict:
+    """Download and first import time in seconds of each startup package.
+    Downloads served from the browser cache report close to zero."""
+    downloads = _package_downloads()
+    return {
+        package: {
+            "download": downloads.get(package),
+            "import": STARTUP_PACKAGE_IMPORTS.get(package),
+        }
+        for package in STARTUP_PACKAGES
+    }
+
+
+async def ensure_packages(feature: str):
+    """Installs the packages for a feature the first time it is used,
+    showing the package loading spinner while micropip runs."""
+    if feature in _installed:
+        return
+    import micropip
+
+    spinner = js.document.getElementById("package-loading-status")
+    spinner.classList.remove("d-none")
+    try:
+        for package in FEATURE_PACKAGES[feature]:
+            with timed(package, PACKAGE_TIMINGS):
+                await micropip.install(package)
+        _installed.add(feature)
+    finally:
+        spinner.classList.add("d-none")
+
+
+def startup_report() -> dict:
+    """Time-to-interactive in seconds broken down into the PyScript runtime
+    with its startup packages, the download and import of each startup
+    package, each timed module import in main.py, and any packages installed
+    later on first use."""
+    return {
+        "time_to_interactive": js.performance.now() / 1_000,
+        "runtime_and_packages": RUNTIME_READY,
+        "startup_packages": startup_packages(),
+        "module_imports": dict(STARTUP_TIMINGS),
+        "deferred_packages": dict(PACKAGE_TIMINGS),
+    }
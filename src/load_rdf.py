@@ -1,3 +1,5 @@
+import asyncio
+import html
 import json
 
 import js
@@ -5,47 +7,132 @@ import rdflib
 
 
 from jinja2 import Template
-from pyodide.ffi import create_proxy
-from pyodide.http import pyfetch
+from pyodide.ffi import create_proxy, to_js
+from rdflib.util import from_n3
+
+from state import (
+    CBD_ZIP_BATCH_SIZE,
+    CHANGE_TRACKER,
+    EXPORT_CHUNK_SIZE,
+    GRAPH_WORKER,
+    HISTOGRAM_SIZE,
+    HTTP_CLIENT,
+    JSONLD_CONTEXTS,
+    MAX_CONCURRENT_FETCHES,
+    NAMESPACES,
+    PARSE_POOL,
+    RESOURCE_CACHE,
+    SEARCH_RESULTS,
+    SKOLEMIZE_RESOURCES,
+    SNAPSHOT_CACHE,
+    UPDATE_JOURNAL,
+    BF_GRAPH,
+)
+from graph_export import gzip_chunks, nquads_chunks, ntriples_chunks, turtle_chunks
+from graph_stats import graph_statistics
+from helpers import BF, chunked_blob
+from jsonld_contexts import parse_jsonld
+from query_results import n3_term
+from snapshot import SnapshotError, dumps as dump_snapshot, loads as load_snapshot
+from zip_entries import AsyncZipReader, ZipEntry, ZipFormatError
+
+
+def ingest_jsonld(
+    resource_url: str,
+    raw_rdf,
+    skolemize: bool = SKOLEMIZE_RESOURCES,
+    graph: rdflib.Graph | None = None,
+) -> rdflib.Graph:
+    """Parses a JSON-LD payload straight into graph, BF_GRAPH by default,
+    in a single pass"""
+    global BF_GRAPH
+
+    if graph is None:
+        graph = BF_GRAPH
+    skolem_base = f"{resource_url.strip()}#" if skolemize else None
+    return parse_jsonld(raw_rdf, graph, JSONLD_CONTEXTS, skolem_base)
+
+
+async def resolve_context(raw_rdf):
+    """Fetches the remote contexts of a JSON-LD payload through the resource cache"""
+    if isinstance(raw_rdf, dict) and raw_rdf.get("@context"):
+        await JSONLD_CONTEXTS.resolve(raw_rdf["@context"], RESOURCE_CACHE.fetch)
+
+
+async def _fetch_resource(resource_url: str, semaphore: asyncio.Semaphore) -> tuple:
+    async with semaphore:
+        try:
+            status, text = await RESOURCE_CACHE.fetch(resource_url)
+            if status >= 400:
+                return resource_url, None, f"{status} {text}"
+            resource_payload = json.loads(text)
+        except Exception as e:
+            return resource_url, None, str(e)
+    return resource_url, resource_payload, None
+
 
-from state import NAMESPACES, BF_GRAPH
-from sinopia_api import environments
+def _fetch_progress(done: int, failed: int, pending: int) -> str:
+    return f"""Loading Resources <span class="badge text-bg-success">{done:,} done</span>
+    <span class="badge text-bg-danger">{failed:,} failed</span>
+    <span class="badge text-bg-secondary">{pending:,} pending</span>
+    <span class="badge text-bg-info">{RESOURCE_CACHE.hits:,} cached</span>"""
 
 
-def skolemize_resource(resource_url: str, raw_rdf: str) -> str:
-    resource_graph = rdflib.Graph()
-    if not isinstance(raw_rdf, str):
-        raw_rdf = json.dumps(raw_rdf)
-    resource_graph.parse(data=raw_rdf, format="json-ld")
-    #skolemize_graph = resource_graph.skolemize(basepath=f"{resource_url.strip()}#")
-    #return skolemize_graph.serialize(format="turtle")
-    return resource_graph.serialize(format="turtle")
+def show_errors(errors: list):
+    """Lists (source, error) pairs in the Search Results tab and switches
+    to it, errors can hold server responses so both are escaped"""
+    bench_bc_result = js.document.getElementById("search-results")
+    bench_bc_result.innerHTML = "<ul>" + "".join(
+        f"""<li><span class="text-danger">ERROR!</span> {html.escape(str(source))}: {html.escape(str(error))}</li>"""
+        for source, error in errors
+    ) + "</ul>"
+    js.document.getElementById("search-results-tab").classList.remove("d-none")
+    tab_button = js.document.getElementById("search-results-tab-btn")
+    js.bootstrap.Tab.getOrCreateInstance(tab_button).show()
 
 
 async def build_graph(*args) -> rdflib.Graph:
     global BF_GRAPH
 
     individual_resources = js.document.getElementById("resource-urls")
+    concurrency_input = js.document.getElementById("resource-concurrency")
     loading_spinner = js.document.getElementById("graph-loading-status")
     loading_spinner.classList.remove("d-none")
     bench_heading = js.document.getElementById("bench-heading")
-    bench_bc_result = js.document.getElementById("bc-results")
-
-    if len(individual_resources.value) > 0:
-        resources = individual_resources.value.split(",")
-        for resource_url in resources:
-            resource_result = await pyfetch(resource_url)
-            if not resource_result.ok:
-                bench_heading.innerHTML = """<span class="text-danger">ERROR!</span>"""
-                error = await resource_result.text()
-                bench_bc_result.innerHTML = f"Message: {error}"
-                break
-
-            resource_payload = await resource_result.json()
-            turtle_rdf = skolemize_resource(
-                resource_url.strip(), resource_payload["data"]
-            )
-            BF_GRAPH.parse(data=turtle_rdf, format="turtle")
+
+    resources = [url.strip() for url in individual_resources.value.split(",") if len(url.strip()) > 0]
+    if len(resources) > 0:
+        try:
+            # Every request also waits on the shared client's limit
+            concurrency = min(max(1, int(concurrency_input.value)), HTTP_CLIENT.max_concurrent)
+        except ValueError:
+            concurrency = MAX_CONCURRENT_FETCHES
+        semaphore = asyncio.Semaphore(concurrency)
+        done, failed, pending = 0, 0, len(resources)
+        errors = []
+        bench_heading.innerHTML = _fetch_progress(done, failed, pending)
+        fetches = [_fetch_resource(resource_url, semaphore) for resource_url in resources]
+        for fetch in asyncio.as_completed(fetches):
+            resource_url, resource_payload, error = await fetch
+            pending -= 1
+            if error is None:
+                try:
+                    await resolve_context(resource_payload["data"])
+                    with CHANGE_TRACKER.loading():
+                        ingest_jsonld(resource_url, resource_payload["data"])
+                    done += 1
+                except Exception as e:
+                    error = str(e)
+            if error is not None:
+                failed += 1
+                errors.append((resource_url, error))
+            bench_heading.innerHTML = _fetch_progress(done, failed, pending)
+        if len(errors) > 0:
+            show_errors(errors)
+        await RESOURCE_CACHE.flush()
+        js.console.log(f"Resource cache {RESOURCE_CACHE.stats()}")
+        js.console.log(f"JSON-LD contexts {JSONLD_CONTEXTS.stats()}")
+        js.console.log(f"HTTP {HTTP_CLIENT.stats()}")
     loading_spinner.classList.add("d-none")
     summarize_graph(BF_GRAPH)
     return BF_GRAPH
@@ -57,10 +144,12 @@ async def load_uri(event):
     parent_div = button.parentElement
     close_btn = parent_div.querySelector(".btn-close")
     uri = button.getAttribute("data-uri")
-    rdf_data_div = js.document.getElementById(f"{uri}-rdf")
-    rdf_data = rdf_data_div.value
-    turtle_rdf = skolemize_resource(uri, rdf_data)
-    BF_GRAPH.parse(data=turtle_rdf, format="turtle")
+    rdf_data = SEARCH_RESULTS.get(uri)
+    if rdf_data is None:
+        js.alert(f"ERROR! {uri} is not in the current search results")
+        return
+    with CHANGE_TRACKER.loading():
+        ingest_jsonld(uri, rdf_data)
     summarize_graph(BF_GRAPH)
     close_btn.click()
 
@@ -71,84 +160,84 @@ async def download_graph(event):
 
     anchor = event.target
     serialization = anchor.getAttribute("data-serialization")
+    compress = anchor.getAttribute("data-compress") == "gzip"
 
     if len(BF_GRAPH) < 1:
         js.alert("Empty graph cannot be download")
         return
     for prefix, uri in NAMESPACES:
         BF_GRAPH.namespace_manager.bind(prefix, uri)
-    mime_type, contents = None, None
+    mime_type, chunks = None, None
     match serialization:
         case "json-ld":
             mime_type = "application/json"
-            contents = BF_GRAPH.serialize(format="json-ld")
+            chunks = [BF_GRAPH.serialize(format="json-ld")]
 
         case "nt":
             mime_type = "application/n-triples"
-            contents = BF_GRAPH.serialize(format="nt")
+            chunks = ntriples_chunks(BF_GRAPH, EXPORT_CHUNK_SIZE)
+
+        case "nq":
+            mime_type = "application/n-quads"
+            chunks = nquads_chunks(BF_GRAPH, EXPORT_CHUNK_SIZE)
 
         case "ttl":
             mime_type = "application/x-turtle"
-            contents = BF_GRAPH.serialize(format="turtle")
+            chunks = turtle_chunks(BF_GRAPH, EXPORT_CHUNK_SIZE)
 
         case "xml":
             mime_type = "application/rdf+xml"
-            contents = BF_GRAPH.serialize(format="pretty-xml")
+            chunks = [BF_GRAPH.serialize(format="pretty-xml")]
 
         case _:
             js.alert(f"Unknown RDF serialization {serialization}")
             return
-    blob = js.Blob.new([contents], {"type": mime_type})
+    file_name = f"bluecore-graph.{serialization}"
+    if compress:
+        mime_type = "application/gzip"
+        chunks = gzip_chunks(chunks)
+        file_name = f"{file_name}.gz"
+    blob = await chunked_blob(chunks, mime_type, "Exporting graph")
     anchor = js.document.createElement("a")
     anchor.href = js.URL.createObjectURL(blob)
-    anchor.download = f"bluecore-graph.{serialization}"
+    anchor.download = file_name
     js.document.body.appendChild(anchor)
     anchor.click()
     js.document.body.removeChild(anchor)
 
 
+def _histogram_items(graph: rdflib.Graph, histogram: list) -> str:
+    items = []
+    for term, count in histogram:
+        label = html.escape(term.n3(graph.namespace_manager))
+        items.append(
+            f"""<li class="dropdown-item d-flex justify-content-between">{label}
+            <span class="badge text-bg-secondary ms-2">{count:,}</span></li>"""
+        )
+    return "".join(items)
+
+
 def summarize_graph(graph: rdflib.Graph):
-    query_result = graph.query(
-        """SELECT (count(DISTINCT ?s) as ?subjCount) (count(DISTINCT ?p) as ?predCount) (count(DISTINCT ?o) as ?objCount) 
-    WHERE { ?s ?p ?o . }"""
-    )
+    stats = graph_statistics(graph)
     total_triples_badge = js.document.getElementById("total-triples")
     subjects_count_badge = js.document.getElementById("subjects-count")
     predicates_count_badge = js.document.getElementById("predicates-count")
     objects_count_badge = js.document.getElementById("objects-count")
-    counts=query_result.bindings[0]
-    subjects_count = int(counts.get('subjCount'))
-    predicates_count = int(counts.get('predCount'))
-    objects_count = int(counts.get('objCount'))
     total_triples_badge.innerHTML = f"{len(graph):,}"
-    subjects_count_badge.innerHTML = f"{subjects_count:,}"
-    predicates_count_badge.innerHTML = f"{predicates_count :,}"
-    objects_count_badge.innerHTML = f"{objects_count:,}"
-    works_result = graph.query(
-        """
-        PREFIX bf: <http://id.loc.gov/ontologies/bibframe/>
-        PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-
-        SELECT (count(DISTINCT ?s) as ?workCount)
-        WHERE { ?s rdf:type bf:Work . }
-        """
-    )
-    works_count = works_result.bindings[0]
+    subjects_count_badge.innerHTML = f"{len(stats.subjects):,}"
+    predicates_count_badge.innerHTML = f"{len(stats.predicates):,}"
+    objects_count_badge.innerHTML = f"{len(stats.objects):,}"
     works_count_badge = js.document.getElementById("bf-works-count")
-    works_count_badge.innerHTML = f"{int(works_count.get('workCount')):,}"
-    instances_result = graph.query(
-        """
-        PREFIX bf: <http://id.loc.gov/ontologies/bibframe/>
-        PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-
-        SELECT (count(DISTINCT ?s) as ?instanceCount)
-        WHERE { ?s rdf:type bf:Instance . }
-        """
-    )
-    instances_count = instances_result.bindings[0]
+    works_count_badge.innerHTML = f"{stats.instance_count(BF.Work):,}"
     instances_count_badge = js.document.getElementById("bf-instances-count")
-    instances_count_badge.innerHTML = f"{int(instances_count.get('instanceCount')):,}"
-    
+    instances_count_badge.innerHTML = f"{stats.instance_count(BF.Instance):,}"
+    class_histogram = js.document.getElementById("class-histogram")
+    class_histogram.innerHTML = _histogram_items(graph, stats.class_histogram(HISTOGRAM_SIZE))
+    predicate_histogram = js.document.getElementById("predicate-histogram")
+    predicate_histogram.innerHTML = _histogram_items(graph, stats.predicate_histogram(HISTOGRAM_SIZE))
+    if GRAPH_WORKER is not None:
+        GRAPH_WORKER.schedule_sync()
+
 
 sparql_template = Template(
     """{% for ns in namespaces %}PREFIX {{ ns[0] }}: <{{ ns[1] }}>\n{% endfor %}"""
@@ -170,6 +259,212 @@ async def load_cbd_file(event):
         cbd_file = cbd_file_input.files.item(0)
         rdf_type = rdflib.util.guess_format(cbd_file_input.value)
         raw_rdf = await cbd_file.text()
-        BF_GRAPH.parse(data=raw_rdf, format=rdf_type)
+        if rdf_type == "json-ld":
+            raw_rdf = json.loads(raw_rdf)
+            await resolve_context(raw_rdf)
+        with CHANGE_TRACKER.loading():
+            if rdf_type == "json-ld":
+                ingest_jsonld(cbd_file.name, raw_rdf)
+            else:
+                BF_GRAPH.parse(data=raw_rdf, format=rdf_type)
         summarize_graph(BF_GRAPH)
         cbd_file_modal_close_btn.click()
+
+
+def _entry_format(name: str) -> str | None:
+    if name.lower().endswith(".json"):
+        return "json-ld"
+    return rdflib.util.guess_format(name)
+
+
+def _file_reader(file):
+    """Async read(offset, size) over a browser File, each call reads only
+    that slice of the file"""
+    async def read(offset: int, size: int) -> bytes:
+        array_buffer = await file.slice(offset, offset + size).arrayBuffer()
+        return bytes(js.Uint8Array.new(array_buffer))
+    return read
+
+
+async def _parse_zip_entry(archive: AsyncZipReader, entry: ZipEntry, rdf_type: str) -> rdflib.Graph:
+    entry_graph = rdflib.Graph()
+    raw_rdf = await archive.read_entry(entry)
+    if rdf_type == "json-ld":
+        raw_rdf = json.loads(raw_rdf)
+        await resolve_context(raw_rdf)
+        return ingest_jsonld(entry.filename, raw_rdf, graph=entry_graph)
+    return entry_graph.parse(data=raw_rdf, format=rdf_type)
+
+
+def _zip_progress(loaded: int, failed: int, total: int) -> str:
+    return f"""Loading CBD Archive <span class="badge text-bg-success">{loaded:,} of {total:,} loaded</span>
+    <span class="badge text-bg-danger">{failed:,} failed</span>"""
+
+
+async def _load_zip_entry(archive: AsyncZipReader, entry: ZipEntry):
+    """The entry's triples, parsed in PARSE_POOL's workers when enabled"""
+    rdf_type = _entry_format(entry.filename)
+    if rdf_type is None:
+        raise ValueError("unknown RDF format")
+    if PARSE_POOL is None:
+        return await _parse_zip_entry(archive, entry, rdf_type)
+    raw_rdf = (await archive.read_entry(entry)).decode("utf-8")
+    return await PARSE_POOL.parse(entry.filename, rdf_type, raw_rdf, SKOLEMIZE_RESOURCES)
+
+
+async def load_cbd_zip_file(event):
+    """Loads every RDF file in a zip archive, each entry is parsed into its
+    own graph so a malformed file is reported without leaving partial
+    triples in BF_GRAPH.
+
+    The archive is read a slice at a time: its central directory, then
+    one entry at a time. Entries are parsed in parallel in PARSE_POOL's
+    workers, with up to two entries per worker in flight, and merged
+    into BF_GRAPH on the main thread as each one finishes."""
+    global BF_GRAPH
+
+    zip_file_input = js.document.getElementById("cbd-zip-file")
+    cbd_file_modal_close_btn = js.document.getElementById("cbd-modal-close-btn")
+    if zip_file_input.files.length < 1:
+        return
+    bench_heading = js.document.getElementById("bench-heading")
+    zip_file = zip_file_input.files.item(0)
+    archive = AsyncZipReader(_file_reader(zip_file), zip_file.size)
+    try:
+        entries = [
+            entry for entry in await archive.entries()
+            if not entry.is_dir() and not entry.filename.startswith("__MACOSX/")
+        ]
+    except ZipFormatError as e:
+        js.alert(f"ERROR! Cannot read {zip_file.name}\n{e}")
+        return
+    loaded, errors = 0, []
+    cbd_file_modal_close_btn.click()
+    bench_heading.innerHTML = _zip_progress(loaded, len(errors), len(entries))
+    in_flight_limit = 2 * (await PARSE_POOL.start() if PARSE_POOL is not None else 1)
+    in_flight, reported = {}, 0
+
+    async def merge_finished():
+        nonlocal loaded, reported
+        finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in finished:
+            entry = in_flight.pop(task)
+            try:
+                triples = task.result()
+            except Exception as e:
+                errors.append((entry.filename, e))
+                continue
+            with CHANGE_TRACKER.loading():
+                BF_GRAPH.addN((*triple, BF_GRAPH) for triple in triples)
+            loaded += 1
+        if loaded + len(errors) - reported >= CBD_ZIP_BATCH_SIZE:
+            reported = loaded + len(errors)
+            bench_heading.innerHTML = _zip_progress(loaded, len(errors), len(entries))
+            if GRAPH_WORKER is not None:
+                GRAPH_WORKER.schedule_sync()
+
+    for entry in entries:
+        if len(in_flight) >= in_flight_limit:
+            await merge_finished()
+        in_flight[asyncio.ensure_future(_load_zip_entry(archive, entry))] = entry
+    while len(in_flight) > 0:
+        await merge_finished()
+    bench_heading.innerHTML = _zip_progress(loaded, len(errors), len(entries))
+    if len(errors) > 0:
+        show_errors(errors)
+    summarize_graph(BF_GRAPH)
+
+
+SNAPSHOT_KEY = "./session.bfsnap"
+
+
+def _session_snapshot() -> bytes:
+    state = {
+        "query": js.document.getElementById("bf-sparql-query").value,
+        "baseline": [n3_term(resource) for resource in CHANGE_TRACKER.baseline],
+        "dirty": [n3_term(node) for node in CHANGE_TRACKER.dirty],
+    }
+    return dump_snapshot(BF_GRAPH, state)
+
+
+def _restore_session(data: bytes) -> int:
+    """Replaces BF_GRAPH and the working state with a snapshot's"""
+    global BF_GRAPH
+
+    triples, namespaces, state = load_snapshot(data)
+    # Decode everything before BF_GRAPH is cleared, so a bad snapshot
+    # leaves the current session as it was
+    try:
+        baseline = {from_n3(resource) for resource in state.get("baseline", [])}
+        dirty = {from_n3(node) for node in state.get("dirty", [])}
+    except Exception as e:
+        raise SnapshotError(f"corrupt snapshot state: {e}")
+    BF_GRAPH.remove((None, None, None))
+    with CHANGE_TRACKER.loading():
+        BF_GRAPH.addN((*triple, BF_GRAPH) for triple in triples)
+    for prefix, uri in namespaces:
+        BF_GRAPH.namespace_manager.bind(prefix, uri, replace=True)
+    CHANGE_TRACKER.baseline = baseline
+    CHANGE_TRACKER.dirty = dirty
+    # Journaled updates refer to the graph being replaced
+    UPDATE_JOURNAL.undo_stack.clear()
+    UPDATE_JOURNAL.redo_stack.clear()
+    if state.get("query"):
+        js.document.getElementById("bf-sparql-query").value = state["query"]
+    summarize_graph(BF_GRAPH)
+    return len(triples)
+
+
+async def save_session(event):
+    """Saves a binary snapshot of the session, downloaded or kept in the
+    browser's Cache Storage depending on data-target"""
+    # currentTarget is already null once an async handler runs, the click
+    # may land on the icon inside the link
+    link = event.target.closest("[data-target]")
+    target = link.getAttribute("data-target") if link is not None else "download"
+    bench_heading = js.document.getElementById("bench-heading")
+    data = _session_snapshot()
+    blob = js.Blob.new([to_js(data)], {"type": "application/octet-stream"})
+    if target == "browser":
+        cache = await js.caches.open(SNAPSHOT_CACHE)
+        await cache.put(SNAPSHOT_KEY, js.Response.new(blob))
+        bench_heading.innerHTML = f"<h2>Session saved in browser ({len(BF_GRAPH):,} triples, {len(data):,} bytes)</h2>"
+        return
+    anchor = js.document.createElement("a")
+    anchor.href = js.URL.createObjectURL(blob)
+    anchor.download = "bluecore-session.bfsnap"
+    js.document.body.appendChild(anchor)
+    anchor.click()
+    js.document.body.removeChild(anchor)
+
+
+async def restore_session(event):
+    bench_heading = js.document.getElementById("bench-heading")
+    cache = await js.caches.open(SNAPSHOT_CACHE)
+    response = await cache.match(SNAPSHOT_KEY)
+    if not response:
+        js.alert("No session saved in this browser")
+        return
+    array_buffer = await response.arrayBuffer()
+    try:
+        total = _restore_session(bytes(js.Uint8Array.new(array_buffer)))
+    except SnapshotError as e:
+        js.alert(f"Cannot restore session: {e}")
+        return
+    bench_heading.innerHTML = f"<h2>Restored session with {total:,} triples</h2>"
+
+
+async def load_session_file(event):
+    session_file_input = js.document.getElementById("session-file")
+    cbd_file_modal_close_btn = js.document.getElementById("cbd-modal-close-btn")
+    if session_file_input.files.length < 1:
+        return
+    bench_heading = js.document.getElementById("bench-heading")
+    array_buffer = await session_file_input.files.item(0).arrayBuffer()
+    try:
+        total = _restore_session(bytes(js.Uint8Array.new(array_buffer)))
+    except SnapshotError as e:
+        js.alert(f"Cannot restore session: {e}")
+        return
+    bench_heading.innerHTML = f"<h2>Restored session with {total:,} triples</h2>"
+    cbd_file_modal_close_btn.click()
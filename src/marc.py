@@ -1,23 +1,88 @@
+import asyncio
 import io
-import pymarc
 import rdflib
 
 from js import alert, Blob, console, document, Uint8Array, URL
-from lxml import etree
+from pyodide.ffi import to_js
 from pyscript import fetch
 
 from helpers import BF
-from load_rdf import summarize_graph
-from state import BF_GRAPH
+from lazy_packages import ensure_packages
+from load_rdf import show_errors, summarize_graph
+from state import MARC_CHUNK_SIZE, MARC_READ_SIZE, BF_GRAPH
+from xslt_transformers import get_transformer, transformer_timings
 
 
-async def _bf_graph_to_xml(bf_graph: rdflib.Graph):
-    instances = [instance for instance in bf_graph.subjects(predicate=rdflib.RDF.type, object=BF.Instance)]
-    if len(instances) < 1:
-        alert(f"ERROR! Need at least 1 BIBFRAME Instance")
-    #bf_graph = bf_graph.de_skolemize(uriref=instances[0])
-    raw_xml = bf_graph.serialize(format="pretty-xml")
-    return etree.XML(bytes(raw_xml, encoding="utf-8"))
+MARC_NS = "http://www.loc.gov/MARC21/slim"
+RDF_NS = str(rdflib.RDF)
+
+
+def _describe(bf_graph: rdflib.Graph, node, instance_graph: rdflib.Graph, seen: set):
+    """Copies the node's triples, following blank nodes, into instance_graph"""
+    frontier = [node]
+    while len(frontier) > 0:
+        current = frontier.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        for triple in bf_graph.triples((current, None, None)):
+            instance_graph.add(triple)
+            if isinstance(triple[2], rdflib.BNode):
+                frontier.append(triple[2])
+
+
+def _instance_graph(bf_graph: rdflib.Graph, instance) -> rdflib.Graph:
+    """Extracts an Instance with its Works, Items and the other resources
+    they link to, excluding any other Instances and Works."""
+    instance_graph = rdflib.Graph(namespace_manager=bf_graph.namespace_manager)
+    works = set(bf_graph.objects(instance, BF.instanceOf))
+    works.update(bf_graph.subjects(BF.hasInstance, instance))
+    principal = [instance] + list(works) + list(bf_graph.subjects(BF.itemOf, instance))
+    seen = set()
+    for node in principal:
+        _describe(bf_graph, node, instance_graph, seen)
+    for related in set(instance_graph.objects()):
+        if not isinstance(related, rdflib.URIRef) or related in seen:
+            continue
+        related_types = set(bf_graph.objects(related, rdflib.RDF.type))
+        if BF.Instance in related_types or BF.Work in related_types:
+            continue
+        _describe(bf_graph, related, instance_graph, seen)
+    return instance_graph
+
+
+def _hoist_resources(rdf_root):
+    """pretty-xml inlines the first reference to a resource, bibframe2marc
+    needs the Instance and Work as top-level elements"""
+    for element in list(rdf_root.iter(f"{{{BF}}}Instance", f"{{{BF}}}Work")):
+        property_element = element.getparent()
+        if property_element is rdf_root:
+            continue
+        for attribute in ("about", "nodeID"):
+            identifier = element.get(f"{{{RDF_NS}}}{attribute}")
+            if identifier is not None:
+                reference = "resource" if attribute == "about" else "nodeID"
+                property_element.set(f"{{{RDF_NS}}}{reference}", identifier)
+        property_element.remove(element)
+        rdf_root.append(element)
+
+
+def _instance_to_marc(bf2marc_xslt, bf_graph: rdflib.Graph, instance):
+    from lxml import etree
+
+    raw_xml = _instance_graph(bf_graph, instance).serialize(format="pretty-xml", encoding="utf-8")
+    bf_xml = etree.XML(raw_xml)
+    _hoist_resources(bf_xml)
+    marc_xml = bf2marc_xslt(bf_xml)
+    root = marc_xml.getroot()
+    if root.tag == f"{{{MARC_NS}}}record":
+        return [root]
+    return list(root.iter(f"{{{MARC_NS}}}record"))
+
+
+def _export_progress(exported: int, failed: int, total: int) -> str:
+    return f"""Exporting MARC <span class="badge text-bg-success">{exported:,} of {total:,} exported</span>
+    <span class="badge text-bg-danger">{failed:,} failed</span>"""
 
 
 async def bf2marc(event):
@@ -28,31 +93,64 @@ async def bf2marc(event):
     if len(BF_GRAPH) < 1:
         alert(f"ERROR! Cannot export empty graph to {marc_format[0:4].upper()} {marc_format[4:]}")
         return
+    if marc_format not in ["marc21", "marcXML"]:
+        alert(f"ERROR! Unknown MARC Format {marc_format}")
+        return
+    instances = list(BF_GRAPH.subjects(predicate=rdflib.RDF.type, object=BF.Instance))
+    if len(instances) < 1:
+        alert(f"ERROR! Need at least 1 BIBFRAME Instance")
+        return
 
-    xslt_root = etree.parse("./bibframe2marc.xsl")
-    bf2marc_xslt = etree.XSLT(xslt_root)
-    bf_xml = await _bf_graph_to_xml(BF_GRAPH)
-    marc_xml = bf2marc_xslt(bf_xml)
+    await ensure_packages("marc")
+    import pymarc
+    from lxml import etree
+
+    bench_heading = document.getElementById("bench-heading")
+    bf2marc_xslt = get_transformer("./bibframe2marc.xsl")
+    parts, errors, exported = [], [], 0
+    if marc_format == "marcXML":
+        parts.append(f"""<?xml version="1.0" encoding="UTF-8"?>\n<marc:collection xmlns:marc="{MARC_NS}">\n""")
+    # bibframe2marc only accepts a document with exactly one top-level
+    # Instance, so every Instance is transformed on its own and
+    # MARC_CHUNK_SIZE only sets how often progress is shown
+    for start in range(0, len(instances), MARC_CHUNK_SIZE):
+        for instance in instances[start:start + MARC_CHUNK_SIZE]:
+            try:
+                records = _instance_to_marc(bf2marc_xslt, BF_GRAPH, instance)
+                match marc_format:
+                    case "marc21":
+                        marc_records = pymarc.parse_xml_to_array(
+                            io.BytesIO(etree.tostring(_marc_collection(records)))
+                        )
+                        parts.extend(to_js(record.as_marc()) for record in marc_records)
+
+                    case "marcXML":
+                        parts.extend(etree.tostring(record, encoding="unicode") for record in records)
+                exported += 1
+            except Exception as e:
+                errors.append((instance, e))
+        bench_heading.innerHTML = _export_progress(exported, len(errors), len(instances))
+        # Let the browser repaint between progress updates
+        await asyncio.sleep(0)
+    console.log(f"XSLT timings {transformer_timings()}")
+    if len(errors) > 0:
+        show_errors(errors)
+    if exported < 1:
+        alert(f"ERROR! No BIBFRAME Instances could be exported to {marc_format}")
+        return
 
     match marc_format:
 
         case "marc21":
-            with open("temp.xml", "w+") as fo:
-                fo.write(str(marc_xml))
-            marc_record = pymarc.marcxml.parse_xml_to_array("temp.xml")[0]
             mime_type = "application/octet-stream"
             serialization = "mrc"
 
         case "marcXML":
-            marc_record = marc_xml
-            mime_type = "application/rdf+xml"
+            parts.append("</marc:collection>\n")
+            mime_type = "application/marcxml+xml"
             serialization = "xml"
 
-        case _:
-            alert(f"ERROR! Unknown MARC Format {marc_format}")
-            return
-
-    blob = Blob.new([marc_record], {"type": mime_type})
+    blob = Blob.new(parts, {"type": mime_type})
     anchor = document.createElement("a")
     anchor.href = URL.createObjectURL(blob)
     anchor.download = f"bf-marc.{serialization}"
@@ -61,40 +159,141 @@ async def bf2marc(event):
     document.body.removeChild(anchor)
 
 
+async def _file_chunks(file, size: int = MARC_READ_SIZE):
+    offset = 0
+    while offset < file.size:
+        array_buffer = await file.slice(offset, offset + size).arrayBuffer()
+        yield bytes(Uint8Array.new(array_buffer))
+        offset += size
+
+
+async def _binary_marc_records(file):
+    import pymarc
+    from lxml import etree
+
+    buffer = b""
+    async for chunk in _file_chunks(file):
+        buffer += chunk
+        *raw_records, buffer = buffer.split(b"\x1d")
+        for raw_record in raw_records:
+            try:
+                record = pymarc.Record(data=raw_record + b"\x1d")
+                yield etree.fromstring(pymarc.record_to_xml(record, namespace=True)), None
+            except Exception as e:
+                yield None, e
+    if len(buffer.strip()) > 0:
+        yield None, ValueError("Truncated MARC record at end of file")
+
+
+async def _marc_xml_records(file):
+    from lxml import etree
+
+    parser = etree.XMLPullParser(events=("end",), tag=f"{{{MARC_NS}}}record")
+    async for chunk in _file_chunks(file):
+        parser.feed(chunk)
+        for _, record in parser.read_events():
+            yield record, None
+    parser.close()
+
+
+def _marc_collection(records: list):
+    from lxml import etree
+
+    collection = etree.Element(f"{{{MARC_NS}}}collection", nsmap={"marc": MARC_NS})
+    for record in records:
+        # Moves the record out of the source document so parsed records
+        # are released once their chunk has been converted
+        collection.append(record)
+    return collection
+
+
+def _convert_records(marc2bf_xslt, records: list):
+    global BF_GRAPH
+
+    bf_xml = marc2bf_xslt(_marc_collection(records))
+    # Parsed into its own graph first so a failure part way through the
+    # RDF/XML leaves nothing behind in BF_GRAPH
+    records_graph = rdflib.Graph()
+    records_graph.parse(data=str(bf_xml), format="xml")
+    BF_GRAPH.addN((*triple, BF_GRAPH) for triple in records_graph)
+
+
+def _convert_chunk(marc2bf_xslt, chunk: list) -> list:
+    """Converts a chunk of (position, MARC XML record) pairs into BF_GRAPH,
+    falling back to one record at a time if the chunk fails, so a failed
+    chunk adds nothing before its records are retried. Returns the failed
+    positions with their errors."""
+    try:
+        _convert_records(marc2bf_xslt, [record for _, record in chunk])
+        return []
+    except Exception as e:
+        if len(chunk) == 1:
+            return [(chunk[0][0], e)]
+    errors = []
+    for position, record in chunk:
+        try:
+            _convert_records(marc2bf_xslt, [record])
+        except Exception as e:
+            errors.append((position, e))
+    return errors
+
+
+def _import_progress(converted: int, failed: int) -> str:
+    return f"""Importing MARC <span class="badge text-bg-success">{converted:,} converted</span>
+    <span class="badge text-bg-danger">{failed:,} failed</span>"""
+
+
 async def marc2bf(event):
     global BF_GRAPH
     marc_upload_file = document.querySelector("#marc-file")
     if marc_upload_file.files.length < 1:
         alert("ERROR! Missing MARC21 or MARC XML file.") 
         return
+    await ensure_packages("marc")
+
     raw_marc_file = marc_upload_file.files.item(0)
     ext = raw_marc_file.name.split(".")[-1]
     match ext:
         case "mrc" | "marc":
-            # Need to convert to XML
-            array_buffer = await raw_marc_file.arrayBuffer()
-            raw_marc = bytes(Uint8Array.new(array_buffer))
-            marc_reader = pymarc.MARCReader(raw_marc)
-            marc_record = next(marc_reader)
-            marc_bytes = io.BytesIO()
-            writer = pymarc.XMLWriter(marc_bytes)
-            writer.write(marc_record)
-            writer.close(close_fh=False)
-            marc_xml = marc_bytes.getvalue()
+            marc_records = _binary_marc_records(raw_marc_file)
 
         case "xml":
-            marc_xml = await raw_marc_file.text()
+            marc_records = _marc_xml_records(raw_marc_file)
 
         case _:
             alert(f"ERROR! Unknown file type {raw_marc_file.name}, should be mrc, marc, or xml")
             return
 
-    xslt_root = etree.parse("./marc2bf/marc2bibframe2.xsl")
-    marc2bf_xslt = etree.XSLT(xslt_root)
-    marc_doc = etree.XML(marc_xml)
+    bench_heading = document.getElementById("bench-heading")
+    marc2bf_xslt = get_transformer("./marc2bf/marc2bibframe2.xsl")
+    position, converted, chunk, errors = 0, 0, [], []
+
+    async def convert(chunk: list):
+        nonlocal converted
+        chunk_errors = _convert_chunk(marc2bf_xslt, chunk)
+        converted += len(chunk) - len(chunk_errors)
+        errors.extend(chunk_errors)
+        bench_heading.innerHTML = _import_progress(converted, len(errors))
+        # Let the browser repaint between chunks
+        await asyncio.sleep(0)
+
     try:
-        bf_xml = marc2bf_xslt(marc_doc)
-        BF_GRAPH.parse(data=str(bf_xml), format='xml')
-        summarize_graph(BF_GRAPH)
+        async for record, error in marc_records:
+            position += 1
+            if error is not None:
+                errors.append((position - 1, error))
+                continue
+            chunk.append((position - 1, record))
+            if len(chunk) >= MARC_CHUNK_SIZE:
+                await convert(chunk)
+                chunk = []
+        if len(chunk) > 0:
+            await convert(chunk)
     except Exception as e:
         alert(f"ERROR! Failed to convert MARC to BIBFRAME\n{e}")
+    if len(errors) > 0:
+        show_errors([
+            (f"Record {i + 1:,}", error) for i, error in sorted(errors, key=lambda row: row[0])
+        ])
+    console.log(f"XSLT timings {transformer_timings()}")
+    summarize_graph(BF_GRAPH)
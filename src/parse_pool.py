@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+from rdflib.util import from_n3
+
+
+class EntryParseError(Exception):
+    """Raised with the parser's message for a document a worker could not parse"""
+
+
+class ParseWorkerPool:
+    """Parses RDF documents in a pool of PyScript workers (parse_worker.py)
+    so large archives are parsed on every core instead of blocking the
+    page.
+
+    The workers' script tags are added to the page on first use, one per
+    core left over by the main thread, up to max_workers. Each call
+    parses one document into its own graph in a worker, and returns its
+    triples for the caller to merge into BF_GRAPH. Remote JSON-LD
+    contexts are retrieved on the main thread through contexts and fetch
+    (see ContextRegistry.resolve) and sent to each worker once.
+    """
+
+    def __init__(self, contexts, fetch, max_workers: int = 4, name: str = "parse-worker",
+                 src: str = "./parse_worker.py", config: str = "./parse_worker.json", workers=None):
+        self.contexts = contexts
+        self.fetch = fetch
+        self.max_workers = max_workers
+        self.name = name
+        self.src = src
+        self.config = config
+        self._workers = workers
+        self._idle = None
+        self._lock = asyncio.Lock()
+
+    def _size(self) -> int:
+        import js
+
+        cores = js.navigator.hardwareConcurrency or 2
+        return max(1, min(self.max_workers, cores - 1))
+
+    async def _start_workers(self) -> list:
+        import js
+
+        from pyscript import workers
+
+        names = [f"{self.name}-{i}" for i in range(1, self._size() + 1)]
+        for name in names:
+            script = js.document.createElement("script")
+            script.type = "py"
+            script.src = self.src
+            script.setAttribute("worker", "")
+            script.setAttribute("name", name)
+            script.setAttribute("config", self.config)
+            js.document.body.appendChild(script)
+        return [await workers[name] for name in names]
+
+    async def start(self) -> int:
+        """Starts the workers if needed, returns how many there are"""
+        async with self._lock:
+            if self._idle is None:
+                if self._workers is None:
+                    self._workers = await self._start_workers()
+                self._idle = asyncio.Queue()
+                for worker in self._workers:
+                    self._idle.put_nowait(worker)
+        return len(self._workers)
+
+    async def _parse(self, worker, name: str, rdf_type: str, text: str, skolemize: bool) -> dict:
+        payload = json.loads(await worker.parse_entry(name, rdf_type, text, skolemize, False))
+        if "contexts" in payload:
+            urls = payload["contexts"]
+            await self.contexts.resolve(urls, self.fetch)
+            documents = {url: self.contexts.documents[url] for url in urls if url in self.contexts.documents}
+            await worker.register_contexts(json.dumps(documents))
+            payload = json.loads(await worker.parse_entry(name, rdf_type, text, skolemize, True))
+        return payload
+
+    async def parse(self, name: str, rdf_type: str, text: str, skolemize: bool = False) -> list:
+        """Returns the document's triples, raises EntryParseError if the
+        worker could not parse it"""
+        await self.start()
+        worker = await self._idle.get()
+        try:
+            payload = await self._parse(worker, name, rdf_type, text, skolemize)
+        finally:
+            self._idle.put_nowait(worker)
+        if "error" in payload:
+            raise EntryParseError(payload["error"])
+        terms = {}
+
+        def term(value: str):
+            if value not in terms:
+                terms[value] = from_n3(value)
+            return terms[value]
+
+        return [tuple(term(value) for value in row) for row in payload["triples"]]
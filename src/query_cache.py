@@ -0,0 +1,84 @@
+from collections import OrderedDict
+
+import rdflib
+
+from rdflib.plugins.sparql import prepareQuery
+
+from query_results import QueryResults
+
+
+def normalize_query(sparql: str) -> str:
+    """Strips surrounding whitespace from each line and drops blank lines so
+    that re-indented copies of a query share a cache entry. Queries with
+    long (triple quoted) literals, whose line breaks and indentation are
+    part of the value, are left as they are."""
+    if '"""' in sparql or "'''" in sparql:
+        return sparql
+    lines = [line.strip() for line in sparql.splitlines()]
+    return "\n".join(line for line in lines if len(line) > 0)
+
+
+class QueryCache:
+    """Caches prepared (parsed and algebrized) SPARQL queries keyed by their
+    normalized text and namespaces, and SELECT results keyed by query and
+    graph version. Result entries are evicted least recently used first once
+    the cached results hold more than ``max_rows`` rows."""
+
+    def __init__(self, max_prepared: int = 128, max_rows: int = 250_000):
+        self.max_prepared = max_prepared
+        self.max_rows = max_rows
+        self.prepared = OrderedDict()
+        self.results = OrderedDict()
+        self.total_rows = 0
+        self.graph_version = None
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, sparql: str, init_ns: dict | None) -> tuple:
+        namespaces = tuple(sorted((prefix, str(uri)) for prefix, uri in (init_ns or {}).items()))
+        return normalize_query(sparql), namespaces
+
+    def prepare(self, sparql: str, init_ns: dict | None = None):
+        key = self._key(sparql, init_ns)
+        if key in self.prepared:
+            self.prepared.move_to_end(key)
+            return self.prepared[key]
+        # The normalized text is only the key, the query is prepared as written
+        prepared_query = prepareQuery(sparql, initNs=init_ns)
+        self.prepared[key] = prepared_query
+        if len(self.prepared) > self.max_prepared:
+            self.prepared.popitem(last=False)
+        return prepared_query
+
+    def clear_results(self):
+        self.results.clear()
+        self.total_rows = 0
+
+    def query(self, graph: rdflib.Graph, sparql: str, init_ns: dict | None = None, progress=None):
+        """Runs a query through the prepared-query cache. SELECT results are
+        cached when the graph's store exposes a ``version`` counter."""
+        prepared_query = self.prepare(sparql, init_ns)
+        version = getattr(graph.store, "version", None)
+        if version is None:
+            return graph.query(prepared_query)
+        graph_version = (id(graph.store), version)
+        if graph_version != self.graph_version:
+            self.clear_results()
+            self.graph_version = graph_version
+        key = self._key(sparql, init_ns)
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return self.results[key]
+        self.misses += 1
+        result = graph.query(prepared_query)
+        if result.type != "SELECT":
+            return result
+        cached = QueryResults(result, progress=progress)
+        if len(cached) <= self.max_rows:
+            self.results[key] = cached
+            self.total_rows += len(cached)
+            while self.total_rows > self.max_rows:
+                _, evicted = self.results.popitem(last=False)
+                self.total_rows -= len(evicted)
+        return cached
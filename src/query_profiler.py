@@ -0,0 +1,158 @@
+import time
+
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, UTC
+
+from pyparsing.exceptions import ParseException
+from rdflib.plugins.sparql import algebra, evaluate, parser, update
+from rdflib.plugins.sparql.parserutils import CompValue
+
+
+# Algebra keys holding child operators, expressions are not walked
+OPERATOR_KEYS = ("p", "p1", "p2", "where")
+
+
+class QueryProfile:
+    """Timings and per-operator row counts for a single query or update"""
+
+    def __init__(self, sparql: str):
+        self.sparql = sparql
+        self.started = datetime.now(UTC)
+        self.kind = None
+        self.phases = {}
+        self.rows = None
+        self.error = None
+        self.algebra = None
+        self.counts = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def evaluated(self, part: CompValue) -> dict:
+        counts = self.counts.setdefault(id(part), {"calls": 0, "rows": 0, "form": False})
+        counts["calls"] += 1
+        return counts
+
+    def _detail(self, part: CompValue) -> str:
+        match part.name:
+            case "BGP":
+                return " . ".join(" ".join(term.n3() for term in triple) for triple in part.triples)
+            case "Project":
+                return " ".join(var.n3() for var in part.PV)
+            case "Extend":
+                return part.var.n3()
+            case "Slice":
+                return f"offset {part.start} limit {part.length}"
+        return ""
+
+    def _explain(self, part: CompValue) -> dict:
+        counts = self.counts.get(id(part), {})
+        node = {
+            "operator": part.name,
+            "detail": self._detail(part),
+            "calls": counts.get("calls", 0),
+            "rows": None if counts.get("form") else counts.get("rows"),
+            "children": [],
+        }
+        for key in OPERATOR_KEYS:
+            child = part.get(key)
+            if isinstance(child, CompValue):
+                node["children"].append(self._explain(child))
+        return node
+
+    def explain(self) -> dict | None:
+        """The algebra tree, each operator with the number of times it was
+        evaluated and the solutions it produced over all evaluations"""
+        if self.algebra is None:
+            return None
+        if self.kind == "update":
+            return {
+                "operator": "Update",
+                "detail": "",
+                "calls": 1,
+                "rows": None,
+                "children": [self._explain(operation) for operation in self.algebra],
+            }
+        return self._explain(self.algebra)
+
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "sparql": self.sparql,
+            "started": self.started.isoformat(),
+            "kind": self.kind,
+            "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()},
+            "total_ms": round(self.total() * 1000, 2),
+            "rows": self.rows,
+            "error": self.error,
+            "algebra": self.explain(),
+        }
+
+
+class QueryProfiler:
+    """Opt-in profiling of run_query, keeps the most recent profiles"""
+
+    def __init__(self, max_history: int = 50):
+        self.enabled = False
+        self.history = deque(maxlen=max_history)
+
+    def prepare(self, profile: QueryProfile, sparql: str, init_ns: dict):
+        """Parses and translates the query, or failing that the update,
+        timing each phase. Bypasses the prepared query cache."""
+        try:
+            with profile.phase("parse"):
+                parsed = parser.parseQuery(sparql)
+            profile.kind = "query"
+            with profile.phase("translate"):
+                prepared = algebra.translateQuery(parsed, initNs=init_ns)
+            profile.algebra = prepared.algebra
+        except ParseException:
+            with profile.phase("parse"):
+                parsed = parser.parseUpdate(sparql)
+            profile.kind = "update"
+            with profile.phase("translate"):
+                prepared = algebra.translateUpdate(parsed, initNs=init_ns)
+            profile.algebra = prepared.algebra
+        return prepared
+
+    @contextmanager
+    def counting(self, profile: QueryProfile):
+        """Counts the solutions of every algebra operator evaluated inside
+        the block by wrapping rdflib's evalPart"""
+        eval_part = evaluate.evalPart
+
+        def counted(solutions, counts):
+            for solution in solutions:
+                counts["rows"] += 1
+                yield solution
+
+        def counting_eval_part(ctx, part):
+            result = eval_part(ctx, part)
+            counts = profile.evaluated(part)
+            if isinstance(result, dict):
+                # Query forms return their result, their operators are counted
+                counts["form"] = True
+                return result
+            return counted(result, counts)
+
+        evaluate.evalPart = counting_eval_part
+        update.evalPart = counting_eval_part
+        try:
+            yield profile
+        finally:
+            evaluate.evalPart = eval_part
+            update.evalPart = eval_part
+
+    def record(self, profile: QueryProfile):
+        self.history.append(profile)
+
+    def to_json(self) -> list:
+        return [profile.to_dict() for profile in self.history]
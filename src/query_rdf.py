@@ -2,14 +2,26 @@ import json
 
 import js
 
-import pandas as pd
-
 import helpers
 
 from pyparsing.exceptions import ParseException
-from helpers import remove_errors
-from load_rdf import bibframe_sparql
-from state import RESULTS_DF, BF_GRAPH
+from helpers import chunked_blob, remove_errors
+from load_rdf import bibframe_sparql, summarize_graph
+from query_profiler import QueryProfile
+from query_results import QueryResults
+from results_export import RESULT_FORMATS, result_chunks
+from state import (
+    BF_GRAPH,
+    EXPORT_CHUNK_SIZE,
+    GRAPH_WORKER,
+    JOURNAL_SAMPLE_SIZE,
+    QUERY_CACHE,
+    QUERY_PROFILER,
+    QUERY_RESULTS,
+    RESULTS_PAGE_SIZE,
+    UPDATE_JOURNAL,
+)
+from worker_client import GraphWorkerCancelled
 
 
 from jinja2 import Template
@@ -27,10 +39,19 @@ query_results_template = Template(
     </button>
     <ul class="dropdown-menu" aria-labelledby="rdf-download-file">
         <li><a py-click="download_query_results" data-serialization='csv' class="dropdown-item" href="#">CSV (.csv)</a></li>
-        <li><a class="dropdown-item" py-click="download_query_results" data-serialization='json' href="#">JSON (.json)</a></li>
+        <li><a py-click="download_query_results" data-serialization='tsv' class="dropdown-item" href="#">TSV (.tsv)</a></li>
+        <li><a class="dropdown-item" py-click="download_query_results" data-serialization='json' href="#">SPARQL JSON (.srj)</a></li>
+        <li><a class="dropdown-item" py-click="download_query_results" data-serialization='jsonl' href="#">JSON Lines (.jsonl)</a></li>
     </ul>
   </div>
 </div>
+<div class="d-flex align-items-center m-1">
+  <button class="btn btn-sm btn-outline-secondary" py-click="query_results_page"
+          data-page="{{ page - 1 }}" {% if page < 1 %}disabled{% endif %}>&laquo; Previous</button>
+  <span class="mx-2">Rows {{ "{:,}".format(start + 1 if total > 0 else 0) }}&ndash;{{ "{:,}".format(stop) }} of {{ "{:,}".format(total) }}</span>
+  <button class="btn btn-sm btn-outline-secondary" py-click="query_results_page"
+          data-page="{{ page + 1 }}" {% if stop >= total %}disabled{% endif %}>Next &raquo;</button>
+</div>
 <table class="table">          
   <thead>
     <tr>
@@ -40,10 +61,10 @@ query_results_template = Template(
     </tr>                       
   </thead>
   <tbody>
-    {% for result in results %}
+    {% for row in rows %}
      <tr>
-      {% for var in vars %}
-      <td>{{ result[var] }}</td>
+      {% for value in row %}
+      <td>{% if value is not none %}{{ value|e }}{% endif %}</td>
       {% endfor %}                     
      </tr> 
     {% endfor %}                        
@@ -54,33 +75,213 @@ query_results_template = Template(
 )
 
 
+update_delta_template = Template(
+    """<div class="w-100">
+<p><strong>{{ label }}</strong>
+  <span class="badge text-bg-success">{{ "{:,}".format(added) }} added</span>
+  <span class="badge text-bg-danger">{{ "{:,}".format(removed) }} removed</span>
+</p>
+{% for heading, triples in [("Added", sample.added), ("Removed", sample.removed)] %}
+{% if triples %}
+<h6>{{ heading }} (sample)</h6>
+<ul class="small">
+{% for triple in triples %}
+  <li><code>{{ triple|join(" ")|e }}</code></li>
+{% endfor %}
+</ul>
+{% endif %}
+{% endfor %}
+<div class="btn-group" role="group">
+  {% if preview %}
+  <button class="btn btn-sm btn-success" py-click="keep_update">Keep</button>
+  <button class="btn btn-sm btn-danger" py-click="discard_update">Discard</button>
+  {% endif %}
+  <button class="btn btn-sm btn-outline-secondary" py-click="undo_update" {% if not can_undo %}disabled{% endif %}>Undo</button>
+  <button class="btn btn-sm btn-outline-secondary" py-click="redo_update" {% if not can_redo %}disabled{% endif %}>Redo</button>
+</div>
+</div>
+"""
+)
+
+
+query_profile_template = Template(
+    """<div class="w-100">
+{% if profile %}
+<p><strong>{{ profile.kind|default("query", true)|capitalize }}</strong>
+  <span class="badge text-bg-secondary">{{ profile.total_ms }} ms</span>
+  {% if profile.rows is not none %}<span class="badge text-bg-info">{{ "{:,}".format(profile.rows) }} rows</span>{% endif %}
+  {% if profile.error %}<span class="badge text-bg-danger">{{ profile.error|e }}</span>{% endif %}
+</p>
+<table class="table table-sm w-auto">
+  <thead><tr><th>Phase</th><th>ms</th></tr></thead>
+  <tbody>
+  {% for phase, ms in profile.phases_ms.items() %}
+    <tr><td>{{ phase }}</td><td class="text-end">{{ ms }}</td></tr>
+  {% endfor %}
+  </tbody>
+</table>
+{% macro operator(node) %}
+  <li><code>{{ node.operator }}</code>
+    {% if node.detail %}<small class="text-body-secondary">{{ node.detail|e }}</small>{% endif %}
+    <span class="badge text-bg-light">{{ "{:,}".format(node.calls) }} calls</span>
+    {% if node.rows is not none %}<span class="badge text-bg-light">{{ "{:,}".format(node.rows) }} rows</span>{% endif %}
+    {% if node.children %}
+    <ul>{% for child in node.children %}{{ operator(child) }}{% endfor %}</ul>
+    {% endif %}
+  </li>
+{% endmacro %}
+{% if profile.algebra %}
+<h6>Algebra</h6>
+<ul class="small">{{ operator(profile.algebra) }}</ul>
+{% endif %}
+{% endif %}
+<div class="d-flex align-items-center">
+  <h6 class="me-2 mb-0">Recent queries</h6>
+  <button class="btn btn-sm btn-outline-secondary" py-click="download_query_profiles"
+          {% if not history %}disabled{% endif %}>Download JSON</button>
+</div>
+<table class="table table-sm">
+  <thead><tr><th>Started</th><th>Kind</th><th>Total ms</th><th>Rows</th><th>Query</th></tr></thead>
+  <tbody>
+  {% for row in history %}
+    <tr>
+      <td>{{ row.started }}</td>
+      <td>{{ row.kind or "" }}</td>
+      <td class="text-end">{{ row.total_ms }}</td>
+      <td class="text-end">{% if row.rows is not none %}{{ "{:,}".format(row.rows) }}{% endif %}</td>
+      <td><code>{{ row.sparql|truncate(80)|e }}</code></td>
+    </tr>
+  {% endfor %}
+  </tbody>
+</table>
+</div>
+"""
+)
+
+
+def _render_profile(profile: QueryProfile | None):
+    tab = js.document.getElementById("bf-query-profile-tab")
+    tab.classList.remove("d-none")
+    output_element = js.document.getElementById("bf-query-profile")
+    output_element.innerHTML = query_profile_template.render(
+        profile=profile.to_dict() if profile is not None else None,
+        history=[previous.to_dict() for previous in reversed(QUERY_PROFILER.history)],
+    )
+
+
+def _render_update(entry, label: str, preview: bool = False):
+    output_element = js.document.getElementById("bf-sparql-results")
+    sample = entry.sample(JOURNAL_SAMPLE_SIZE)
+    namespace_manager = BF_GRAPH.namespace_manager
+    output_element.innerHTML = update_delta_template.render(
+        label=label,
+        added=len(entry.added),
+        removed=len(entry.removed),
+        sample={
+            key: [[term.n3(namespace_manager) for term in triple] for triple in triples]
+            for key, triples in sample.items()
+        },
+        preview=preview,
+        can_undo=len(UPDATE_JOURNAL.undo_stack) > 0,
+        can_redo=len(UPDATE_JOURNAL.redo_stack) > 0,
+    )
+
+
+def _render_results_page(page: int):
+    output_element = js.document.getElementById("bf-sparql-results")
+    start = page * RESULTS_PAGE_SIZE
+    stop = min(start + RESULTS_PAGE_SIZE, len(QUERY_RESULTS))
+    output_element.innerHTML = query_results_template.render(
+        vars=QUERY_RESULTS.vars,
+        rows=QUERY_RESULTS.rows(start, stop),
+        page=page,
+        start=start,
+        stop=stop,
+        total=len(QUERY_RESULTS),
+    )
+
+
+async def query_results_page(event):
+    if QUERY_RESULTS is None:
+        return
+    page = int(event.target.getAttribute("data-page"))
+    last_page = max(0, (len(QUERY_RESULTS) - 1) // RESULTS_PAGE_SIZE)
+    _render_results_page(min(max(page, 0), last_page))
+
+
 async def download_query_results(event):
     serialization = event.target.getAttribute("data-serialization")
-    js.console.log(f"Download query results {serialization} {len(RESULTS_DF)}")
-    mime_type, content = None, None
-    match serialization:
-        case "csv":
-            mime_type = "text/csv"
-            contents = RESULTS_DF.to_csv(index=False)
-
-        case "json":
-            mime_type = "application/json"
-            contents = json.dumps(RESULTS_DF.to_dict(orient="records"))
-
-        case _:
-            js.alert(f"Unknown serialization {serialization}")
-            return
-    blob = js.Blob.new([contents], {"type": mime_type})
+    if QUERY_RESULTS is None or serialization not in RESULT_FORMATS:
+        js.alert(f"Unknown serialization {serialization}")
+        return
+    js.console.log(f"Download query results {serialization} {len(QUERY_RESULTS)}")
+    extension, mime_type = RESULT_FORMATS[serialization]
+    chunks = result_chunks(QUERY_RESULTS, serialization, EXPORT_CHUNK_SIZE)
+    blob = await chunked_blob(chunks, mime_type, "Exporting query results")
     anchor = js.document.createElement("a")
     anchor.href = js.URL.createObjectURL(blob)
-    anchor.download = f"query-results.{serialization}"
+    anchor.download = f"query-results.{extension}"
+    js.document.body.appendChild(anchor)
+    anchor.click()
+    js.document.body.removeChild(anchor)
+
+
+def _run_profiled(sparql_query: str):
+    """Runs the query or update on the main thread, bypassing the graph
+    worker and the prepared query cache, timing each phase"""
+    global QUERY_RESULTS
+    global BF_GRAPH
+
+    bench_header = js.document.getElementById("bench-heading")
+    profile = QueryProfile(sparql_query)
+    try:
+        prepared = QUERY_PROFILER.prepare(profile, sparql_query, dict(BF_GRAPH.namespaces()))
+        with QUERY_PROFILER.counting(profile):
+            with profile.phase("evaluate"):
+                if profile.kind == "query":
+                    QUERY_RESULTS = QueryResults(BF_GRAPH.query(prepared))
+                else:
+                    with UPDATE_JOURNAL.recording(sparql_query) as entry:
+                        BF_GRAPH.update(prepared)
+        with profile.phase("render"):
+            if profile.kind == "query":
+                profile.rows = len(QUERY_RESULTS)
+                bench_header.innerHTML = f"<h2>Query Results {len(QUERY_RESULTS):,} Rows</h2>"
+                _render_results_page(0)
+            else:
+                bench_header.innerHTML = f"<h2>Updated SPARQL</h2>"
+                _render_update(entry, "Update applied, keep or discard the changes", preview=len(entry) > 0)
+                summarize_graph(BF_GRAPH)
+    except Exception as e:
+        profile.error = str(e)
+        raise
+    finally:
+        QUERY_PROFILER.record(profile)
+        _render_profile(profile)
+
+
+async def toggle_profiling(event):
+    QUERY_PROFILER.enabled = bool(event.target.checked)
+    if QUERY_PROFILER.enabled:
+        _render_profile(None)
+
+
+async def download_query_profiles(event):
+    blob = await chunked_blob(
+        [json.dumps(QUERY_PROFILER.to_json(), indent=2)],
+        "application/json",
+        "Exporting query profiles",
+    )
+    anchor = js.document.createElement("a")
+    anchor.href = js.URL.createObjectURL(blob)
+    anchor.download = "query-profiles.json"
     js.document.body.appendChild(anchor)
     anchor.click()
     js.document.body.removeChild(anchor)
 
 
 async def run_query(*args):
-    global RESULTS_DF
+    global QUERY_RESULTS
     global BF_GRAPH
 
     await remove_errors()
@@ -93,22 +294,86 @@ async def run_query(*args):
     for class_ in ["active", "show"]:
         output_element.classList.add(class_)
     output_element.innerHTML = ""
+    if QUERY_PROFILER.enabled:
+        try:
+            _run_profiled(sparql_query)
+        except Exception as e:
+            output_element.innerHTML = f"""<h2>Query Error</h2><p>{e}</p>"""
+        return
     try:
-        query = BF_GRAPH.query(sparql_query)
-        RESULTS_DF = pd.DataFrame(query.bindings)
-        output_element.innerHTML = query_results_template.render(
-            vars=query.vars, results=query.bindings
-        )
-        bench_header.innerHTML = f"<h2>Query Results {len(query.bindings):,} Rows</h2>"
+        namespaces = dict(BF_GRAPH.namespaces())
+        prepared_query = QUERY_CACHE.prepare(sparql_query, namespaces)
+        if GRAPH_WORKER is not None and prepared_query.algebra.name == "SelectQuery":
+            QUERY_RESULTS = await GRAPH_WORKER.select(sparql_query, namespaces)
+        else:
+            query = QUERY_CACHE.query(BF_GRAPH, sparql_query, namespaces)
+            if isinstance(query, QueryResults):
+                QUERY_RESULTS = query
+            else:
+                QUERY_RESULTS = QueryResults(query)
+        bench_header.innerHTML = f"<h2>Query Results {len(QUERY_RESULTS):,} Rows</h2>"
+        _render_results_page(0)
     except ParseException:
         # Try to do a SPARQL Update
-        BF_GRAPH.update(sparql_query)
-        output_element.innerHTML = f"Query:<pre>{sparql_query}</pre>"
+        with UPDATE_JOURNAL.recording(sparql_query) as entry:
+            BF_GRAPH.update(sparql_query)
         bench_header.innerHTML = f"<h2>Updated SPARQL</h2>"
+        _render_update(entry, "Update applied, keep or discard the changes", preview=len(entry) > 0)
+        summarize_graph(BF_GRAPH)
+    except GraphWorkerCancelled:
+        bench_header.innerHTML = f"<h2>Query cancelled</h2>"
     except Exception as e:
         output_element.content = f"""<h2>Query Error</h2><p>{e}</p>"""
 
 
+async def cancel_graph_worker(event):
+    if GRAPH_WORKER is not None:
+        GRAPH_WORKER.cancel()
+
+
+async def keep_update(event):
+    bench_header = js.document.getElementById("bench-heading")
+    output_element = js.document.getElementById("bf-sparql-results")
+    bench_header.innerHTML = f"<h2>Update kept</h2>"
+    output_element.innerHTML = ""
+
+
+async def discard_update(event):
+    global BF_GRAPH
+
+    entry = UPDATE_JOURNAL.undo(redoable=False)
+    if entry is None:
+        return
+    bench_header = js.document.getElementById("bench-heading")
+    bench_header.innerHTML = f"<h2>Update discarded</h2>"
+    _render_update(entry, "Discarded")
+    summarize_graph(BF_GRAPH)
+
+
+async def undo_update(event):
+    global BF_GRAPH
+
+    entry = UPDATE_JOURNAL.undo()
+    if entry is None:
+        return
+    bench_header = js.document.getElementById("bench-heading")
+    bench_header.innerHTML = f"<h2>Undid SPARQL Update</h2>"
+    _render_update(entry, "Undone")
+    summarize_graph(BF_GRAPH)
+
+
+async def redo_update(event):
+    global BF_GRAPH
+
+    entry = UPDATE_JOURNAL.redo()
+    if entry is None:
+        return
+    bench_header = js.document.getElementById("bench-heading")
+    bench_header.innerHTML = f"<h2>Redid SPARQL Update</h2>"
+    _render_update(entry, "Redone")
+    summarize_graph(BF_GRAPH)
+
+
 async def run_summary_query(event):
     data_query = getattr(event.target.attributes, 'data-query')
     query_element = js.document.getElementById("bf-sparql-query")
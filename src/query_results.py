@@ -0,0 +1,84 @@
+import rdflib
+
+from rdflib.term import _is_valid_uri
+from rdflib.util import from_n3
+
+
+def n3_term(term) -> str | None:
+    if term is None:
+        return None
+    if isinstance(term, rdflib.URIRef) and not _is_valid_uri(term):
+        # Loaded from sources that skip IRI validation, from_n3 still reads it
+        return f"<{term}>"
+    return term.n3()
+
+
+class QueryResults:
+    """Columnar copy of a SPARQL result: one list of terms per variable.
+
+    Rows are only materialized for the slice being rendered or exported.
+    """
+
+    def __init__(self, result, progress=None, progress_every: int = 10_000):
+        self.type = result.type
+        match result.type:
+            case "SELECT":
+                self.vars = list(result.vars)
+                rows = result
+
+            case "ASK":
+                self.vars = [rdflib.Variable("ask")]
+                rows = [(rdflib.Literal(result.askAnswer),)]
+
+            case _:
+                self.vars = [rdflib.Variable(name) for name in ["subject", "predicate", "object"]]
+                rows = result
+        self.columns = [[] for _ in self.vars]
+        for count, row in enumerate(rows, start=1):
+            for column, value in zip(self.columns, row):
+                column.append(value)
+            if progress is not None and count % progress_every == 0:
+                # The callback may raise to abandon a long running query
+                progress(count)
+
+    @classmethod
+    def from_columns(cls, type_: str, vars: list, columns: list) -> "QueryResults":
+        """Rebuilds results from to_columns() output"""
+        results = cls.__new__(cls)
+        results.type = type_
+        results.vars = [rdflib.Variable(var) for var in vars]
+        terms = {}
+        for column in columns:
+            for value in column:
+                if value is not None and value not in terms:
+                    terms[value] = from_n3(value)
+        results.columns = [[terms.get(value) for value in column] for column in columns]
+        return results
+
+    def to_columns(self) -> dict:
+        """Plain lists of N-Triples terms, cheap to send between threads"""
+        return {
+            "type": self.type,
+            "vars": [str(var) for var in self.vars],
+            "columns": [[n3_term(value) for value in column] for column in self.columns],
+        }
+
+    def __len__(self):
+        if len(self.columns) < 1:
+            return 0
+        return len(self.columns[0])
+
+    def __iter__(self):
+        return self.rows()
+
+    def rows(self, start: int = 0, stop: int | None = None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            yield tuple(column[i] for column in self.columns)
+
+    @property
+    def bindings(self) -> list:
+        return [
+            {var: value for var, value in zip(self.vars, row) if value is not None}
+            for row in self.rows()
+        ]
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Dictionary backed storage, used when browser storage is unavailable
+    and in tests"""
+
+    def __init__(self):
+        self.items = {}
+
+    async def get(self, key: str) -> str | None:
+        return self.items.get(key)
+
+    async def set(self, key: str, value: str):
+        self.items[key] = value
+
+    async def delete(self, key: str):
+        self.items.pop(key, None)
+
+    async def keys(self) -> list:
+        return list(self.items.keys())
+
+
+class LocalStorageBackend:
+    """Browser localStorage, persists across sessions but only holds a
+    few MB per origin"""
+
+    def __init__(self):
+        import js
+
+        self.storage = js.localStorage
+
+    async def get(self, key: str) -> str | None:
+        return self.storage.getItem(key)
+
+    async def set(self, key: str, value: str):
+        self.storage.setItem(key, value)
+
+    async def delete(self, key: str):
+        self.storage.removeItem(key)
+
+    async def keys(self) -> list:
+        return [self.storage.key(i) for i in range(self.storage.length)]
+
+
+class CacheStorageBackend:
+    """Browser Cache Storage, persists across sessions with a quota of a
+    share of the free disk space rather than localStorage's few MB.
+    Each key is stored as a synthetic request URL under path."""
+
+    def __init__(self, name: str, path: str = "./resource-cache/"):
+        self.name = name
+        self.path = path
+        self._cache = None
+
+    async def _open(self):
+        if self._cache is None:
+            import js
+
+            self._cache = await js.caches.open(self.name)
+        return self._cache
+
+    def _url(self, key: str) -> str:
+        return f"{self.path}{quote(key, safe='')}"
+
+    async def get(self, key: str) -> str | None:
+        cache = await self._open()
+        response = await cache.match(self._url(key))
+        if response is None:
+            return None
+        return await response.text()
+
+    async def set(self, key: str, value: str):
+        import js
+
+        cache = await self._open()
+        await cache.put(self._url(key), js.Response.new(value))
+
+    async def delete(self, key: str):
+        cache = await self._open()
+        await cache.delete(self._url(key))
+
+    async def keys(self) -> list:
+        cache = await self._open()
+        keys = []
+        for request in await cache.keys():
+            keys.append(unquote(request.url.rpartition("/")[2]))
+        return keys
+
+
+class ResourceCache:
+    """Caches HTTP payloads by URL with their ETag and Last-Modified
+    validators, revalidating with conditional requests and evicting the
+    least recently used entries once max_bytes is exceeded.
+
+    Backends are async key/value stores with get, set, delete and keys.
+    """
+
+    def __init__(self, backend, client, max_bytes: int = 4_000_000, prefix: str = "resource-cache:"):
+        self.backend = backend
+        self.client = client
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.index_key = f"{prefix}__index__"
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.total_bytes = 0
+        self._index = None
+        self._index_lock = asyncio.Lock()
+
+    async def _load_index(self) -> OrderedDict:
+        """URL to payload size, least recently used first"""
+        if self._index is not None:
+            return self._index
+        async with self._index_lock:
+            # Concurrent fetches wait for the first one to load the index
+            if self._index is not None:
+                return self._index
+            stored = await self.backend.get(self.index_key)
+            index = OrderedDict(json.loads(stored) if stored else [])
+            # Entries written after the index was last flushed
+            for key in await self.backend.keys():
+                if key.startswith(self.prefix) and key != self.index_key:
+                    url = key[len(self.prefix):]
+                    if url not in index:
+                        entry = await self.backend.get(key)
+                        index[url] = len(entry) if entry else 0
+            self._index = index
+            self.total_bytes = sum(index.values())
+            return self._index
+
+    async def _entry(self, url: str) -> dict | None:
+        index = await self._load_index()
+        if url not in index:
+            return None
+        stored = await self.backend.get(f"{self.prefix}{url}")
+        if stored is None:
+            self._forget(url)
+            return None
+        index.move_to_end(url)
+        return json.loads(stored)
+
+    def _forget(self, url: str):
+        size = self._index.pop(url, None)
+        if size is not None:
+            self.total_bytes -= size
+
+    async def _evict(self, needed: int):
+        while len(self._index) > 0 and self.total_bytes + needed > self.max_bytes:
+            url, size = self._index.popitem(last=False)
+            self.total_bytes -= size
+            await self.backend.delete(f"{self.prefix}{url}")
+
+    async def _store(self, url: str, payload: str, headers: dict):
+        if not (headers.get("etag") or headers.get("last-modified")):
+            # Nothing to revalidate against
+            return
+        entry = json.dumps({
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "payload": payload,
+        })
+        if len(entry) > self.max_bytes:
+            return
+        await self._load_index()
+        self._forget(url)
+        await self._evict(len(entry))
+        try:
+            await self.backend.set(f"{self.prefix}{url}", entry)
+        except Exception as e:
+            # Browser storage quota exceeded, skip caching this payload
+            logger.warning(f"Could not cache {url}: {e}")
+            return
+        self._index[url] = len(entry)
+        self.total_bytes += len(entry)
+
+    async def fetch(self, url: str) -> tuple:
+        """Returns the (status, text) for the URL, served from the cache when
+        the server confirms the cached copy is still current."""
+        entry = await self._entry(url)
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = await self.client.request(url, headers=headers)
+        if response.status == 304 and entry is not None:
+            self.hits += 1
+            self.bytes_saved += len(entry["payload"])
+            return 200, entry["payload"]
+        self.misses += 1
+        text = await response.text()
+        if response.ok:
+            await self._store(url, text, response.headers)
+        return response.status, text
+
+    async def flush(self):
+        """Persists the LRU order"""
+        if self._index is not None:
+            await self.backend.set(self.index_key, json.dumps(list(self._index.items())))
+
+    async def clear(self):
+        index = await self._load_index()
+        for url in list(index):
+            await self.backend.delete(f"{self.prefix}{url}")
+        index.clear()
+        self.total_bytes = 0
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+            "entries": len(self._index or {}),
+            "bytes": self.total_bytes,
+        }
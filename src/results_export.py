@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+
+import rdflib
+
+from rdflib.plugins.serializers.nt import _quoteLiteral
+
+from graph_export import join_chunks
+from query_results import QueryResults, n3_term
+
+
+# Export formats: file extension and MIME type
+RESULT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "tsv": ("tsv", "text/tab-separated-values"),
+    "json": ("srj", "application/sparql-results+json"),
+    "jsonl": ("jsonl", "application/jsonl"),
+}
+
+
+def _csv_value(term) -> str:
+    # SPARQL 1.1 CSV drops term types, blank nodes keep their _: label
+    if term is None:
+        return ""
+    if isinstance(term, rdflib.BNode):
+        return term.n3()
+    return str(term)
+
+
+def _tsv_value(term) -> str:
+    # SPARQL 1.1 TSV writes terms as in Turtle, with tabs escaped
+    if term is None:
+        return ""
+    if isinstance(term, rdflib.Literal):
+        return _quoteLiteral(term).replace("\t", "\\t")
+    return n3_term(term)
+
+
+def json_term(term) -> dict:
+    """A term in the SPARQL 1.1 Query Results JSON format"""
+    if isinstance(term, rdflib.BNode):
+        return {"type": "bnode", "value": str(term)}
+    if isinstance(term, rdflib.Literal):
+        value = {"type": "literal", "value": str(term)}
+        if term.language is not None:
+            value["xml:lang"] = term.language
+        elif term.datatype is not None:
+            value["datatype"] = str(term.datatype)
+        return value
+    return {"type": "uri", "value": str(term)}
+
+
+def _json_binding(vars: list, row: tuple) -> dict:
+    return {var: json_term(value) for var, value in zip(vars, row) if value is not None}
+
+
+def _with_header(header: str, rows):
+    yield header
+    yield from rows
+
+
+def _csv_rows(results: QueryResults):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in results.rows():
+        writer.writerow([_csv_value(term) for term in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def csv_chunks(results: QueryResults, chunk_size: int = 1_048_576):
+    header = ",".join(str(var) for var in results.vars) + "\r\n"
+    return join_chunks(_with_header(header, _csv_rows(results)), chunk_size)
+
+
+def tsv_chunks(results: QueryResults, chunk_size: int = 1_048_576):
+    header = "\t".join(f"?{var}" for var in results.vars) + "\n"
+    rows = ("\t".join(_tsv_value(term) for term in row) + "\n" for row in results.rows())
+    return join_chunks(_with_header(header, rows), chunk_size)
+
+
+def _sparql_json_parts(results: QueryResults):
+    vars = [str(var) for var in results.vars]
+    if results.type == "ASK":
+        answer = len(results) > 0 and results.columns[0][0].toPython()
+        yield json.dumps({"head": {}, "boolean": bool(answer)})
+        return
+    yield json.dumps({"head": {"vars": vars}})[:-1] + ', "results": {"bindings": ['
+    for position, row in enumerate(results.rows()):
+        separator = "" if position == 0 else ","
+        yield separator + json.dumps(_json_binding(vars, row))
+    yield "]}}"
+
+
+def sparql_json_chunks(results: QueryResults, chunk_size: int = 1_048_576):
+    return join_chunks(_sparql_json_parts(results), chunk_size)
+
+
+def jsonl_chunks(results: QueryResults, chunk_size: int = 1_048_576):
+    """One JSON object per row, each bound variable a SPARQL JSON term"""
+    vars = [str(var) for var in results.vars]
+    rows = (json.dumps(_json_binding(vars, row)) + "\n" for row in results.rows())
+    return join_chunks(rows, chunk_size)
+
+
+def result_chunks(results: QueryResults, serialization: str, chunk_size: int = 1_048_576):
+    match serialization:
+        case "csv":
+            return csv_chunks(results, chunk_size)
+        case "tsv":
+            return tsv_chunks(results, chunk_size)
+        case "json":
+            return sparql_json_chunks(results, chunk_size)
+        case "jsonl":
+            return jsonl_chunks(results, chunk_size)
+    raise ValueError(f"Unknown serialization {serialization}")
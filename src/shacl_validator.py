@@ -0,0 +1,175 @@
+from collections import Counter
+
+import rdflib
+
+SH = rdflib.Namespace("http://www.w3.org/ns/shacl#")
+
+
+class IncrementalValidator:
+    """SHACL validation against shapes that are parsed and harvested once.
+
+    Registered as a listener on BF_GRAPH's store, it records the nodes
+    touched by every change. After a first full validation, later runs only
+    re-validate the focus nodes affected by those changes and patch their
+    results into the kept report graph.
+    """
+
+    def __init__(self, shapes_path: str):
+        self.shapes_path = shapes_path
+        self.shapes_graph = None
+        self.shape_targets = []
+        self.report_graph = None
+        self.report_node = rdflib.BNode()
+        self.results = {}
+        self.triple_refs = Counter()
+        self.changed = set()
+
+    def _touch(self, triple):
+        # A triple belongs to its subject's description. IRI objects are
+        # usually shared vocabulary terms whose own descriptions did not
+        # change, so only blank node objects are tracked.
+        subject, _, object_ = triple
+        self.changed.add(subject)
+        if isinstance(object_, rdflib.BNode):
+            self.changed.add(object_)
+
+    def triple_added(self, triple):
+        self._touch(triple)
+
+    def triple_removed(self, triple):
+        self._touch(triple)
+
+    def load_shapes(self):
+        from pyshacl.shapes_graph import ShapesGraph
+
+        if self.shapes_graph is not None:
+            return self.shapes_graph
+        shacl_graph = rdflib.Graph()
+        shacl_graph.parse(self.shapes_path, format="turtle")
+        self.shapes_graph = ShapesGraph(shacl_graph)
+        for shape in self.shapes_graph.shapes:
+            nodes, classes, implicit_classes, objects_of, subjects_of = shape.target()
+            targets = (set(nodes), set(classes) | set(implicit_classes), set(objects_of), set(subjects_of))
+            if any(len(target) > 0 for target in targets):
+                self.shape_targets.append((shape, targets))
+        return self.shapes_graph
+
+    def _affected_nodes(self, graph: rdflib.Graph) -> set:
+        # Constraints on a focus node can follow paths into its blank nodes
+        # and linked resources, so a change also affects the nodes that
+        # refer to the changed node, walking up through blank nodes.
+        affected = set(self.changed)
+        frontier = list(self.changed)
+        while len(frontier) > 0:
+            node = frontier.pop()
+            for referrer in graph.subjects(object=node):
+                if referrer in affected:
+                    continue
+                affected.add(referrer)
+                if isinstance(referrer, rdflib.BNode) or isinstance(node, rdflib.BNode):
+                    frontier.append(referrer)
+        return affected
+
+    def _node_classes(self, graph: rdflib.Graph, node) -> set:
+        classes = set()
+        for class_ in graph.objects(node, rdflib.RDF.type):
+            classes.update(graph.transitive_objects(class_, rdflib.RDFS.subClassOf))
+        return classes
+
+    def _focus_nodes(self, graph: rdflib.Graph, nodes: set, targets: tuple) -> list:
+        target_nodes, target_classes, objects_of, subjects_of = targets
+        focus = []
+        for node in nodes:
+            if (
+                node in target_nodes
+                or not self._node_classes(graph, node).isdisjoint(target_classes)
+                or any((node, predicate, None) in graph for predicate in subjects_of)
+                or any((None, predicate, node) in graph for predicate in objects_of)
+            ):
+                focus.append(node)
+        return focus
+
+    def _new_report(self):
+        self.report_graph = rdflib.Graph(bind_namespaces="core")
+        for prefix, namespace in self.shapes_graph.graph.namespace_manager.namespaces():
+            self.report_graph.bind(prefix, namespace)
+        self.report_graph.add((self.report_node, rdflib.RDF.type, SH.ValidationReport))
+        self.results = {}
+        self.triple_refs.clear()
+
+    def _add_reports(self, reports: list) -> rdflib.Graph:
+        from pyshacl.validator import Validator
+
+        delta_graph, _ = Validator.create_validation_report(self.shapes_graph, len(reports) < 1, reports)
+        delta_report = delta_graph.value(predicate=rdflib.RDF.type, object=SH.ValidationReport)
+        for result_node in delta_graph.objects(delta_report, SH.result):
+            triples = [(self.report_node, SH.result, result_node)]
+            frontier, seen = [result_node], {result_node}
+            while len(frontier) > 0:
+                for triple in delta_graph.triples((frontier.pop(), None, None)):
+                    triples.append(triple)
+                    if isinstance(triple[2], rdflib.BNode) and triple[2] not in seen:
+                        seen.add(triple[2])
+                        frontier.append(triple[2])
+            for triple in triples:
+                self.triple_refs[triple] += 1
+                self.report_graph.add(triple)
+            is_violation = (result_node, SH.resultSeverity, SH.Violation) in delta_graph
+            focus_node = delta_graph.value(result_node, SH.focusNode)
+            self.results.setdefault(focus_node, []).append((triples, is_violation))
+        return delta_graph
+
+    def _remove_results(self, focus_node):
+        for triples, _ in self.results.pop(focus_node, []):
+            for triple in triples:
+                self.triple_refs[triple] -= 1
+                if self.triple_refs[triple] < 1:
+                    del self.triple_refs[triple]
+                    self.report_graph.remove(triple)
+
+    def validate(self, graph: rdflib.Graph, progress=None) -> tuple:
+        """Returns conforms, the full report graph, the report graph for just
+        the re-validated focus nodes, and how many focus nodes were
+        re-validated (None for a full validation).
+
+        progress, if given, is called with the number of shapes done and
+        the total before each shape; raising from it abandons the run and
+        the next one starts over with a full validation."""
+        from pyshacl.pytypes import SHACLExecutor
+
+        shapes_graph = self.load_shapes()
+        executor = SHACLExecutor(allow_warnings=True)
+        reports, revalidated = [], None
+        try:
+            if self.report_graph is None:
+                self._new_report()
+                for count, shape in enumerate(shapes_graph.shapes):
+                    if progress is not None:
+                        progress(count, len(shapes_graph.shapes))
+                    _, shape_reports = shape.validate(executor, graph)
+                    reports.extend(shape_reports)
+            else:
+                affected = self._affected_nodes(graph)
+                revalidated = 0
+                for node in affected:
+                    self._remove_results(node)
+                for count, (shape, targets) in enumerate(self.shape_targets):
+                    if progress is not None:
+                        progress(count, len(self.shape_targets))
+                    focus = self._focus_nodes(graph, affected, targets)
+                    if len(focus) < 1:
+                        continue
+                    revalidated += len(focus)
+                    _, shape_reports = shape.validate(executor, graph, focus=focus)
+                    reports.extend(shape_reports)
+        except BaseException:
+            # The kept report no longer matches the graph
+            self.report_graph = None
+            raise
+        delta_graph = self._add_reports(reports)
+        self.changed.clear()
+        conforms = not any(
+            is_violation for node_results in self.results.values() for _, is_violation in node_results
+        )
+        self.report_graph.set((self.report_node, SH.conforms, rdflib.Literal(conforms)))
+        return conforms, self.report_graph, delta_graph, revalidated
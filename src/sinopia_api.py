@@ -1,9 +1,14 @@
-import json
-from functools import cache
+import asyncio
+import html
+
+from urllib.parse import urlencode
 
 import js
 from pyodide.ffi import create_proxy
-from pyodide.http import pyfetch
+
+from helpers import async_ttl_cache
+from load_rdf import ingest_jsonld, summarize_graph
+from state import CHANGE_TRACKER, HTTP_CLIENT, SINOPIA_GROUPS_TTL, BF_GRAPH
 
 environments = {
     "Development": "https://api.development.sinopia.io/",
@@ -25,10 +30,12 @@ def _generate_url(event):
     group_url_div.appendChild(group_anchor)
 
 
-@cache
+@async_ttl_cache(SINOPIA_GROUPS_TTL)
 async def _get_groups(sinopia_api: str):
     groups_url = f"{sinopia_api}groups/"
-    http_result = await pyfetch(groups_url)
+    http_result = await HTTP_CLIENT.request(groups_url)
+    if not http_result.ok:
+        raise ValueError(f"{http_result.status} {await http_result.text()}")
     result = await http_result.json()
     data = result["data"]
     groups = [("All", "all")]
@@ -43,7 +50,7 @@ async def _on_load_groups(event):
     group_select = js.document.querySelector("#env-groups")
     while group_select.options.length > 0:
         group_select.remove(0)
-    groups = _get_groups(event.target.id)
+    groups = await _get_groups(event.target.id)
     js.console.log(f"Size of groups {len(groups)}")
     for group in groups:
         option = js.document.createElement("option")
@@ -95,15 +102,7 @@ async def show_groups(*args):
     group_select = js.document.getElementById("env-groups")
     while group_select.options.length > 0:
         group_select.remove(0)
-    groups_url = f"{api_url}groups/"
-    get_result = await pyfetch(groups_url)
-    result = await get_result.json()
-    # data = json.loads(result.getvalue())["data"]
-    data = result["data"]
-    groups = [("All", "all")]
-    for row in data:
-        groups.append((row["label"], row["id"]))
-    groups = sorted(groups, key=lambda y: y[0])
+    groups = await _get_groups(api_url)
     for group in groups:
         option = js.document.createElement("option")
         option.setAttribute("value", group[1])
@@ -111,6 +110,77 @@ async def show_groups(*args):
         group_select.appendChild(option)
 
 
+def _group_resources_url(api_url: str, group: str) -> str:
+    resources_url = f"{api_url}resource"
+    if not group.startswith("all"):
+        resources_url = f"{resources_url}?" + urlencode({"group": group})
+    return resources_url
+
+
+async def _fetch_resources_page(page_url: str) -> dict:
+    page_result = await HTTP_CLIENT.request(page_url)
+    if not page_result.ok:
+        raise ValueError(f"{page_result.status} {await page_result.text()}")
+    return await page_result.json()
+
+
+def _harvest_progress(harvested: int, failed: int, pages: int) -> str:
+    return f"""Harvesting Sinopia <span class="badge text-bg-success">{harvested:,} resources</span>
+    <span class="badge text-bg-danger">{failed:,} failed</span>
+    <span class="badge text-bg-secondary">{pages:,} pages</span>"""
+
+
+async def harvest_sinopia_group(event):
+    """
+    Pages through a Sinopia group's resources, adding each page to BF_GRAPH
+    while the next one is retrieved
+    """
+    global BF_GRAPH
+
+    radio_env = js.document.querySelector("input[name='sinopia_env']:checked")
+    group_select = js.document.getElementById("env-groups")
+    if radio_env is None or not group_select.value:
+        js.alert("Select a Sinopia environment and group to harvest")
+        return
+    bench_heading = js.document.getElementById("bench-heading")
+    bench_bc_result = js.document.getElementById("search-results")
+    loading_spinner = js.document.getElementById("sinopia-harvest-status")
+    loading_spinner.classList.remove("d-none")
+    page_url = _group_resources_url(environments[radio_env.value], group_select.value)
+    harvested, failed, pages, errors = 0, 0, 0, []
+    next_page = asyncio.ensure_future(_fetch_resources_page(page_url))
+    while next_page is not None:
+        try:
+            page = await next_page
+        except Exception as e:
+            errors.append((page_url, e))
+            break
+        pages += 1
+        resources = page.get("data", [])
+        resources_url, page_url = page_url, page.get("links", {}).get("next")
+        next_page = None
+        if page_url and len(resources) > 0:
+            next_page = asyncio.ensure_future(_fetch_resources_page(page_url))
+        for resource in resources:
+            try:
+                with CHANGE_TRACKER.loading():
+                    ingest_jsonld(resource.get("uri", resources_url), resource.get("data", []))
+                harvested += 1
+            except Exception as e:
+                failed += 1
+                errors.append((resource.get("uri"), e))
+        bench_heading.innerHTML = _harvest_progress(harvested, failed, pages)
+        # Let the browser repaint between pages
+        await asyncio.sleep(0)
+    if len(errors) > 0:
+        bench_bc_result.innerHTML = "<ul>" + "".join(
+            f"""<li><span class="text-danger">ERROR!</span> {html.escape(str(url))}: {html.escape(str(error))}</li>"""
+            for url, error in errors
+        ) + "</ul>"
+    loading_spinner.classList.add("d-none")
+    summarize_graph(BF_GRAPH)
+
+
 async def sinopia_api(widget_div):
     widget_div.element.classList.add("row")
     env_column = js.document.createElement("div")
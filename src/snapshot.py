@@ -0,0 +1,210 @@
+import json
+import struct
+import sys
+import zlib
+
+from array import array
+from itertools import accumulate
+
+import rdflib
+
+
+MAGIC = b"BFSNAP"
+
+VERSION = 1
+
+IRI, BNODE, LITERAL, LANG_LITERAL, TYPED_LITERAL = range(5)
+
+
+class SnapshotError(Exception):
+    """Raised for data that is not a snapshot this version can read"""
+
+
+def _pack(values: array) -> bytes:
+    """Little-endian bytes, for 32 bit integers grouped by byte position
+    so the mostly zero high bytes compress into long runs"""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    data = values.tobytes()
+    if values.itemsize == 1:
+        return data
+    return b"".join(data[i::values.itemsize] for i in range(values.itemsize))
+
+
+def _unpack(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    if values.itemsize > 1:
+        plane = len(data) // values.itemsize
+        interleaved = bytearray(len(data))
+        for i in range(values.itemsize):
+            interleaved[i::values.itemsize] = data[i * plane:(i + 1) * plane]
+        data = interleaved
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _key(term) -> tuple:
+    if isinstance(term, rdflib.BNode):
+        return BNODE, str(term), ""
+    if isinstance(term, rdflib.Literal):
+        if term.language is not None:
+            return LANG_LITERAL, str(term), term.language
+        if term.datatype is not None:
+            return TYPED_LITERAL, str(term), str(term.datatype)
+        return LITERAL, str(term), ""
+    return IRI, str(term), ""
+
+
+class TermDictionary:
+    """Numbers the terms in sorted order, so that neighbouring ids share
+    prefixes, and keeps the columns the snapshot stores for them: a kind,
+    the lexical form and an index into the languages or datatypes."""
+
+    def __init__(self, terms):
+        self.ids = {}
+        self.kinds = array("B")
+        self.values = []
+        self.extras = array("I")
+        self.languages = {}
+        self.datatypes = {}
+        for term_id, (key, term) in enumerate(sorted((_key(term), term) for term in terms)):
+            kind, value, extra = key
+            self.ids[term] = term_id
+            self.kinds.append(kind)
+            self.values.append(value)
+            if kind == LANG_LITERAL:
+                self.extras.append(self._extra(self.languages, extra))
+            elif kind == TYPED_LITERAL:
+                self.extras.append(self._extra(self.datatypes, extra))
+            else:
+                self.extras.append(0)
+
+    def _extra(self, table: dict, value: str) -> int:
+        if value not in table:
+            table[value] = len(table)
+        return table[value]
+
+
+def _terms(header: dict, kinds: array, values: list, extras: array) -> list:
+    languages = header["languages"]
+    datatypes = [rdflib.URIRef(datatype) for datatype in header["datatypes"]]
+    terms = []
+    for kind, value, extra in zip(kinds, values, extras):
+        if kind == IRI:
+            terms.append(rdflib.URIRef(value))
+        elif kind == BNODE:
+            terms.append(rdflib.BNode(value))
+        elif kind == LANG_LITERAL:
+            terms.append(rdflib.Literal(value, lang=languages[extra]))
+        elif kind == TYPED_LITERAL:
+            terms.append(rdflib.Literal(value, datatype=datatypes[extra]))
+        else:
+            terms.append(rdflib.Literal(value))
+    return terms
+
+
+def dumps(graph: rdflib.Graph, state: dict | None = None, compresslevel: int = 6) -> bytes:
+    """Encodes the graph's triples and namespace bindings, together with any
+    JSON-serializable working state, as a snapshot.
+
+    Terms are stored once in a sorted dictionary and triples as three
+    integer columns ordered by subject, the subject column delta encoded,
+    which zlib compresses far better than a text serialization.
+    """
+    terms = set()
+    for triple in graph:
+        terms.update(triple)
+    dictionary = TermDictionary(terms)
+    ids = dictionary.ids
+    triples = sorted((ids[s], ids[p], ids[o]) for s, p, o in graph)
+    subjects, predicates, objects = array("I"), array("I"), array("I")
+    previous = 0
+    for s, p, o in triples:
+        subjects.append(s - previous)
+        predicates.append(p)
+        objects.append(o)
+        previous = s
+    lexical = "".join(dictionary.values)
+    header = {
+        "terms": len(dictionary.values),
+        "triples": len(triples),
+        "languages": list(dictionary.languages),
+        "datatypes": list(dictionary.datatypes),
+        "namespaces": [[prefix, str(uri)] for prefix, uri in graph.namespaces()],
+        "state": state or {},
+    }
+    sections = [
+        json.dumps(header).encode("utf-8"),
+        _pack(dictionary.kinds),
+        _pack(array("I", (len(value) for value in dictionary.values))),
+        _pack(dictionary.extras),
+        lexical.encode("utf-8"),
+        _pack(subjects),
+        _pack(predicates),
+        _pack(objects),
+    ]
+    body = b"".join(struct.pack("<Q", len(section)) + section for section in sections)
+    return MAGIC + struct.pack("<B", VERSION) + zlib.compress(body, compresslevel)
+
+
+def _sections(body: bytes):
+    view, offset = memoryview(body), 0
+    while offset < len(view):
+        (size,) = struct.unpack_from("<Q", view, offset)
+        offset += 8
+        if offset + size > len(view):
+            raise SnapshotError("corrupt snapshot: truncated section")
+        yield view[offset:offset + size]
+        offset += size
+
+
+def loads(data: bytes) -> tuple:
+    """Returns the triples as a list, the namespace bindings and the
+    working state stored by dumps"""
+    data = bytes(data)
+    if not data.startswith(MAGIC) or len(data) == len(MAGIC):
+        raise SnapshotError("not a graph snapshot")
+    version = data[len(MAGIC)]
+    if version != VERSION:
+        raise SnapshotError(f"unsupported snapshot version {version}")
+    try:
+        body = zlib.decompress(data[len(MAGIC) + 1:])
+    except zlib.error as e:
+        raise SnapshotError(f"corrupt snapshot: {e}")
+    try:
+        return _decode(body)
+    except (struct.error, KeyError, IndexError, TypeError, ValueError) as e:
+        # Truncated sections, ids past the term dictionary, bad UTF-8 or JSON
+        raise SnapshotError(f"corrupt snapshot: {e!r}")
+
+
+def _decode(body: bytes) -> tuple:
+    sections = list(_sections(body))
+    if len(sections) != 8:
+        raise SnapshotError("corrupt snapshot: missing sections")
+    header = json.loads(bytes(sections[0]))
+    kinds = _unpack("B", sections[1])
+    lengths = _unpack("I", sections[2])
+    extras = _unpack("I", sections[3])
+    lexical = bytes(sections[4]).decode("utf-8")
+    offsets = [0, *accumulate(lengths)]
+    if len(kinds) != header["terms"] or offsets[-1] != len(lexical):
+        raise SnapshotError("corrupt snapshot: term dictionary does not match its header")
+    values = [lexical[start:stop] for start, stop in zip(offsets, offsets[1:])]
+    terms = _terms(header, kinds, values, extras)
+    subjects = accumulate(_unpack("I", sections[5]))
+    predicates = _unpack("I", sections[6])
+    objects = _unpack("I", sections[7])
+    triples = [
+        (terms[s], terms[p], terms[o]) for s, p, o in zip(subjects, predicates, objects)
+    ]
+    if len(triples) != header["triples"]:
+        raise SnapshotError("corrupt snapshot: triple count does not match its header")
+    namespaces = [(str(prefix), str(uri)) for prefix, uri in header["namespaces"]]
+    state = header["state"]
+    if not isinstance(state, dict):
+        raise TypeError("working state is not an object")
+    return triples, namespaces, state
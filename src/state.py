@@ -1,5 +1,17 @@
 import rdflib
 
+from change_tracker import ChangeTracker
+from graph_stats import GraphStatistics
+from graph_store import ObservedArrayStore, ObservedMemory
+from http_client import HTTPClient
+from jsonld_contexts import ContextRegistry
+from parse_pool import ParseWorkerPool
+from query_cache import QueryCache
+from query_profiler import QueryProfiler
+from resource_cache import CacheStorageBackend, ResourceCache
+from update_journal import UpdateJournal
+from worker_client import GraphWorker
+
 
 NAMESPACES = [
     ("bf", "http://id.loc.gov/ontologies/bibframe/"),
@@ -7,9 +19,86 @@ NAMESPACES = [
     ("sinopia", "http://sinopia.io/vocabulary/"),
 ]
 
-BF_GRAPH = rdflib.Graph()
+# ObservedArrayStore keeps triples as integer ids in sorted arrays, a
+# fraction of the memory of rdflib's Memory store (ObservedMemory)
+GRAPH_STORE = ObservedArrayStore
+
+BF_GRAPH = rdflib.Graph(store=GRAPH_STORE())
+
+BF_STATS = GraphStatistics()
+BF_GRAPH.store.listeners.append(BF_STATS)
+
+CHANGE_TRACKER = ChangeTracker(BF_GRAPH)
+BF_GRAPH.store.listeners.append(CHANGE_TRACKER)
+
+UPDATE_JOURNAL = UpdateJournal(BF_GRAPH, max_entries=20, tracker=CHANGE_TRACKER)
+BF_GRAPH.store.listeners.append(UPDATE_JOURNAL)
+
+# SELECT queries and SHACL validation run in the graph-worker against a
+# mirror of BF_GRAPH so the page stays responsive, at the cost of a
+# second copy of the graph in the worker
+USE_GRAPH_WORKER = True
+
+GRAPH_WORKER = None
+if USE_GRAPH_WORKER:
+    GRAPH_WORKER = GraphWorker("graph-worker")
+    BF_GRAPH.store.listeners.append(GRAPH_WORKER)
+
+JOURNAL_SAMPLE_SIZE = 10
+
+QUERY_RESULTS = None
+
+SEARCH_RESULTS = {}
+
+SEARCH_PAGE_SIZE = 25
+
+SINOPIA_GROUPS_TTL = 600
+
+RESULTS_PAGE_SIZE = 100
+
+QUERY_CACHE = QueryCache()
+
+# Opt-in per-phase timings and algebra explain for run_query
+QUERY_PROFILER = QueryProfiler(max_history=50)
+
+MAX_CONCURRENT_FETCHES = 8
+
+HTTP_CLIENT = HTTPClient(max_concurrent=MAX_CONCURRENT_FETCHES, retries=3, timeout=60.0)
+
+# Cache Storage holds a working set of thousands of resources, where
+# localStorage's few MB held a few hundred
+RESOURCE_CACHE = ResourceCache(
+    CacheStorageBackend("graph-toolbox-resources"), HTTP_CLIENT, max_bytes=200_000_000
+)
+
+SKOLEMIZE_RESOURCES = False
+
+JSONLD_CONTEXTS = ContextRegistry()
+
+HISTOGRAM_SIZE = 15
+
+MARC_CHUNK_SIZE = 50
+
+MARC_READ_SIZE = 1_048_576
+
+CBD_ZIP_BATCH_SIZE = 100
+
+# CBD archive entries are parsed in a pool of workers, one per spare core
+USE_PARSE_WORKERS = True
+
+PARSE_POOL = None
+if USE_PARSE_WORKERS:
+    PARSE_POOL = ParseWorkerPool(JSONLD_CONTEXTS, RESOURCE_CACHE.fetch, max_workers=4)
+
+SAVE_BATCH_BYTES = 1_048_576
+
+SAVE_GZIP = False
+
+# Characters per chunk when downloading graphs and query results
+EXPORT_CHUNK_SIZE = 1_048_576
 
-RESULTS_DF = None
+# Cache Storage name for session snapshots saved in the browser
+SNAPSHOT_CACHE = "graph-toolbox-sessions"
 
 for ns in NAMESPACES:
     BF_GRAPH.namespace_manager.bind(ns[0], ns[1])
@@ -0,0 +1,119 @@
+from contextlib import contextmanager
+from itertools import islice
+
+import rdflib
+
+
+class JournalEntry:
+    """Net triples added and removed by a single SPARQL Update"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.added = set()
+        self.removed = set()
+        # ChangeTracker checkpoints from before and after the update
+        self.checkpoints = None
+
+    def triple_added(self, triple):
+        if triple in self.removed:
+            self.removed.discard(triple)
+        else:
+            self.added.add(triple)
+
+    def triple_removed(self, triple):
+        if triple in self.added:
+            self.added.discard(triple)
+        else:
+            self.removed.add(triple)
+
+    def sample(self, size: int) -> dict:
+        return {
+            "added": list(islice(self.added, size)),
+            "removed": list(islice(self.removed, size)),
+        }
+
+    def __len__(self):
+        return len(self.added) + len(self.removed)
+
+
+class UpdateJournal:
+    """Observed store listener that journals SPARQL Updates so they
+    can be undone and redone by replaying only their deltas.
+
+    With a ChangeTracker, undo and redo also put back the resources the
+    tracker held as changed, as long as nothing else changed or saved
+    them in between, so an undone update is not saved again."""
+
+    def __init__(self, graph: rdflib.Graph, max_entries: int = 20, tracker=None):
+        self.graph = graph
+        self.max_entries = max_entries
+        self.tracker = tracker
+        self.undo_stack = []
+        self.redo_stack = []
+        self._current = None
+
+    @contextmanager
+    def recording(self, label: str):
+        """Journals the changes made inside the block. If the block raises,
+        the changes it made so far are rolled back, as a SPARQL Update
+        request is applied completely or not at all."""
+        entry = JournalEntry(label)
+        before = self._checkpoint()
+        self._current = entry
+        try:
+            yield entry
+        except BaseException:
+            self._current = None
+            self._apply(entry.added, entry.removed)
+            if before is not None:
+                self.tracker.restore(before)
+            raise
+        finally:
+            self._current = None
+        if before is not None:
+            entry.checkpoints = before, self.tracker.checkpoint()
+        if len(entry) > 0:
+            self.undo_stack.append(entry)
+            self.redo_stack.clear()
+            del self.undo_stack[:-self.max_entries]
+
+    def triple_added(self, triple):
+        if self._current is not None:
+            self._current.triple_added(triple)
+
+    def triple_removed(self, triple):
+        if self._current is not None:
+            self._current.triple_removed(triple)
+
+    def _checkpoint(self) -> tuple | None:
+        return self.tracker.checkpoint() if self.tracker is not None else None
+
+    def _replay(self, entry: JournalEntry, remove: set, add: set, start: int):
+        """Applies one direction of entry, start being the index of the
+        checkpoint the tracker has to be at for its dirty nodes to follow"""
+        current = entry.checkpoints is not None and self.tracker.generation == entry.checkpoints[start][0]
+        self._apply(remove, add)
+        if current:
+            self.tracker.restore(entry.checkpoints[1 - start])
+
+    def _apply(self, remove: set, add: set):
+        for triple in remove:
+            self.graph.remove(triple)
+        self.graph.addN((*triple, self.graph) for triple in add)
+
+    def undo(self, redoable: bool = True) -> JournalEntry | None:
+        if len(self.undo_stack) < 1:
+            return None
+        entry = self.undo_stack.pop()
+        self._replay(entry, entry.added, entry.removed, 1)
+        if redoable:
+            self.redo_stack.append(entry)
+        return entry
+
+    def redo(self) -> JournalEntry | None:
+        if len(self.redo_stack) < 1:
+            return None
+        entry = self.redo_stack.pop()
+        self._replay(entry, entry.removed, entry.added, 0)
+        self.undo_stack.append(entry)
+        return entry
@@ -1,14 +1,23 @@
-import pyshacl
-import rdflib
-
 from js import console, document
-from state import BF_GRAPH
+from lazy_packages import ensure_packages
+from shacl_validator import IncrementalValidator
+from state import BF_GRAPH, GRAPH_WORKER
+from worker_client import GraphWorkerCancelled
+
+
+SHACL_VALIDATOR = None
+if GRAPH_WORKER is None:
+    SHACL_VALIDATOR = IncrementalValidator("./shacl/all.ttl")
+    BF_GRAPH.store.listeners.append(SHACL_VALIDATOR)
 
-async def create_alert(is_valid: bool, total_triples: int):
+
+async def create_alert(is_valid: bool, total_triples: int, revalidated: int | None = None):
     alert = document.createElement("div")
     alert.setAttribute("style", "margin: 1em;")
     alert.setAttribute("role", "alert")
     alert_msg = f"{total_triples:,} triples"
+    if revalidated is not None:
+        alert_msg = f"{alert_msg} ({revalidated:,} changed focus nodes re-validated)"
     css_classes = ["alert", "alert-dismissible", "fade", "show"]
     match is_valid:
 
@@ -30,20 +39,28 @@ async def create_alert(is_valid: bool, total_triples: int):
 async def validate(event):
     global BF_GRAPH
 
-    validation_graph = rdflib.Graph()
-    validation_graph.parse("./shacl/all.ttl", format='turtle')
-
-    conforms, results_graph, results_str = pyshacl.validate(
-        BF_GRAPH, shacl_graph=validation_graph, allow_warnings=True
-    )
+    if GRAPH_WORKER is not None:
+        try:
+            result = await GRAPH_WORKER.validate()
+        except GraphWorkerCancelled:
+            return
+        conforms, results_str = result["conforms"], result["report"]
+        revalidated, total_triples = result["revalidated"], result["triples"]
+    else:
+        await ensure_packages("shacl")
+        conforms, results_graph, delta_graph, revalidated = SHACL_VALIDATOR.validate(BF_GRAPH)
+        if revalidated is not None:
+            # Only show the results for the re-validated focus nodes
+            results_graph = delta_graph
+        results_str = results_graph.serialize(format='turtle')
+        total_triples = len(BF_GRAPH)
 
-    alert = await create_alert(conforms, len(BF_GRAPH))
+    alert = await create_alert(conforms, total_triples, revalidated)
     validation_tab = document.getElementById("bf-validation-results-tab")
     validation_tab.classList.remove("d-none")
     validation_tab_pane = document.getElementById("bf-validation-results")
     validation_tab_pane.classList.remove("d-none")
     validation_tab_pane.appendChild(alert)
-    results_str = results_graph.serialize(format='turtle')
     pre = document.createElement("pre")
     pre.setAttribute("style", "margin: 1em;")
     pre.innerHTML = results_str.replace("<", "&lt;").replace(">", "&gt;")
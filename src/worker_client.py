@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+
+from itertools import islice
+
+import js
+
+from query_results import QueryResults, n3_term
+from update_journal import JournalEntry
+
+
+logger = logging.getLogger(__name__)
+
+
+class GraphWorkerCancelled(Exception):
+    """Raised when the user cancels the operation running in the worker"""
+
+
+class GraphWorker:
+    """Main thread side of the graph worker (graph_worker.py).
+
+    Registered as a listener on BF_GRAPH's store, it nets the triples added
+    and removed since the last call and sends them to the worker's mirror
+    graph as N-Triples terms after each load and before each query or
+    validation. Results come back as JSON, SELECT bindings as one list of
+    N-Triples terms per variable, so the page stays responsive while the
+    worker runs.
+
+    Only SELECT queries and SHACL validation run in the worker. BF_GRAPH
+    stays on the main thread, so single file loads, SPARQL Updates and
+    the MARC XSLT conversions still block the page (CBD archives are
+    parsed in parse_pool's workers). The mirror is a second copy of the
+    graph in the worker's heap, about 130 bytes per triple with its terms
+    (benchmarks/graph_store.py). Set state.USE_GRAPH_WORKER to False to
+    run everything on the main thread without it.
+    """
+
+    def __init__(self, name: str = "graph-worker", chunk_size: int = 50_000):
+        self.name = name
+        self.chunk_size = chunk_size
+        self.pending = JournalEntry(name)
+        self._worker = None
+        self._lock = asyncio.Lock()
+        self._background = set()
+
+    def triple_added(self, triple):
+        self.pending.triple_added(triple)
+
+    def triple_removed(self, triple):
+        self.pending.triple_removed(triple)
+
+    async def worker(self):
+        if self._worker is None:
+            from pyscript import workers
+
+            self._worker = await workers[self.name]
+        return self._worker
+
+    def _chunks(self, entry: JournalEntry):
+        # Removals go first so a chunk never drops a triple re-added later.
+        # Only one chunk at a time is converted to N-Triples terms.
+        for key, triples in (("removed", entry.removed), ("added", entry.added)):
+            triples = iter(triples)
+            while batch := list(islice(triples, self.chunk_size)):
+                rows = [[n3_term(term) for term in triple] for triple in batch]
+                yield {"added": [], "removed": [], key: rows}
+
+    async def sync(self) -> int:
+        """Sends the pending changes, returns the size of the mirror graph"""
+        worker = await self.worker()
+        # Deltas must reach the worker in the order they were made
+        async with self._lock:
+            entry, self.pending = self.pending, JournalEntry(self.name)
+            size = None
+            try:
+                for chunk in self._chunks(entry):
+                    size = await worker.apply_delta(json.dumps(chunk))
+                    # Let the page handle events before converting the next chunk
+                    await asyncio.sleep(0)
+                if size is None:
+                    size = await worker.apply_delta(json.dumps({"added": [], "removed": []}))
+            except BaseException:
+                # Resent in full next time, re-applying a chunk is harmless
+                later, self.pending = self.pending, entry
+                for triple in later.removed:
+                    entry.triple_removed(triple)
+                for triple in later.added:
+                    entry.triple_added(triple)
+                raise
+        return size
+
+    def schedule_sync(self):
+        """Sends the pending changes in the background, called after loads
+        so the delta does not grow with the graph until the first query"""
+        if len(self.pending) == 0:
+            return
+        task = asyncio.ensure_future(self.sync())
+        self._background.add(task)
+        task.add_done_callback(self._sync_done)
+
+    def _sync_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Graph worker sync failed: {task.exception()}")
+
+    def _status(self, visible: bool, message: str = ""):
+        status = js.document.getElementById("graph-worker-status")
+        if visible:
+            js.document.getElementById("graph-worker-progress").innerText = message
+            status.classList.remove("d-none")
+        else:
+            status.classList.add("d-none")
+
+    async def _call(self, message: str, method: str, *args) -> dict:
+        js.window.graphWorkerCancel = False
+        self._status(True, "Syncing graph")
+        try:
+            await self.sync()
+            self._status(True, message)
+            worker = await self.worker()
+            payload = json.loads(await getattr(worker, method)(*args))
+        finally:
+            self._status(False)
+        if payload.get("cancelled"):
+            raise GraphWorkerCancelled(message)
+        return payload
+
+    async def select(self, sparql: str, namespaces: dict) -> QueryResults:
+        payload = await self._call("Running query", "select", sparql, json.dumps(namespaces))
+        return QueryResults.from_columns(payload["type"], payload["vars"], payload["columns"])
+
+    async def validate(self) -> dict:
+        """Returns conforms, the report (or the re-validated part of it) as
+        Turtle, the number of re-validated focus nodes and the graph size"""
+        return await self._call("Validating", "validate")
+
+    def cancel(self):
+        # Polled by the worker between rows and shapes
+        js.window.graphWorkerCancel = True
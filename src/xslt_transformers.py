@@ -0,0 +1,45 @@
+import time
+
+
+class Transformer:
+    """Compiled XSLT stylesheet that accumulates its transform timings."""
+
+    def __init__(self, path: str):
+        from lxml import etree
+
+        self.path = path
+        start = time.perf_counter()
+        self.xslt = etree.XSLT(etree.parse(path))
+        self.compile_time = time.perf_counter() - start
+        self.transforms = 0
+        self.transform_time = 0.0
+
+    def __call__(self, doc, **params):
+        start = time.perf_counter()
+        try:
+            return self.xslt(doc, **params)
+        finally:
+            self.transforms += 1
+            self.transform_time += time.perf_counter() - start
+
+
+_transformers = {}
+
+
+def get_transformer(path: str) -> Transformer:
+    """Returns the session's compiled transformer for a stylesheet, compiling
+    it (with all its includes) on first use."""
+    if path not in _transformers:
+        _transformers[path] = Transformer(path)
+    return _transformers[path]
+
+
+def transformer_timings() -> dict:
+    return {
+        path: {
+            "compile": transformer.compile_time,
+            "transforms": transformer.transforms,
+            "transform": transformer.transform_time,
+        }
+        for path, transformer in _transformers.items()
+    }
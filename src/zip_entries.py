@@ -0,0 +1,141 @@
+import struct
+import zlib
+
+
+EOCD = b"PK\x05\x06"
+ZIP64_LOCATOR = b"PK\x06\x07"
+ZIP64_EOCD = b"PK\x06\x06"
+CENTRAL_HEADER = b"PK\x01\x02"
+LOCAL_HEADER = b"PK\x03\x04"
+
+EOCD_FORMAT = "<4s4H2LH"
+ZIP64_LOCATOR_FORMAT = "<4sLQL"
+ZIP64_EOCD_FORMAT = "<4sQ2H2L4Q"
+CENTRAL_FORMAT = "<4s6H3L5H2L"
+LOCAL_FORMAT = "<4s5H3L2H"
+
+STORED, DEFLATED = 0, 8
+
+# End of central directory record plus the longest possible comment
+MAX_EOCD_SIZE = struct.calcsize(EOCD_FORMAT) + 0xFFFF
+
+
+class ZipFormatError(Exception):
+    """Raised for archives or entries this reader cannot read"""
+
+
+class ZipEntry:
+    def __init__(self, filename: str, flags: int, compress_type: int, crc: int,
+                 compress_size: int, file_size: int, header_offset: int):
+        self.filename = filename
+        self.flags = flags
+        self.compress_type = compress_type
+        self.crc = crc
+        self.compress_size = compress_size
+        self.file_size = file_size
+        self.header_offset = header_offset
+
+    def is_dir(self) -> bool:
+        return self.filename.endswith("/")
+
+
+def _zip64_sizes(extra: bytes, file_size: int, compress_size: int, header_offset: int) -> tuple:
+    # The Zip64 extra field holds, in order, only the values that did not
+    # fit in their 32 bit fields
+    position = 0
+    while position + 4 <= len(extra):
+        field_id, field_size = struct.unpack_from("<2H", extra, position)
+        position += 4
+        if field_id == 0x0001:
+            values = list(struct.unpack_from(f"<{field_size // 8}Q", extra, position))
+            if file_size == 0xFFFFFFFF:
+                file_size = values.pop(0)
+            if compress_size == 0xFFFFFFFF:
+                compress_size = values.pop(0)
+            if header_offset == 0xFFFFFFFF:
+                header_offset = values.pop(0)
+            break
+        position += field_size
+    return file_size, compress_size, header_offset
+
+
+class AsyncZipReader:
+    """Reads a zip archive through read(offset, size), an async function
+    returning bytes, so only the central directory and the entry being
+    read are held in memory rather than the whole archive"""
+
+    def __init__(self, read, size: int):
+        self.read = read
+        self.size = size
+
+    async def _directory_location(self) -> tuple:
+        tail_offset = max(0, self.size - MAX_EOCD_SIZE)
+        tail = await self.read(tail_offset, self.size - tail_offset)
+        # The record is the last signature whose comment ends the file,
+        # the comment itself may contain the signature
+        eocd_size = struct.calcsize(EOCD_FORMAT)
+        position = tail.rfind(EOCD)
+        while position >= 0:
+            if position + eocd_size <= len(tail):
+                record = struct.unpack_from(EOCD_FORMAT, tail, position)
+                if position + eocd_size + record[-1] == len(tail):
+                    break
+            position = tail.rfind(EOCD, 0, position)
+        if position < 0:
+            raise ZipFormatError("not a zip archive")
+        _, _, _, _, count, directory_size, directory_offset, _ = record
+        if count == 0xFFFF or directory_size == 0xFFFFFFFF or directory_offset == 0xFFFFFFFF:
+            locator_position = position - struct.calcsize(ZIP64_LOCATOR_FORMAT)
+            if locator_position < 0 or tail[locator_position:locator_position + 4] != ZIP64_LOCATOR:
+                raise ZipFormatError("missing Zip64 end of central directory locator")
+            _, _, zip64_offset, _ = struct.unpack_from(ZIP64_LOCATOR_FORMAT, tail, locator_position)
+            record = await self.read(zip64_offset, struct.calcsize(ZIP64_EOCD_FORMAT))
+            if record[:4] != ZIP64_EOCD:
+                raise ZipFormatError("corrupt Zip64 end of central directory")
+            _, _, _, _, _, _, _, count, directory_size, directory_offset = struct.unpack(ZIP64_EOCD_FORMAT, record)
+        return count, directory_size, directory_offset
+
+    async def entries(self) -> list:
+        count, directory_size, directory_offset = await self._directory_location()
+        directory = await self.read(directory_offset, directory_size)
+        header_size = struct.calcsize(CENTRAL_FORMAT)
+        entries, position = [], 0
+        for _ in range(count):
+            if directory[position:position + 4] != CENTRAL_HEADER:
+                raise ZipFormatError("corrupt central directory")
+            (_, _, _, flags, compress_type, _, _, crc, compress_size, file_size,
+             name_size, extra_size, comment_size, _, _, _, header_offset) = struct.unpack_from(
+                CENTRAL_FORMAT, directory, position
+            )
+            position += header_size
+            raw_name = directory[position:position + name_size]
+            extra = directory[position + name_size:position + name_size + extra_size]
+            position += name_size + extra_size + comment_size
+            file_size, compress_size, header_offset = _zip64_sizes(extra, file_size, compress_size, header_offset)
+            # Bit 11 marks UTF-8 names, otherwise they are code page 437
+            filename = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+            entries.append(ZipEntry(filename, flags, compress_type, crc, compress_size, file_size, header_offset))
+        return entries
+
+    async def read_entry(self, entry: ZipEntry) -> bytes:
+        if entry.flags & 0x1:
+            raise ZipFormatError(f"{entry.filename} is encrypted")
+        header_size = struct.calcsize(LOCAL_FORMAT)
+        header = await self.read(entry.header_offset, header_size)
+        if header[:4] != LOCAL_HEADER:
+            raise ZipFormatError(f"corrupt local header for {entry.filename}")
+        *_, name_size, extra_size = struct.unpack(LOCAL_FORMAT, header)
+        data_offset = entry.header_offset + header_size + name_size + extra_size
+        data = await self.read(data_offset, entry.compress_size)
+        if entry.compress_type == STORED:
+            content = data
+        elif entry.compress_type == DEFLATED:
+            try:
+                content = zlib.decompressobj(-zlib.MAX_WBITS).decompress(data)
+            except zlib.error as e:
+                raise ZipFormatError(f"corrupt data for {entry.filename}: {e}")
+        else:
+            raise ZipFormatError(f"{entry.filename} uses unsupported compression {entry.compress_type}")
+        if len(content) != entry.file_size or zlib.crc32(content) != entry.crc:
+            raise ZipFormatError(f"bad CRC or size for {entry.filename}")
+        return content
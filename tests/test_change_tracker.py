@@ -0,0 +1,72 @@
+import rdflib
+
+from change_tracker import ChangeTracker
+from graph_store import ObservedArrayStore
+
+EX = rdflib.Namespace("http://example.com/")
+
+NO_CHANGES = {"added": [], "modified": [], "deleted": []}
+
+
+def _tracked_graph() -> tuple:
+    graph = rdflib.Graph(store=ObservedArrayStore())
+    tracker = ChangeTracker(graph)
+    graph.store.listeners.append(tracker)
+    title = rdflib.BNode()
+    with tracker.loading():
+        graph.add((EX.work, EX.title, title))
+        graph.add((title, EX.mainTitle, rdflib.Literal("Loaded")))
+        graph.add((EX.instance, EX.instanceOf, EX.work))
+    return graph, tracker, title
+
+
+def test_loaded_resources_are_the_baseline():
+    graph, tracker, _ = _tracked_graph()
+    assert tracker.baseline == {EX.work, EX.instance}
+    assert tracker.changes() == NO_CHANGES
+
+
+def test_added_modified_and_deleted_resources():
+    graph, tracker, _ = _tracked_graph()
+    graph.add((EX.new, EX.label, rdflib.Literal("New")))
+    graph.add((EX.work, EX.label, rdflib.Literal("Changed")))
+    graph.remove((EX.instance, None, None))
+    assert tracker.changes() == {
+        "added": [EX.new],
+        "modified": [EX.work],
+        "deleted": [EX.instance],
+    }
+
+
+def test_blank_node_changes_modify_the_resource_referencing_them():
+    graph, tracker, title = _tracked_graph()
+    graph.set((title, EX.mainTitle, rdflib.Literal("Edited")))
+    assert tracker.changes()["modified"] == [EX.work]
+
+
+def test_resource_added_and_removed_again_is_not_reported():
+    graph, tracker, _ = _tracked_graph()
+    graph.add((EX.new, EX.label, rdflib.Literal("New")))
+    graph.remove((EX.new, None, None))
+    assert tracker.changes() == NO_CHANGES
+
+
+def test_saved_resources_are_clean():
+    graph, tracker, title = _tracked_graph()
+    graph.add((EX.new, EX.label, rdflib.Literal("New")))
+    graph.set((title, EX.mainTitle, rdflib.Literal("Edited")))
+    graph.remove((EX.instance, None, None))
+    tracker.mark_saved([EX.new, EX.work, EX.instance])
+    assert tracker.changes() == NO_CHANGES
+    assert tracker.baseline == {EX.work, EX.new}
+    # Changed after the save, a saved addition is now a modification
+    graph.add((EX.new, EX.label, rdflib.Literal("Again")))
+    assert tracker.changes()["modified"] == [EX.new]
+
+
+def test_unsaved_resources_stay_dirty():
+    graph, tracker, _ = _tracked_graph()
+    graph.add((EX.new, EX.label, rdflib.Literal("New")))
+    graph.add((EX.work, EX.label, rdflib.Literal("Changed")))
+    tracker.mark_saved([EX.new])
+    assert tracker.changes() == {"added": [], "modified": [EX.work], "deleted": []}
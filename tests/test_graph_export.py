@@ -0,0 +1,72 @@
+import gzip
+
+import pytest
+import rdflib
+
+from rdflib.compare import isomorphic
+
+from graph_export import gzip_chunks, join_chunks, nquads_chunks, ntriples_chunks, turtle_chunks
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+EX = rdflib.Namespace("http://example.com/")
+
+
+def _graph(identifier=None) -> rdflib.Graph:
+    graph = rdflib.Graph(identifier=identifier)
+    graph.bind("bf", BF)
+    graph.bind("ex", EX)
+    for i in range(30):
+        instance, title = EX[f"instance{i}"], rdflib.BNode()
+        graph.add((instance, rdflib.RDF.type, BF.Instance))
+        graph.add((instance, BF.title, title))
+        graph.add((title, BF.mainTitle, rdflib.Literal(f'Title "{i}"\nwith a line break', lang="en")))
+        graph.add((instance, BF.extent, rdflib.Literal(i)))
+        graph.add((instance, BF.date, rdflib.Literal("2020-01-01", datatype=rdflib.XSD.date)))
+        graph.add((instance, BF.note, rdflib.Literal("Ünïcödé \\ backslash\ttab")))
+        # Local names that are not valid prefixed names stay full IRIs
+        graph.add((instance, BF.identifiedBy, EX[f"id/{i}.1"]))
+        graph.add((instance, rdflib.URIRef("http://example.org/no-prefix#p"), EX["1st"]))
+    return graph
+
+
+@pytest.mark.parametrize("chunks, format", [(ntriples_chunks, "nt"), (turtle_chunks, "turtle")])
+def test_chunks_parse_back_to_the_same_graph(chunks, format):
+    graph = _graph()
+    parts = list(chunks(graph, chunk_size=200))
+    assert len(parts) > 1
+    assert isomorphic(rdflib.Graph().parse(data="".join(parts), format=format), graph)
+
+
+def test_turtle_uses_the_bound_prefixes():
+    turtle = "".join(turtle_chunks(_graph()))
+    assert "@prefix bf: <http://id.loc.gov/ontologies/bibframe/> ." in turtle
+    assert "\nex:instance0 " in turtle
+    assert "a bf:Instance" in turtle
+    # Local names that are not valid prefixed names
+    assert "<http://example.com/id/0.1>" in turtle
+    assert "<http://example.com/1st>" in turtle
+
+
+def test_nquads_keep_the_graph_name():
+    graph = _graph(EX.graph)
+    dataset = rdflib.Dataset()
+    dataset.parse(data="".join(nquads_chunks(graph, chunk_size=200)), format="nquads")
+    assert isomorphic(dataset.graph(EX.graph), graph)
+
+
+def test_unnamed_graph_nquads_are_triples():
+    graph = _graph()
+    nquads = "".join(nquads_chunks(graph))
+    assert nquads == "".join(ntriples_chunks(graph))
+
+
+def test_gzip_chunks_are_one_stream():
+    graph = _graph()
+    compressed = b"".join(gzip_chunks(ntriples_chunks(graph, chunk_size=200)))
+    text = gzip.decompress(compressed).decode("utf-8")
+    assert isomorphic(rdflib.Graph().parse(data=text, format="nt"), graph)
+
+
+def test_join_chunks():
+    assert list(join_chunks(["ab", "c", "def", "g"], 3)) == ["abc", "def", "g"]
+    assert list(join_chunks([], 3)) == []
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+import rdflib
+
+from graph_store import ObservedArrayStore, ObservedMemory
+
+EX = rdflib.Namespace("http://example.com/")
+
+SUBJECTS = [EX[f"s{i}"] for i in range(12)] + [rdflib.BNode(f"b{i}") for i in range(4)]
+PREDICATES = [EX[f"p{i}"] for i in range(5)]
+OBJECTS = SUBJECTS[:6] + [rdflib.Literal(i) for i in range(6)] + [
+    rdflib.Literal("title", lang="en"),
+    rdflib.Literal("title"),
+    rdflib.Literal("2020-01-01", datatype=rdflib.XSD.date),
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def triple_added(self, triple):
+        self.events.append(("added", triple))
+
+    def triple_removed(self, triple):
+        self.events.append(("removed", triple))
+
+
+def _random_triple(rng: random.Random) -> tuple:
+    return rng.choice(SUBJECTS), rng.choice(PREDICATES), rng.choice(OBJECTS)
+
+
+def _random_pattern(rng: random.Random) -> tuple:
+    return tuple(term if rng.random() < 0.5 else None for term in _random_triple(rng))
+
+
+def _graphs() -> tuple:
+    memory = rdflib.Graph(store=ObservedMemory())
+    # A small delta so the random changes go through many compactions
+    array = rdflib.Graph(store=ObservedArrayStore(min_delta=8, delta_ratio=0.1))
+    for graph in (memory, array):
+        graph.store.listeners.append(Recorder())
+    return memory, array
+
+
+def _assert_equivalent(memory: rdflib.Graph, array: rdflib.Graph, rng: random.Random):
+    assert len(array) == len(memory)
+    assert set(array) == set(memory)
+    for _ in range(10):
+        pattern = _random_pattern(rng)
+        assert sorted(array.triples(pattern)) == sorted(memory.triples(pattern))
+        triple = _random_triple(rng)
+        assert (triple in array) == (triple in memory)
+    assert array.store.version == memory.store.version
+
+
+def _assert_same_events(memory: rdflib.Graph, array: rdflib.Graph):
+    # Triples removed by a pattern are reported in each store's index order
+    events = [graph.store.listeners[0].events for graph in (memory, array)]
+    assert sorted(events[1]) == sorted(events[0])
+    for recorded in events:
+        recorded.clear()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_changes_match_the_memory_store(seed):
+    rng = random.Random(seed)
+    memory, array = _graphs()
+    for step in range(400):
+        action = rng.random()
+        if action < 0.5:
+            triple = _random_triple(rng)
+            memory.add(triple)
+            array.add(triple)
+        elif action < 0.65:
+            triples = [_random_triple(rng) for _ in range(rng.randrange(1, 20))]
+            memory.addN((*triple, memory) for triple in triples)
+            array.addN((*triple, array) for triple in triples)
+        elif action < 0.9:
+            triple = _random_triple(rng)
+            memory.remove(triple)
+            array.remove(triple)
+        elif action < 0.99:
+            pattern = _random_pattern(rng)
+            memory.remove(pattern)
+            array.remove(pattern)
+        else:
+            memory.remove((None, None, None))
+            array.remove((None, None, None))
+        _assert_same_events(memory, array)
+        if step % 20 == 0:
+            _assert_equivalent(memory, array, rng)
+    _assert_equivalent(memory, array, rng)
+    array.store.compact()
+    _assert_equivalent(memory, array, rng)
+
+
+def test_adding_while_iterating_matches_the_memory_store():
+    rng = random.Random(1)
+    memory, array = _graphs()
+    for triple in (_random_triple(rng) for _ in range(50)):
+        memory.add(triple)
+        array.add(triple)
+    for graph in (memory, array):
+        for s, p, o in list(graph.triples((None, PREDICATES[0], None))):
+            graph.add((s, EX.copy, o))
+    assert set(array) == set(memory)
+
+
+def test_namespace_bindings_match_the_memory_store():
+    memory, array = _graphs()
+    for graph in (memory, array):
+        graph.bind("ex", EX)
+        graph.bind("ex", rdflib.URIRef("http://example.org/"), override=False)
+        graph.bind("other", EX, replace=True)
+    assert sorted(array.namespaces()) == sorted(memory.namespaces())
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_client import HTTPClient, RequestError
+
+
+class StubServer:
+    """Local HTTP server with simulated latency and failures. Paths are
+    /<name>?fail=<n>&status=<code>&delay=<seconds>, the first n requests
+    for a path answer with status, later ones with 200."""
+
+    def __init__(self):
+        self.requests = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                path, _, query = self.path.partition("?")
+                params = dict(pair.split("=") for pair in query.split("&") if "=" in pair)
+                length = int(self.headers.get("Content-Length", 0))
+                if length > 0:
+                    self.rfile.read(length)
+                with stub.lock:
+                    count = stub.requests[self.path] = stub.requests.get(self.path, 0) + 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(float(params.get("delay", 0)))
+                with stub.lock:
+                    stub.in_flight -= 1
+                status = 200
+                if count <= int(params.get("fail", 0)):
+                    status = int(params.get("status", 503))
+                body = f"{self.command} {path} {count}".encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _respond
+            do_POST = _respond
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class UrllibResponse:
+    def __init__(self, status: int, headers: dict, body: str):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    async def text(self) -> str:
+        return self.body
+
+
+async def urllib_transport(url: str, method: str = "GET", headers: dict | None = None, body=None):
+    """pyfetch stand-in for CPython"""
+
+    def send():
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        request = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return UrllibResponse(response.status, dict(response.headers), response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            return UrllibResponse(e.code, dict(e.headers), e.read().decode("utf-8"))
+
+    return await asyncio.to_thread(send)
+
+
+@pytest.fixture
+def server():
+    stub = StubServer()
+    yield stub
+    stub.close()
+
+
+def _client(**kwargs) -> HTTPClient:
+    return HTTPClient(transport=urllib_transport, backoff=0.01, **kwargs)
+
+
+def test_get_is_retried_until_it_succeeds(server):
+    client = _client(retries=3)
+    response = asyncio.run(client.request(f"{server.url}/resources/1?fail=2&status=502"))
+    assert response.status == 200
+    assert server.requests["/resources/1?fail=2&status=502"] == 3
+    counters = client.stats()[f"127.0.0.1:{server.url.rsplit(':', 1)[1]}/resources/{{id}}"]
+    assert counters["requests"] == 3
+    assert counters["retries"] == 2
+    assert counters["errors"] == 0
+
+
+def test_get_returns_the_last_failure_after_all_retries(server):
+    client = _client(retries=2)
+    response = asyncio.run(client.request(f"{server.url}/resources/2?fail=10&status=500"))
+    assert response.status == 500
+    assert server.requests["/resources/2?fail=10&status=500"] == 3
+
+
+def test_post_is_not_retried_after_a_bad_gateway(server):
+    client = _client(retries=3)
+    path = "/api/batches/upload/?fail=1&status=502"
+    response = asyncio.run(client.request(f"{server.url}{path}", method="POST", body="[]"))
+    assert response.status == 502
+    assert server.requests[path] == 1
+
+
+def test_post_is_retried_when_the_server_is_unavailable(server):
+    client = _client(retries=3)
+    for status in (429, 503):
+        path = f"/api/batches/upload/?fail=1&status={status}"
+        response = asyncio.run(client.request(f"{server.url}{path}", method="POST", body="[]"))
+        assert response.status == 200
+        assert server.requests[path] == 2
+
+
+def test_slow_requests_time_out(server):
+    client = _client(retries=1, timeout=0.1)
+    with pytest.raises(RequestError):
+        asyncio.run(client.request(f"{server.url}/slow?delay=0.5"))
+
+
+def test_requests_in_flight_are_limited(server):
+    client = _client(max_concurrent=3)
+
+    async def fetch_all():
+        return await asyncio.gather(
+            *(client.request(f"{server.url}/resources/{i}?delay=0.05") for i in range(12))
+        )
+
+    responses = asyncio.run(fetch_all())
+    assert all(response.status == 200 for response in responses)
+    assert server.max_in_flight == 3
+
+
+def test_auth_requests_carry_the_access_token(server):
+    seen = {}
+
+    async def transport(url, **options):
+        seen.update(options["headers"])
+        return await urllib_transport(url, **options)
+
+    client = HTTPClient(transport=transport, access_token=lambda: "token")
+    asyncio.run(client.request(f"{server.url}/api/", auth=True))
+    assert seen["Authorization"] == "Bearer token"
@@ -0,0 +1,96 @@
+import rdflib
+
+from jsonld_contexts import ContextRegistry, parse_jsonld
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+
+CONTEXT = {"bf": str(BF), "rdfs": str(rdflib.RDFS)}
+
+
+def _resource(uri: str, title: str, identifier: str) -> dict:
+    return {
+        "@context": CONTEXT,
+        "@graph": [
+            {
+                "@id": uri,
+                "bf:title": {"@id": "_:b0"},
+                "bf:identifiedBy": {"@id": "_:b1"},
+            },
+            {"@id": "_:b0", "bf:mainTitle": title},
+            {"@id": "_:b1", "rdfs:label": identifier},
+        ],
+    }
+
+
+def test_resources_sharing_bnode_labels_stay_separate():
+    graph = rdflib.Graph()
+    contexts = ContextRegistry()
+    parse_jsonld(_resource("http://example.com/1", "First", "id-1"), graph, contexts)
+    parse_jsonld(_resource("http://example.com/2", "Second", "id-2"), graph, contexts)
+
+    assert len(graph) == 8
+    first_title = graph.value(rdflib.URIRef("http://example.com/1"), BF.title)
+    second_title = graph.value(rdflib.URIRef("http://example.com/2"), BF.title)
+    assert isinstance(first_title, rdflib.BNode)
+    assert first_title != second_title
+    assert list(graph.objects(first_title, BF.mainTitle)) == [rdflib.Literal("First")]
+    assert list(graph.objects(second_title, BF.mainTitle)) == [rdflib.Literal("Second")]
+    assert len(set(graph.subjects(rdflib.RDFS.label, None))) == 2
+
+
+def test_bnode_labels_are_shared_within_a_resource():
+    graph = rdflib.Graph()
+    document = {
+        "@context": CONTEXT,
+        "@graph": [
+            {"@id": "http://example.com/1", "bf:title": {"@id": "_:b0"}},
+            {"@id": "http://example.com/2", "bf:title": {"@id": "_:b0"}},
+            {"@id": "_:b0", "bf:mainTitle": "Shared"},
+        ],
+    }
+    parse_jsonld(document, graph, ContextRegistry())
+
+    titles = set(graph.objects(None, BF.title))
+    assert len(titles) == 1
+    assert graph.value(titles.pop(), BF.mainTitle) == rdflib.Literal("Shared")
+
+
+def test_skolemized_resources_stay_separate():
+    graph = rdflib.Graph()
+    parse_jsonld(_resource("http://example.com/1", "First", "id-1"), graph, skolem_base="http://example.com/1#")
+    parse_jsonld(_resource("http://example.com/2", "Second", "id-2"), graph, skolem_base="http://example.com/2#")
+
+    assert len(graph) == 8
+    assert not any(isinstance(term, rdflib.BNode) for triple in graph for term in triple)
+
+
+def test_contexts_are_processed_once():
+    graph = rdflib.Graph()
+    contexts = ContextRegistry()
+    parse_jsonld(_resource("http://example.com/1", "First", "id-1"), graph, contexts)
+    parse_jsonld(_resource("http://example.com/2", "Second", "id-2"), graph, contexts)
+
+    assert contexts.misses == 1
+    assert contexts.hits == 1
+
+
+def test_reregistering_a_url_replaces_its_context():
+    url = "http://example.com/context.jsonld"
+    contexts = ContextRegistry()
+    contexts.register(url, {"title": str(BF.mainTitle)})
+    document = {"@context": url, "@id": "http://example.com/1", "title": "First"}
+    graph = rdflib.Graph()
+    parse_jsonld(document, graph, contexts)
+    assert (None, BF.mainTitle, None) in graph
+
+    contexts.register(url, {"title": str(rdflib.RDFS.label)})
+    for context_data in (url, [url, {"bf": str(BF)}]):
+        graph = rdflib.Graph()
+        parse_jsonld({**document, "@context": context_data}, graph, contexts)
+        assert (None, rdflib.RDFS.label, None) in graph
+        assert (None, BF.mainTitle, None) not in graph
+
+    contexts.register(url, {"title": str(BF.mainTitle)})
+    graph = rdflib.Graph()
+    parse_jsonld({**document, "@context": [url, {"bf": str(BF)}]}, graph, contexts)
+    assert (None, BF.mainTitle, None) in graph
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import pytest
+import rdflib
+
+import parse_worker
+
+from jsonld_contexts import ContextRegistry
+from parse_pool import EntryParseError, ParseWorkerPool
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+
+CONTEXT_URL = "http://example.com/context.json"
+
+
+class InProcessWorker:
+    """Calls parse_worker.py's exports the way workers[name] does"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def parse_entry(self, *args):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return parse_worker.parse_entry(*args)
+
+    async def register_contexts(self, documents: str):
+        parse_worker.register_contexts(documents)
+
+
+async def _fetch(url: str) -> tuple:
+    assert url == CONTEXT_URL
+    return 200, json.dumps({"@context": {"bf": str(BF)}})
+
+
+def _pool(workers: list) -> ParseWorkerPool:
+    return ParseWorkerPool(ContextRegistry(), _fetch, workers=workers)
+
+
+@pytest.fixture(autouse=True)
+def worker_contexts():
+    parse_worker.JSONLD_CONTEXTS = ContextRegistry()
+
+
+def _turtle(i: int) -> str:
+    return f"""@prefix bf: <{BF}> .
+<http://example.com/{i}> bf:title [ bf:mainTitle "Title {i}" ] ."""
+
+
+def test_entries_are_spread_over_the_workers():
+    workers = [InProcessWorker(), InProcessWorker()]
+    pool = _pool(workers)
+
+    async def parse_all():
+        return await asyncio.gather(*(pool.parse(f"{i}.ttl", "turtle", _turtle(i)) for i in range(10)))
+
+    results = asyncio.run(parse_all())
+    graph = rdflib.Graph()
+    for triples in results:
+        graph += triples
+    assert len(graph) == 20
+    # Each document's blank node stays its own
+    assert len(set(graph.objects(None, BF.title))) == 10
+    assert all(worker.calls > 0 for worker in workers)
+
+
+def test_remote_contexts_are_sent_to_the_worker():
+    pool = _pool([InProcessWorker()])
+    document = json.dumps({"@context": CONTEXT_URL, "@id": "http://example.com/1", "bf:code": "x"})
+    triples = asyncio.run(pool.parse("1.json", "json-ld", document))
+    assert triples == [(rdflib.URIRef("http://example.com/1"), BF.code, rdflib.Literal("x"))]
+    assert CONTEXT_URL in parse_worker.JSONLD_CONTEXTS.documents
+
+
+def test_parse_errors_are_raised_and_the_worker_is_released():
+    pool = _pool([InProcessWorker()])
+
+    async def parse_both():
+        with pytest.raises(EntryParseError):
+            await pool.parse("bad.ttl", "turtle", "<http://example.com/1> bf:title")
+        return await pool.parse("1.ttl", "turtle", _turtle(1))
+
+    assert len(asyncio.run(parse_both())) == 2
@@ -0,0 +1,48 @@
+import rdflib
+
+from query_cache import QueryCache, normalize_query
+from graph_store import ObservedMemory
+
+MULTILINE_QUERY = '''SELECT ?s WHERE {
+    ?s <http://example.com/note> """first line
+    indented line""" .
+}'''
+
+
+def _graph() -> rdflib.Graph:
+    graph = rdflib.Graph(store=ObservedMemory())
+    graph.add((
+        rdflib.URIRef("http://example.com/1"),
+        rdflib.URIRef("http://example.com/note"),
+        rdflib.Literal("first line\n    indented line"),
+    ))
+    return graph
+
+
+def test_reindented_queries_share_a_key():
+    assert normalize_query("  SELECT *\n\n   WHERE { ?s ?p ?o }  ") == normalize_query("SELECT *\nWHERE { ?s ?p ?o }")
+
+
+def test_long_literals_are_not_normalized():
+    assert normalize_query(MULTILINE_QUERY) == MULTILINE_QUERY
+
+
+def test_multiline_literal_matches_rdflib():
+    graph = _graph()
+    expected = list(graph.query(MULTILINE_QUERY))
+    assert len(expected) == 1
+    cache = QueryCache()
+    assert len(cache.query(graph, MULTILINE_QUERY)) == 1
+    # Served from the results cache the second time
+    assert len(cache.query(graph, MULTILINE_QUERY)) == 1
+    assert cache.hits == 1
+
+
+def test_results_are_dropped_when_the_graph_changes():
+    graph = _graph()
+    cache = QueryCache()
+    sparql = "SELECT ?s WHERE { ?s ?p ?o }"
+    assert len(cache.query(graph, sparql)) == 1
+    graph.add((rdflib.URIRef("http://example.com/2"), rdflib.RDFS.label, rdflib.Literal("two")))
+    assert len(cache.query(graph, sparql)) == 2
+    assert cache.hits == 0
@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+from resource_cache import MemoryBackend, ResourceCache
+
+
+class StubResponse:
+    def __init__(self, status: int, body: str = "", headers: dict | None = None):
+        self.status = status
+        self.ok = 200 <= status < 300
+        self.headers = headers or {}
+        self.body = body
+
+    async def text(self) -> str:
+        return self.body
+
+
+class StubClient:
+    """Serves each URL with an ETag, answering 304 when it matches"""
+
+    def __init__(self, resources: dict):
+        self.resources = resources
+        self.requests = []
+
+    async def request(self, url: str, headers: dict | None = None):
+        self.requests.append((url, headers or {}))
+        etag = f'"{hash(self.resources[url])}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return StubResponse(304)
+        return StubResponse(200, self.resources[url], {"etag": etag})
+
+
+def _resources(count: int) -> dict:
+    return {
+        f"http://example.com/{i}": json.dumps({"@id": f"http://example.com/{i}", "label": "x" * 500})
+        for i in range(count)
+    }
+
+
+def test_revalidated_resources_are_served_from_the_cache():
+    resources = _resources(3)
+    cache = ResourceCache(MemoryBackend(), StubClient(resources))
+
+    async def fetch_all():
+        return [await cache.fetch(url) for url in resources]
+
+    first = asyncio.run(fetch_all())
+    second = asyncio.run(fetch_all())
+    assert first == second == [(200, body) for body in resources.values()]
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 3
+
+
+def test_changed_resources_are_refetched():
+    resources = _resources(1)
+    url = next(iter(resources))
+    cache = ResourceCache(MemoryBackend(), StubClient(resources))
+    asyncio.run(cache.fetch(url))
+    resources[url] = "changed"
+    assert asyncio.run(cache.fetch(url)) == (200, "changed")
+    assert cache.hits == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    resources = _resources(10)
+    backend = MemoryBackend()
+    cache = ResourceCache(backend, StubClient(resources), max_bytes=3_000)
+
+    async def fetch_all():
+        for url in resources:
+            await cache.fetch(url)
+
+    asyncio.run(fetch_all())
+    assert cache.total_bytes <= 3_000
+    cached = [key for key in backend.items if key != cache.index_key]
+    assert cached == [f"resource-cache:{url}" for url in list(resources)[-len(cached):]]
+
+
+def test_index_survives_a_new_session():
+    resources = _resources(5)
+    backend = MemoryBackend()
+    cache = ResourceCache(backend, StubClient(resources))
+
+    async def fetch_all(cache: ResourceCache):
+        await asyncio.gather(*(cache.fetch(url) for url in resources))
+        await cache.flush()
+
+    asyncio.run(fetch_all(cache))
+    restarted = ResourceCache(backend, StubClient(resources))
+    asyncio.run(fetch_all(restarted))
+    assert restarted.hits == 5
+    assert restarted.total_bytes == cache.total_bytes
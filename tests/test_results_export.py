@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+
+import pytest
+import rdflib
+
+from query_results import QueryResults
+from results_export import csv_chunks, jsonl_chunks, result_chunks, sparql_json_chunks, tsv_chunks
+
+EX = rdflib.Namespace("http://example.com/")
+
+LABELS = [
+    rdflib.Literal("plain"),
+    rdflib.Literal('comma, "quotes"\nand a line break'),
+    rdflib.Literal("tab\there", lang="en"),
+    rdflib.Literal(42),
+]
+
+
+def _results() -> QueryResults:
+    graph = rdflib.Graph()
+    for i, label in enumerate(LABELS):
+        graph.add((EX[f"s{i}"], EX.label, label))
+        if i % 2 == 0:
+            graph.add((EX[f"s{i}"], EX.note, rdflib.BNode(f"note{i}")))
+    result = graph.query(
+        "SELECT ?s ?label ?note WHERE { ?s ex:label ?label OPTIONAL { ?s ex:note ?note } } ORDER BY ?s",
+        initNs={"ex": EX},
+    )
+    return QueryResults(result)
+
+
+def test_csv_header_and_quoting():
+    results = _results()
+    rows = list(csv.reader(io.StringIO("".join(csv_chunks(results, chunk_size=10)), newline="")))
+    assert rows[0] == ["s", "label", "note"]
+    assert rows[1:] == [
+        [str(s), str(label), note.n3() if note is not None else ""]
+        for s, label, note in results.rows()
+    ]
+
+
+def test_tsv_header_and_terms():
+    results = _results()
+    lines = "".join(tsv_chunks(results, chunk_size=10)).split("\n")
+    assert lines[0] == "?s\t?label\t?note"
+    assert lines[-1] == ""
+    rows = [line.split("\t") for line in lines[1:-1]]
+    assert len(rows) == len(results)
+    for row, (s, label, note) in zip(rows, results.rows()):
+        assert row[0] == s.n3()
+        assert rdflib.util.from_n3(row[1].replace("\\t", "\t")) == label
+        assert row[2] == (note.n3() if note is not None else "")
+
+
+def test_sparql_json_and_jsonl_bindings():
+    results = _results()
+    document = json.loads("".join(sparql_json_chunks(results, chunk_size=10)))
+    assert document["head"]["vars"] == ["s", "label", "note"]
+    bindings = document["results"]["bindings"]
+    lines = [json.loads(line) for line in "".join(jsonl_chunks(results, chunk_size=10)).splitlines()]
+    assert lines == bindings
+    assert len(bindings) == len(results)
+    first = bindings[0]
+    assert first["s"] == {"type": "uri", "value": str(EX.s0)}
+    assert first["note"] == {"type": "bnode", "value": "note0"}
+    assert "note" not in bindings[1]
+    assert bindings[2]["label"] == {"type": "literal", "value": "tab\there", "xml:lang": "en"}
+    assert bindings[3]["label"]["datatype"] == str(rdflib.XSD.integer)
+
+
+def test_columns_round_trip_serializes_the_same():
+    results = _results()
+    columns = results.to_columns()
+    rebuilt = QueryResults.from_columns(columns["type"], columns["vars"], columns["columns"])
+    for chunks in (csv_chunks, tsv_chunks, sparql_json_chunks, jsonl_chunks):
+        assert "".join(chunks(rebuilt, chunk_size=3)) == "".join(chunks(results, chunk_size=3))
+
+
+def test_ask_results():
+    graph = rdflib.Graph()
+    graph.add((EX.s, EX.p, EX.o))
+    results = QueryResults(graph.query("ASK { ?s ?p ?o }"))
+    assert json.loads("".join(sparql_json_chunks(results))) == {"head": {}, "boolean": True}
+
+
+def test_unknown_serialization():
+    with pytest.raises(ValueError):
+        result_chunks(_results(), "xml")
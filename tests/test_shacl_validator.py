@@ -0,0 +1,142 @@
+import random
+
+import pytest
+import rdflib
+
+pyshacl = pytest.importorskip("pyshacl")
+
+from graph_store import ObservedArrayStore
+from shacl_validator import SH, IncrementalValidator
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+EX = rdflib.Namespace("http://example.com/")
+
+SHAPES = """
+@prefix sh: <http://www.w3.org/ns/shacl#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+@prefix bf: <http://id.loc.gov/ontologies/bibframe/> .
+@prefix ex: <http://example.com/shapes/> .
+
+ex:InstanceShape a sh:NodeShape ;
+    sh:targetClass bf:Instance ;
+    sh:property [ sh:path bf:title ; sh:minCount 1 ; sh:node ex:TitleShape ] ;
+    sh:property [ sh:path bf:extent ; sh:datatype xsd:integer ; sh:maxCount 1 ] .
+
+ex:TitleShape a sh:NodeShape ;
+    sh:property [ sh:path bf:mainTitle ; sh:minCount 1 ; sh:datatype xsd:string ] .
+
+ex:WorkShape a sh:NodeShape ;
+    sh:targetSubjectsOf bf:language ;
+    sh:property [ sh:path bf:language ; sh:nodeKind sh:IRI ; sh:severity sh:Warning ] .
+"""
+
+RESULT_KEYS = [
+    SH.focusNode, SH.resultPath, SH.value, SH.sourceShape,
+    SH.sourceConstraintComponent, SH.resultSeverity,
+]
+
+
+def _results(report: rdflib.Graph) -> set:
+    return {
+        tuple(report.value(result, key) for key in RESULT_KEYS)
+        for result in report.objects(None, SH.result)
+    }
+
+
+def _instance(graph: rdflib.Graph, i: int):
+    instance, title = EX[f"instance{i}"], rdflib.BNode()
+    graph.add((instance, rdflib.RDF.type, BF.Instance))
+    graph.add((instance, BF.title, title))
+    graph.add((title, BF.mainTitle, rdflib.Literal(f"Title {i}")))
+    graph.add((instance, BF.extent, rdflib.Literal(i)))
+    graph.add((EX[f"work{i}"], BF.language, EX.eng))
+
+
+def _random_change(graph: rdflib.Graph, rng: random.Random):
+    i = rng.randrange(10)
+    instance = EX[f"instance{i}"]
+    title = graph.value(instance, BF.title)
+    match rng.randrange(7):
+        case 0:
+            if title is not None:
+                graph.remove((title, BF.mainTitle, None))
+        case 1:
+            if title is not None:
+                graph.set((title, BF.mainTitle, rdflib.Literal(f"Title {i}")))
+        case 2:
+            graph.add((instance, BF.extent, rdflib.Literal(f"{rng.randrange(100)} pages")))
+        case 3:
+            graph.remove((instance, BF.extent, None))
+        case 4:
+            graph.remove((instance, rdflib.RDF.type, None))
+        case 5:
+            graph.add((EX[f"work{i}"], BF.language, rdflib.Literal("eng")))
+        case 6:
+            graph.remove((instance, None, None))
+            if title is not None:
+                graph.remove((title, None, None))
+            _instance(graph, i)
+
+
+@pytest.fixture
+def shapes_path(tmp_path):
+    path = tmp_path / "shapes.ttl"
+    path.write_text(SHAPES)
+    return str(path)
+
+
+def _validated_graph(shapes_path: str) -> tuple:
+    graph = rdflib.Graph(store=ObservedArrayStore())
+    validator = IncrementalValidator(shapes_path)
+    graph.store.listeners.append(validator)
+    for i in range(10):
+        _instance(graph, i)
+    return graph, validator
+
+
+def _fresh(graph: rdflib.Graph, validator: IncrementalValidator) -> tuple:
+    # The validator runs with warnings allowed, as the app does
+    conforms, report, _ = pyshacl.validate(
+        graph, shacl_graph=validator.shapes_graph.graph, allow_warnings=True
+    )
+    return conforms, _results(report)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_validation_matches_a_full_validation(shapes_path, seed):
+    rng = random.Random(seed)
+    graph, validator = _validated_graph(shapes_path)
+    conforms, report, _, revalidated = validator.validate(graph)
+    assert revalidated is None
+    assert (conforms, _results(report)) == _fresh(graph, validator)
+    for _ in range(15):
+        for _ in range(rng.randrange(1, 4)):
+            _random_change(graph, rng)
+        conforms, report, _, revalidated = validator.validate(graph)
+        assert revalidated is not None
+        assert (conforms, _results(report)) == _fresh(graph, validator)
+
+
+def test_only_changed_focus_nodes_are_revalidated(shapes_path):
+    graph, validator = _validated_graph(shapes_path)
+    validator.validate(graph)
+    title = graph.value(EX.instance3, BF.title)
+    graph.remove((title, BF.mainTitle, None))
+    conforms, report, delta, revalidated = validator.validate(graph)
+    assert not conforms
+    # The instance is reached through its title's blank node
+    assert revalidated == 1
+    assert {row[0] for row in _results(delta)} == {EX.instance3}
+
+    graph.add((title, BF.mainTitle, rdflib.Literal("Fixed")))
+    conforms, report, _, _ = validator.validate(graph)
+    assert conforms
+    assert _results(report) == set()
+
+
+def test_warnings_do_not_fail_conformance(shapes_path):
+    graph, validator = _validated_graph(shapes_path)
+    graph.add((EX.work1, BF.language, rdflib.Literal("eng")))
+    conforms, report, _, _ = validator.validate(graph)
+    assert conforms
+    assert {row[5] for row in _results(report)} == {SH.Warning}
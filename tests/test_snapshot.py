@@ -0,0 +1,57 @@
+import random
+import zlib
+
+import pytest
+import rdflib
+
+from snapshot import MAGIC, VERSION, SnapshotError, dumps, loads
+
+EX = rdflib.Namespace("http://example.com/")
+
+
+def _graph() -> rdflib.Graph:
+    graph = rdflib.Graph()
+    graph.bind("ex", EX)
+    for i in range(20):
+        graph.add((EX[f"work{i}"], rdflib.RDF.type, EX.Work))
+        graph.add((EX[f"work{i}"], EX.title, rdflib.Literal(f"Title {i}", lang="en")))
+        graph.add((EX[f"work{i}"], EX.pages, rdflib.Literal(i)))
+        graph.add((EX[f"work{i}"], EX.note, rdflib.BNode(f"note{i}")))
+        graph.add((rdflib.BNode(f"note{i}"), EX.text, rdflib.Literal("é")))
+    return graph
+
+
+def test_round_trip():
+    graph = _graph()
+    triples, namespaces, state = loads(dumps(graph, {"query": "SELECT"}))
+    assert set(triples) == set(graph)
+    assert ("ex", str(EX)) in namespaces
+    assert state == {"query": "SELECT"}
+
+
+@pytest.mark.parametrize("data", [b"", b"turtle", MAGIC, MAGIC + bytes([VERSION + 1])])
+def test_not_a_snapshot(data):
+    with pytest.raises(SnapshotError):
+        loads(data)
+
+
+def test_truncated_snapshots_raise_snapshot_error():
+    data = dumps(_graph())
+    for size in range(len(MAGIC), len(data)):
+        with pytest.raises(SnapshotError):
+            loads(data[:size])
+
+
+def test_corrupt_bodies_raise_snapshot_error():
+    # Damage the decompressed body so the errors come from decoding it
+    data = dumps(_graph())
+    body = zlib.decompress(data[len(MAGIC) + 1:])
+    rng = random.Random(7)
+    for _ in range(500):
+        damaged = bytearray(body)
+        for position in rng.sample(range(len(damaged)), 3):
+            damaged[position] = rng.randrange(256)
+        try:
+            loads(data[:len(MAGIC) + 1] + zlib.compress(bytes(damaged)))
+        except SnapshotError:
+            pass
@@ -0,0 +1,103 @@
+import pytest
+import rdflib
+
+from change_tracker import ChangeTracker
+from graph_store import ObservedArrayStore
+from update_journal import UpdateJournal
+
+EX = rdflib.Namespace("http://example.com/")
+
+
+def _journaled_graph() -> tuple:
+    graph = rdflib.Graph(store=ObservedArrayStore())
+    graph.add((EX.a, EX.p, rdflib.Literal("kept")))
+    graph.add((EX.b, EX.p, rdflib.Literal("removed")))
+    journal = UpdateJournal(graph)
+    graph.store.listeners.append(journal)
+    return graph, journal
+
+
+def test_update_can_be_undone_and_redone():
+    graph, journal = _journaled_graph()
+    with journal.recording("update"):
+        graph.update("DELETE { ?s ?p 'removed' } INSERT { ?s ?p 'added' } WHERE { ?s ?p 'removed' }")
+    after = set(graph)
+    assert (EX.b, EX.p, rdflib.Literal("added")) in after
+
+    journal.undo()
+    assert (EX.b, EX.p, rdflib.Literal("removed")) in graph
+    assert (EX.b, EX.p, rdflib.Literal("added")) not in graph
+    journal.redo()
+    assert set(graph) == after
+
+
+def test_failed_update_is_rolled_back():
+    graph, journal = _journaled_graph()
+    before = set(graph)
+    with pytest.raises(RuntimeError):
+        with journal.recording("failing update"):
+            graph.update("DELETE DATA { <http://example.com/b> <http://example.com/p> 'removed' }")
+            graph.update("INSERT DATA { <http://example.com/c> <http://example.com/p> 'partial' }")
+            raise RuntimeError("failed part way")
+    assert set(graph) == before
+    assert journal.undo_stack == []
+    assert journal.redo_stack == []
+
+
+def test_failed_update_keeps_earlier_entries():
+    graph, journal = _journaled_graph()
+    with journal.recording("first"):
+        graph.update("INSERT DATA { <http://example.com/c> <http://example.com/p> 'first' }")
+    with pytest.raises(RuntimeError):
+        with journal.recording("second"):
+            graph.update("INSERT DATA { <http://example.com/d> <http://example.com/p> 'second' }")
+            raise RuntimeError("failed part way")
+    assert [entry.label for entry in journal.undo_stack] == ["first"]
+    journal.undo()
+    assert (EX.c, EX.p, rdflib.Literal("first")) not in graph
+
+
+def _tracked_graph() -> tuple:
+    graph = rdflib.Graph(store=ObservedArrayStore())
+    tracker = ChangeTracker(graph)
+    journal = UpdateJournal(graph, tracker=tracker)
+    graph.store.listeners += [tracker, journal]
+    with tracker.loading():
+        for name in ("a", "b", "c"):
+            graph.add((EX[name], EX.p, rdflib.Literal("loaded")))
+    return graph, tracker, journal
+
+
+BULK_EDIT = "DELETE { ?s ?p 'loaded' } INSERT { ?s ?p 'edited' } WHERE { ?s ?p 'loaded' }"
+
+
+def test_undone_update_leaves_nothing_to_save():
+    graph, tracker, journal = _tracked_graph()
+    with journal.recording("bulk edit"):
+        graph.update(BULK_EDIT)
+    assert tracker.changes()["modified"] == [EX.a, EX.b, EX.c]
+
+    journal.undo(redoable=False)
+    assert tracker.changes() == {"added": [], "modified": [], "deleted": []}
+
+
+def test_redone_update_is_changed_again():
+    graph, tracker, journal = _tracked_graph()
+    graph.add((EX.d, EX.p, rdflib.Literal("added before")))
+    with journal.recording("bulk edit"):
+        graph.update(BULK_EDIT)
+    journal.undo()
+    assert tracker.changes()["added"] == [EX.d]
+    assert tracker.changes()["modified"] == []
+    journal.redo()
+    assert tracker.changes()["modified"] == [EX.a, EX.b, EX.c]
+
+
+def test_update_saved_before_undo_stays_changed():
+    graph, tracker, journal = _tracked_graph()
+    with journal.recording("bulk edit"):
+        graph.update(BULK_EDIT)
+    tracker.mark_saved([EX.a, EX.b, EX.c])
+    journal.undo()
+    # The saved copies hold the update, so reverting it is a change
+    assert tracker.changes()["modified"] == [EX.a, EX.b, EX.c]
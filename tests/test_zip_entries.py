@@ -0,0 +1,89 @@
+import asyncio
+import io
+import zipfile
+
+import pytest
+
+from zip_entries import AsyncZipReader, ZipFormatError
+
+
+def _reader(data: bytes) -> AsyncZipReader:
+    reads = []
+
+    async def read(offset: int, size: int) -> bytes:
+        reads.append((offset, size))
+        return data[offset:offset + size]
+
+    reader = AsyncZipReader(read, len(data))
+    reader.reads = reads
+    return reader
+
+
+def _archive(files: dict, compression=zipfile.ZIP_DEFLATED, force_zip64: bool = False, comment: bytes = b"") -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=compression) as archive:
+        archive.comment = comment
+        archive.mkdir("records")
+        for name, content in files.items():
+            with archive.open(name, "w", force_zip64=force_zip64) as entry:
+                entry.write(content)
+    return buffer.getvalue()
+
+
+def _read_all(data: bytes) -> dict:
+    reader = _reader(data)
+
+    async def read():
+        return {
+            entry.filename: await reader.read_entry(entry)
+            for entry in await reader.entries()
+            if not entry.is_dir()
+        }
+
+    return asyncio.run(read())
+
+
+FILES = {
+    "records/one.ttl": b"<http://example.com/1> <http://example.com/p> 'one' .\n" * 200,
+    "records/café.json": '{"@id": "http://example.com/café"}'.encode("utf-8"),
+    "empty.nt": b"",
+}
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_entries_match_zipfile(compression):
+    assert _read_all(_archive(FILES, compression)) == FILES
+
+
+def test_zip64_entries():
+    assert _read_all(_archive(FILES, force_zip64=True)) == FILES
+
+
+def test_archive_comment():
+    assert _read_all(_archive(FILES, comment=b"PK\x05\x06 not a record")) == FILES
+
+
+def test_only_the_directory_and_entry_are_read():
+    data = _archive({f"{i}.nt": bytes([i]) * 10_000 for i in range(20)}, zipfile.ZIP_STORED)
+    reader = _reader(data)
+
+    async def read_one():
+        entries = await reader.entries()
+        reader.reads.clear()
+        return await reader.read_entry(entries[5])
+
+    assert asyncio.run(read_one()) == bytes([4]) * 10_000
+    assert sum(size for _, size in reader.reads) < 10_100
+
+
+def test_corrupt_entry_is_reported():
+    data = bytearray(_archive(FILES, zipfile.ZIP_STORED))
+    position = data.find(b"'one'")
+    data[position + 1] = ord("x")
+    with pytest.raises(ZipFormatError):
+        _read_all(bytes(data))
+
+
+def test_not_a_zip_archive():
+    with pytest.raises(ZipFormatError):
+        _read_all(b"@prefix ex: <http://example.com/> .\n")